@@ -4,7 +4,7 @@ Category management handlers
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from services.database import db
+from services.database import async_db
 from utils.config import Config
 
 logger = logging.getLogger(__name__)
@@ -36,7 +36,7 @@ async def list_categories_callback(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
 
-    categories = db.get_categories()
+    categories = await async_db.get_categories()
 
     # Group by type
     expense_cats = [c for c in categories if c['type'] == 'expense']
@@ -134,7 +134,7 @@ async def receive_category_emoji(update: Update, context: ContextTypes.DEFAULT_T
     }
 
     try:
-        db.add_category(category_data)
+        await async_db.add_category(category_data)
 
         type_text = "расхода" if category_data['type'] == 'expense' else "дохода"
 
@@ -4,7 +4,8 @@ Currency exchange handler
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from services.database import db
+from services.database import async_db
+from models.transaction import idempotency_key
 from utils.config import Config
 from datetime import datetime
 
@@ -158,7 +159,8 @@ async def receive_to_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'currency': from_currency,
             'date': datetime.now().isoformat(),
             'ai_categorized': False,
-            'is_team_finance': False
+            'is_team_finance': False,
+            'idempotency_key': idempotency_key(update.effective_chat.id, update.message.message_id, 'from')
         }
 
         # Увеличиваем целевую валюту (доход)
@@ -173,12 +175,19 @@ async def receive_to_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'ai_categorized': False,
             'is_team_finance': False,
             'original_amount': from_amount,
-            'original_currency': from_currency
+            'original_currency': from_currency,
+            'idempotency_key': idempotency_key(update.effective_chat.id, update.message.message_id, 'to')
         }
 
-        # Save both transactions
-        db.add_transaction(from_transaction)
-        db.add_transaction(to_transaction)
+        # Save both transactions in one request; keys come from the message, so
+        # a retry after a failed or timed-out save can't record the exchange twice
+        result = await async_db.add_transactions([from_transaction, to_transaction])
+
+        if result.errors:
+            await update.message.reply_text(
+                "❌ Не удалось сохранить обмен. Введите полученную сумму еще раз:"
+            )
+            return TO_AMOUNT
 
         keyboard = [
             [InlineKeyboardButton("💱 Еще обмен", callback_data="exchange")],
@@ -4,6 +4,7 @@ from bot.keyboards.inline_keyboards import Keyboards
 from services.export_service import export_service
 from utils.config import Config
 from utils.helpers import get_date_range
+import asyncio
 import logging
 import os
 
@@ -49,8 +50,9 @@ async def export_period_callback(update: Update, context: ContextTypes.DEFAULT_T
     user_id = Config.USER_TELEGRAM_ID
 
     try:
-        # Generate Excel file
-        filepath = export_service.export_to_excel(
+        # Generate Excel file off the event loop: it reads the whole period
+        filepath = await asyncio.to_thread(
+            export_service.export_to_excel,
             user_id=user_id,
             start_date=start_date,
             end_date=end_date
@@ -4,7 +4,7 @@ Handlers for managing transactions (delete, edit)
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from services.database import db
+from services.database import async_db, Columns
 from utils.config import Config
 
 logger = logging.getLogger(__name__)
@@ -20,7 +20,9 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Get last 10 transactions
-        transactions = db.get_recent_transactions(Config.USER_TELEGRAM_ID, limit=10)
+        transactions = await async_db.get_recent_transactions(
+            Config.USER_TELEGRAM_ID, limit=10, columns=Columns.LISTING
+        )
 
         if not transactions:
             await update.message.reply_text("📭 У вас пока нет транзакций для удаления.")
@@ -76,7 +78,9 @@ async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Get last 10 transactions
-        transactions = db.get_recent_transactions(Config.USER_TELEGRAM_ID, limit=10)
+        transactions = await async_db.get_recent_transactions(
+            Config.USER_TELEGRAM_ID, limit=10, columns=Columns.LISTING
+        )
 
         if not transactions:
             await query.edit_message_text("📭 У вас пока нет транзакций для удаления.")
@@ -135,14 +139,14 @@ async def confirm_delete_callback(update: Update, context: ContextTypes.DEFAULT_
         transaction_id = query.data.replace('delete_tx_', '')
 
         # Get transaction details before deleting
-        transaction = db.get_transaction_by_id(transaction_id)
+        transaction = await async_db.get_transaction_by_id(transaction_id, columns=Columns.LISTING)
 
         if not transaction:
             await query.edit_message_text("❌ Транзакция не найдена.")
             return
 
         # Delete transaction
-        db.delete_transaction(transaction_id)
+        await async_db.delete_transaction(transaction_id)
 
         type_emoji = "💰" if transaction['type'] == 'income' else "💸"
         currency_symbol = "₴" if transaction.get('currency', 'UAH') == 'UAH' else "$"
@@ -178,7 +182,9 @@ async def edit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Get last 10 transactions
-        transactions = db.get_recent_transactions(Config.USER_TELEGRAM_ID, limit=10)
+        transactions = await async_db.get_recent_transactions(
+            Config.USER_TELEGRAM_ID, limit=10, columns=Columns.LISTING
+        )
 
         if not transactions:
             await update.message.reply_text("📭 У вас пока нет транзакций для редактирования.")
@@ -234,7 +240,9 @@ async def edit_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Get last 10 transactions
-        transactions = db.get_recent_transactions(Config.USER_TELEGRAM_ID, limit=10)
+        transactions = await async_db.get_recent_transactions(
+            Config.USER_TELEGRAM_ID, limit=10, columns=Columns.LISTING
+        )
 
         if not transactions:
             await query.edit_message_text("📭 У вас пока нет транзакций для редактирования.")
@@ -291,7 +299,7 @@ async def show_edit_options_callback(update: Update, context: ContextTypes.DEFAU
         context.user_data['edit_transaction_id'] = transaction_id
 
         # Get transaction details
-        transaction = db.get_transaction_by_id(transaction_id)
+        transaction = await async_db.get_transaction_by_id(transaction_id, columns=Columns.LISTING)
 
         if not transaction:
             await query.edit_message_text("❌ Транзакция не найдена.")
@@ -339,7 +347,7 @@ async def toggle_team_finance_callback(update: Update, context: ContextTypes.DEF
         transaction_id = query.data.replace('toggle_team_', '')
 
         # Get current transaction
-        transaction = db.get_transaction_by_id(transaction_id)
+        transaction = await async_db.get_transaction_by_id(transaction_id, columns=Columns.LISTING)
 
         if not transaction:
             await query.edit_message_text("❌ Транзакция не найдена.")
@@ -348,7 +356,7 @@ async def toggle_team_finance_callback(update: Update, context: ContextTypes.DEF
         # Toggle the flag
         new_value = not transaction.get('is_team_finance', False)
 
-        db.update_transaction(transaction_id, {'is_team_finance': new_value})
+        await async_db.update_transaction(transaction_id, {'is_team_finance': new_value})
 
         status = "Командные деньги" if new_value else "Личные деньги"
 
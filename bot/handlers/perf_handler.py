@@ -0,0 +1,109 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+from services.database import db
+from services.ai_cache import ai_cache
+from services.local_categorizer import local_categorizer
+from services.metrics import metrics
+from utils.config import Config
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _extra_stats() -> dict:
+    """Cache, resilience, change feed and AI counters, when they are enabled"""
+    extra = {'backend': type(db).__name__}
+
+    cache = getattr(db, 'transaction_cache', None)
+    if cache is not None:
+        extra['transaction_cache'] = cache.stats()
+
+    resilience = getattr(db, 'resilience', None)
+    if resilience is not None:
+        extra['resilience'] = resilience.stats()
+
+    journal = getattr(db, 'journal', None)
+    if journal is not None:
+        extra['journal'] = journal.stats()
+
+    if db.change_feed is not None:
+        extra['change_feed'] = db.change_feed.stats()
+
+    if Config.LOCAL_CATEGORIZER_ENABLED:
+        extra['local_categorizer'] = local_categorizer.stats()
+
+    if ai_cache is not None:
+        extra['ai_cache'] = ai_cache.stats()
+
+    return extra
+
+
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /perf command - database latency and payload metrics
+
+    /perf        - table of the slowest methods
+    /perf json   - full metrics as a JSON file
+    /perf reset  - clear the counters
+    """
+    user_id = update.effective_user.id
+    if user_id != Config.USER_TELEGRAM_ID:
+        await update.message.reply_text("⛔ У вас нет доступа к этой команде.")
+        return
+
+    mode = context.args[0].lower() if context.args else ''
+
+    if mode == 'reset':
+        metrics.reset()
+        await update.message.reply_text("🔄 Метрики сброшены.")
+        return
+
+    if mode == 'json':
+        Config.ensure_directories()
+        path = Config.METRICS_DUMP_PATH
+        metrics.dump(path, extra=_extra_stats())
+        with open(path, 'rb') as file:
+            await update.message.reply_document(
+                document=file,
+                filename=os.path.basename(path),
+                caption="📈 Метрики базы данных"
+            )
+        return
+
+    extra = _extra_stats()
+    message = f"📈 Метрики базы данных ({extra['backend']})\n\n"
+    message += f"<pre>{metrics.report()}</pre>\n"
+    message += "avg/p95 в мс, rows - строк за вызов, KB - получено всего\n"
+
+    if 'transaction_cache' in extra:
+        cache = extra['transaction_cache']
+        message += f"\n🗂 Кэш транзакций: {cache.get('hits', 0)} попаданий, {cache.get('misses', 0)} промахов"
+
+    if 'resilience' in extra:
+        r = extra['resilience']
+        message += (
+            f"\n🛡 Повторы: {r['retries']}, недоступна: {r['unavailable']}, "
+            f"отклонено: {r['rejected']}, breaker: {r['breaker_state']}"
+        )
+
+    if 'journal' in extra:
+        journal = extra['journal']
+        message += f"\n📒 В журнале ожидают: {journal['pending']}, отклонено навсегда: {journal['dead']}"
+
+    if 'change_feed' in extra:
+        feed = extra['change_feed']
+        state = "подключен" if feed['connected'] else "отключен"
+        message += f"\n📡 Поток изменений: {state}, событий: {feed['events']}"
+
+    if 'local_categorizer' in extra:
+        lc = extra['local_categorizer']
+        message += (
+            f"\n🧠 Категории по истории: {lc['hits']} без AI, {lc['misses']} через AI "
+            f"({lc['descriptions']} описаний)"
+        )
+
+    if 'ai_cache' in extra:
+        ac = extra['ai_cache']
+        message += f"\n💾 Кэш AI: {ac['hits']} попаданий, {ac['misses']} промахов, записей: {ac['size']}"
+
+    await update.message.reply_text(message, parse_mode='HTML')
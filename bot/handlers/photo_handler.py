@@ -1,10 +1,10 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-from bot.keyboards.inline_keyboards import Keyboards
 from services.vision_service import vision_service
 from services.categorization_service import categorization_service
-from services.database import db
-from models.transaction import Transaction
+from services.database import async_db
+from bot.handlers.transaction_handler import pending_confirmation
+from models.transaction import Transaction, idempotency_key
 from utils.config import Config
 from utils.helpers import get_currency_symbol
 from utils.date_helper import get_current_date
@@ -37,8 +37,8 @@ async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYP
         await photo_file.download_to_drive(photo_path)
 
         # Process with Vision API
-        expense_categories = categorization_service.get_available_categories('expense')
-        receipt_data = vision_service.process_receipt(photo_path, expense_categories)
+        expense_categories = await categorization_service.get_available_categories_async('expense')
+        receipt_data = await vision_service.process_receipt_async(photo_path, expense_categories)
 
         if not receipt_data or 'amount' not in receipt_data:
             await processing_msg.edit_text(
@@ -47,11 +47,8 @@ async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYP
             os.remove(photo_path)
             return
 
-        # Upload receipt image to Supabase storage
-        receipt_url = db.upload_receipt_image(
-            photo_path,
-            f"receipt_{user_id}_{datetime.now().timestamp()}.jpg"
-        )
+        # Upload receipt image to Supabase storage (compressed, deduplicated by content)
+        receipt_url = await async_db.upload_receipt_image(photo_path)
 
         # Cleanup local file
         os.remove(photo_path)
@@ -66,7 +63,8 @@ async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYP
             date=get_current_date(),  # Формат ДД.ММ.ГГГГ
             user_telegram_id=Config.USER_TELEGRAM_ID,
             ai_categorized=True,
-            receipt_image_url=receipt_url
+            receipt_image_url=receipt_url,
+            idempotency_key=idempotency_key(update.effective_chat.id, update.message.message_id)
         )
 
         # Build items list
@@ -87,11 +85,9 @@ async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYP
 
 Сохранить?"""
 
-        context.user_data['pending_transaction'] = transaction.to_dict()
-
         await processing_msg.edit_text(
             confirmation,
-            reply_markup=Keyboards.confirmation("save_transaction", "cancel_transaction")
+            reply_markup=pending_confirmation(context, update.message.message_id, transaction)
         )
 
     except Exception as e:
@@ -52,6 +52,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /stats - Статистика
 /export - Экспорт в Excel
 /recommend - AI рекомендации
+/perf - Метрики базы данных
 /help - Эта справка
 
 📝 Способы добавления транзакций:
@@ -1,7 +1,8 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from bot.keyboards.inline_keyboards import Keyboards
-from services.database import db
+from services.database import async_db
+from services.storage import month_start
 from services.ai_service import ai_service
 from utils.config import Config
 from utils.helpers import get_date_range, format_currency, format_date
@@ -39,15 +40,10 @@ async def stats_period_callback(update: Update, context: ContextTypes.DEFAULT_TY
 
     user_id = Config.USER_TELEGRAM_ID
 
-    # Get transactions for period
-    transactions = db.get_transactions(
-        user_id=user_id,
-        start_date=start_date,
-        end_date=end_date,
-        limit=10000
-    )
+    # Totals and category breakdowns for the period in one round trip
+    snapshot = await async_db.get_period_snapshot(user_id, start_date, end_date)
 
-    if not transactions:
+    if not snapshot['transaction_count']:
         await query.edit_message_text(
             f"За выбранный период ({period}) транзакций нет.",
             reply_markup=Keyboards.back_to_main()
@@ -55,29 +51,20 @@ async def stats_period_callback(update: Update, context: ContextTypes.DEFAULT_TY
         return
 
     # Calculate totals by currency
-    # UAH
-    income_uah = sum(t['amount'] for t in transactions
-                    if t['type'] == 'income' and t.get('currency', 'UAH') == 'UAH')
-
-    # Exclude project expenses (Партнерам) and self-transfers (наличные на карту)
-    expense_uah = sum(t['amount'] for t in transactions
-                     if t['type'] == 'expense'
-                     and t.get('currency', 'UAH') == 'UAH'
-                     and t.get('category') != 'Партнерам'
-                     and not ('на карту' in t.get('description', '').lower() and 'налич' in t.get('description', '').lower()))
-
+    # UAH - expense_net excludes project expenses (Партнерам) and self-transfers (наличные на карту)
+    uah = snapshot['totals'].get('UAH', {})
+    income_uah = uah.get('income', 0)
+    expense_uah = uah.get('expense_net', 0)
     balance_uah = income_uah - expense_uah
 
     # USD
-    income_usd = sum(t['amount'] for t in transactions
-                    if t['type'] == 'income' and t.get('currency') == 'USD')
-    expense_usd = sum(t['amount'] for t in transactions
-                     if t['type'] == 'expense' and t.get('currency') == 'USD')
+    usd = snapshot['totals'].get('USD', {})
+    income_usd = usd.get('income', 0)
+    expense_usd = usd.get('expense', 0)
     balance_usd = income_usd - expense_usd
 
-    # Get category stats
-    expense_stats = db.get_category_stats(user_id, start_date, end_date, 'expense')
-    income_stats = db.get_category_stats(user_id, start_date, end_date, 'income')
+    expense_stats = snapshot['categories']['expense']
+    income_stats = snapshot['categories']['income']
 
     # Build message
     period_names = {
@@ -144,19 +131,15 @@ async def recommendations_callback(update: Update, context: ContextTypes.DEFAULT
 
     user_id = Config.USER_TELEGRAM_ID
 
-    # Get recent transactions (last 30 days)
+    # Previous month and the current one: the whole month comes from monthly
+    # rollups, only the current month is read row by row
     import datetime
     end_date = datetime.datetime.now()
-    start_date = end_date - datetime.timedelta(days=30)
+    start_date = month_start(month_start(end_date) - datetime.timedelta(days=1))
 
-    transactions = db.get_transactions(
-        user_id=user_id,
-        start_date=start_date,
-        end_date=end_date,
-        limit=10000
-    )
+    snapshot = await async_db.get_period_snapshot(user_id, start_date, end_date)
 
-    if not transactions:
+    if not snapshot['transaction_count']:
         await processing_msg.edit_text(
             "Недостаточно данных для генерации рекомендаций.",
             reply_markup=Keyboards.back_to_main()
@@ -164,10 +147,10 @@ async def recommendations_callback(update: Update, context: ContextTypes.DEFAULT
         return
 
     # Generate recommendations
-    recommendations = ai_service.generate_financial_recommendations(transactions)
+    recommendations = await ai_service.generate_financial_recommendations_async(snapshot)
 
     # Save to database
-    db.add_recommendation({
+    await async_db.add_recommendation({
         'user_telegram_id': user_id,
         'recommendation_text': recommendations,
         'category': 'monthly_analysis'
@@ -1,12 +1,14 @@
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from bot.keyboards.inline_keyboards import Keyboards
-from services.database import db
+from services.database import async_db
 from services.categorization_service import categorization_service
 from services.ai_service import ai_service
-from models.transaction import Transaction
+from models.transaction import Transaction, idempotency_key
 from utils.config import Config
+from utils.helpers import CURRENCY_SYMBOLS, get_currency_symbol
 from datetime import datetime
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,24 @@ logger = logging.getLogger(__name__)
 # Conversation states
 AMOUNT, CURRENCY, CATEGORY, DESCRIPTION, PAYMENT_METHOD = range(5)
 
+# Parsed transactions awaiting confirmation, kept per chat
+MAX_PENDING_TRANSACTIONS = 20
+
+
+def pending_confirmation(context: ContextTypes.DEFAULT_TYPE, message_id: int, transaction: Transaction):
+    """Keep a parsed transaction until it is confirmed, return its Да/Нет keyboard
+
+    Entries are keyed by the id of the message they were parsed from and kept
+    in chat_data, so replies to several messages handled at once (and
+    conversations clearing user_data) don't overwrite each other.
+    """
+    pending = context.chat_data.setdefault('pending_transactions', {})
+    pending[str(message_id)] = transaction.to_dict()
+    for stale in list(pending)[:-MAX_PENDING_TRANSACTIONS]:
+        del pending[stale]
+
+    return Keyboards.confirmation(f"save_transaction:{message_id}", f"cancel_transaction:{message_id}")
+
 
 async def add_expense_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start adding expense"""
@@ -111,9 +131,8 @@ async def receive_category_callback(update: Update, context: ContextTypes.DEFAUL
 
     category_id = query.data.replace('cat_', '')
 
-    # Get category details from database
-    categories = db.get_categories()
-    category = next((c for c in categories if c['id'] == category_id), None)
+    # Get category details (served from the in-memory category cache)
+    category = await async_db.get_category_by_id(category_id)
 
     if category:
         context.user_data['category'] = category['name']
@@ -145,7 +164,7 @@ async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not description or description == '/skip':
         # No description - show category selection
         transaction_type = context.user_data.get('transaction_type', 'expense')
-        categories = db.get_categories(category_type=transaction_type)
+        categories = await async_db.get_categories(category_type=transaction_type)
 
         await update.message.reply_text(
             "Выберите категорию:",
@@ -155,17 +174,35 @@ async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     context.user_data['description'] = description
 
+    # Categories this description got before answer without a round trip to the AI
+    transaction_type = context.user_data.get('transaction_type', 'expense')
+    type_categories = await categorization_service.get_available_categories_async(transaction_type)
+    prediction = categorization_service.predict_category(description, transaction_type, type_categories)
+
+    if prediction:
+        context.user_data['category'] = prediction.category
+        context.user_data['ai_categorized'] = True
+
+        await update.message.reply_text(
+            f"✅ Категория по истории: <b>{prediction.category}</b>\n\n"
+            f"Выберите способ оплаты:",
+            reply_markup=Keyboards.payment_method(),
+            parse_mode='HTML'
+        )
+        return PAYMENT_METHOD
+
     # Use AI to categorize
     try:
         await update.message.reply_text("🤖 AI анализирует...")
 
-        transaction_type = context.user_data.get('transaction_type', 'expense')
-        expense_categories = categorization_service.get_available_categories('expense')
-        income_categories = categorization_service.get_available_categories('income')
+        expense_categories, income_categories = await asyncio.gather(
+            categorization_service.get_available_categories_async('expense'),
+            categorization_service.get_available_categories_async('income')
+        )
         all_categories = expense_categories + income_categories
 
         # Get AI suggestion
-        parsed = ai_service.parse_natural_language_transaction(description, all_categories)
+        parsed = await ai_service.parse_natural_language_transaction_async(description, all_categories)
 
         if parsed and parsed.get('category'):
             suggested_category = parsed['category']
@@ -187,7 +224,7 @@ async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         else:
             # AI failed, show manual selection
-            categories = db.get_categories(category_type=transaction_type)
+            categories = await async_db.get_categories(category_type=transaction_type)
             await update.message.reply_text(
                 "❌ AI не смог определить категорию.\n\nВыберите вручную:",
                 reply_markup=Keyboards.category_selection(categories)
@@ -198,7 +235,7 @@ async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE
         logger.error(f"AI categorization error: {e}")
         # Fallback to manual
         transaction_type = context.user_data.get('transaction_type', 'expense')
-        categories = db.get_categories(category_type=transaction_type)
+        categories = await async_db.get_categories(category_type=transaction_type)
         await update.message.reply_text(
             "❌ Ошибка AI. Выберите категорию вручную:",
             reply_markup=Keyboards.category_selection(categories)
@@ -220,7 +257,8 @@ async def receive_payment_method_callback(update: Update, context: ContextTypes.
     payment_method = payment_method_map.get(query.data, 'cash')
     context.user_data['payment_method'] = payment_method
 
-    # Create transaction
+    # Create transaction; the key is tied to the keyboard message, so a double
+    # tap or a redelivered update saves it once
     transaction = Transaction(
         amount=context.user_data['amount'],
         type=context.user_data['transaction_type'],
@@ -230,11 +268,14 @@ async def receive_payment_method_callback(update: Update, context: ContextTypes.
         date=datetime.now(),
         user_telegram_id=Config.USER_TELEGRAM_ID,
         ai_categorized=context.user_data.get('ai_categorized', False),
-        currency=context.user_data.get('currency', 'UAH')
+        currency=context.user_data.get('currency', 'UAH'),
+        idempotency_key=idempotency_key(query.message.chat_id, query.message.message_id)
     )
 
     # Save to database
-    db.add_transaction(transaction.to_dict())
+    transaction_data = transaction.to_dict()
+    await async_db.add_transaction(transaction_data)
+    categorization_service.learn(transaction_data)
 
     # Create summary message
     type_emoji = "💸" if transaction.type == "expense" else "💰"
@@ -277,12 +318,13 @@ async def process_text_transaction(update: Update, context: ContextTypes.DEFAULT
     text = update.message.text
 
     # Get available categories
-    expense_categories = categorization_service.get_available_categories('expense')
-    income_categories = categorization_service.get_available_categories('income')
-    all_categories = expense_categories + income_categories
+    expense_categories, income_categories = await asyncio.gather(
+        categorization_service.get_available_categories_async('expense'),
+        categorization_service.get_available_categories_async('income')
+    )
 
-    # Parse with AI
-    parsed = ai_service.parse_natural_language_transaction(text, all_categories)
+    # Simple entries ("500 такси") are parsed by rules and history, the rest by AI
+    parsed = await categorization_service.parse_text_async(text, expense_categories, income_categories)
 
     if not parsed or 'amount' not in parsed:
         await update.message.reply_text(
@@ -299,26 +341,28 @@ async def process_text_transaction(update: Update, context: ContextTypes.DEFAULT
         payment_method=parsed.get('payment_method'),
         date=datetime.now(),
         user_telegram_id=Config.USER_TELEGRAM_ID,
-        ai_categorized=True
+        ai_categorized=True,
+        currency=parsed.get('currency') if parsed.get('currency') in CURRENCY_SYMBOLS else 'UAH',
+        idempotency_key=idempotency_key(update.effective_chat.id, update.message.message_id)
     )
 
     # Confirmation message
     type_emoji = "💸" if transaction.type == "expense" else "💰"
     type_text = "Расход" if transaction.type == "expense" else "Доход"
 
-    confirmation = f"""🤖 Распознано:
+    header = "⚡ Распознано" if parsed['source'] == 'rules' else "🤖 Распознано"
 
-{type_emoji} {type_text}: {transaction.amount} {get_currency_symbol(parsed.get("currency", "UAH"))}
+    confirmation = f"""{header}:
+
+{type_emoji} {type_text}: {transaction.amount} {get_currency_symbol(transaction.currency)}
 📁 Категория: {transaction.category}
 📝 Описание: {transaction.description}
 
 Сохранить?"""
 
-    context.user_data['pending_transaction'] = transaction.to_dict()
-
     await update.message.reply_text(
         confirmation,
-        reply_markup=Keyboards.confirmation("save_transaction", "cancel_transaction")
+        reply_markup=pending_confirmation(context, update.message.message_id, transaction)
     )
 
 
@@ -327,17 +371,25 @@ async def save_transaction_callback(update: Update, context: ContextTypes.DEFAUL
     query = update.callback_query
     await query.answer()
 
-    transaction_data = context.user_data.get('pending_transaction')
-
-    if transaction_data:
-        db.add_transaction(transaction_data)
+    pending = context.chat_data.get('pending_transactions', {})
+    pending_id = query.data.partition(':')[2]
+    transaction_data = pending.get(pending_id)
 
+    if not transaction_data:
         await query.edit_message_text(
-            "✅ Транзакция сохранена!",
+            "⚠️ Транзакция уже сохранена или отменена.",
             reply_markup=Keyboards.back_to_main()
         )
+        return
 
-        context.user_data.clear()
+    await async_db.add_transaction(transaction_data)
+    categorization_service.learn(transaction_data)
+    pending.pop(pending_id, None)
+
+    await query.edit_message_text(
+        "✅ Транзакция сохранена!",
+        reply_markup=Keyboards.back_to_main()
+    )
 
 
 async def cancel_transaction_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -345,13 +397,13 @@ async def cancel_transaction_callback(update: Update, context: ContextTypes.DEFA
     query = update.callback_query
     await query.answer()
 
+    context.chat_data.get('pending_transactions', {}).pop(query.data.partition(':')[2], None)
+
     await query.edit_message_text(
         "❌ Транзакция отменена.",
         reply_markup=Keyboards.back_to_main()
     )
 
-    context.user_data.clear()
-
 
 async def cancel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel conversation"""
@@ -367,7 +419,7 @@ async def cancel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show current balance - simple and clear"""
     user_id = Config.USER_TELEGRAM_ID
-    balances = db.get_balance(user_id)
+    balances = await async_db.get_balance(user_id)
 
     if not balances:
         message = "📭 У вас пока нет транзакций"
@@ -1,15 +1,15 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-from bot.keyboards.inline_keyboards import Keyboards
 from services.voice_service import voice_service
-from services.ai_service import ai_service
 from services.categorization_service import categorization_service
 from services.database import db
-from models.transaction import Transaction
+from bot.handlers.transaction_handler import pending_confirmation
+from models.transaction import Transaction, idempotency_key
 from utils.config import Config
 from utils.date_helper import get_current_date
 from utils.helpers import get_currency_symbol
 from datetime import datetime
+import asyncio
 import logging
 import os
 
@@ -38,19 +38,20 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
         await voice_file.download_to_drive(voice_path)
 
         # Transcribe
-        transcription = voice_service.transcribe_voice(voice_path)
+        transcription = await voice_service.transcribe_voice_async(voice_path)
 
         if not transcription:
             await processing_msg.edit_text("Не удалось распознать голосовое сообщение.")
             voice_service.cleanup_voice_file(voice_path)
             return
 
-        # Parse with AI
-        expense_categories = categorization_service.get_available_categories('expense')
-        income_categories = categorization_service.get_available_categories('income')
-        all_categories = expense_categories + income_categories
+        # Parse with rules and history, AI for anything they can't settle
+        expense_categories, income_categories = await asyncio.gather(
+            categorization_service.get_available_categories_async('expense'),
+            categorization_service.get_available_categories_async('income')
+        )
 
-        parsed = ai_service.parse_natural_language_transaction(transcription, all_categories)
+        parsed = await categorization_service.parse_text_async(transcription, expense_categories, income_categories)
 
         # Cleanup voice file
         voice_service.cleanup_voice_file(voice_path)
@@ -71,7 +72,8 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
             date=get_current_date(),  # Формат ДД.ММ.ГГГГ
             user_telegram_id=Config.USER_TELEGRAM_ID,
             ai_categorized=True,
-            voice_transcription=transcription
+            voice_transcription=transcription,
+            idempotency_key=idempotency_key(update.effective_chat.id, update.message.message_id)
         )
 
         # Confirmation message
@@ -88,11 +90,9 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
 
 Сохранить?"""
 
-        context.user_data['pending_transaction'] = transaction.to_dict()
-
         await processing_msg.edit_text(
             confirmation,
-            reply_markup=Keyboards.confirmation("save_transaction", "cancel_transaction")
+            reply_markup=pending_confirmation(context, update.message.message_id, transaction)
         )
 
     except Exception as e:
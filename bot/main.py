@@ -1,4 +1,5 @@
 import logging
+import threading
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -9,6 +10,9 @@ from telegram.ext import (
     filters
 )
 from utils.config import Config
+from services.database import db
+from services.categorization_service import categorization_service
+from services.resilience import DatabaseUnavailableError
 
 # Import handlers
 from bot.handlers.start_handler import (
@@ -35,6 +39,7 @@ from bot.handlers.transaction_handler import (
     DESCRIPTION,
     PAYMENT_METHOD
 )
+from bot.handlers.perf_handler import perf_command
 from bot.handlers.manage_handler import (
     delete_command,
     delete_callback,
@@ -101,7 +106,19 @@ def main():
         logger.error(f"Configuration error: {e}")
         return
 
+    # Keep caches coherent with writes made by import scripts
+    db.start_change_feed()
+
+    # Learn categories from history without holding up startup
+    threading.Thread(
+        target=categorization_service.train_local_categorizer, name='LocalCategorizer', daemon=True
+    ).start()
+
     # Create application
+    # Updates are processed in order: the conversation handlers and user_data
+    # need it. The slow handlers below (free text, voice, photo, reports) run
+    # with block=False instead and keep their state per message, so a long AI
+    # or database call doesn't hold up the next update
     application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
 
     # === CONVERSATION HANDLER FOR ADDING TRANSACTIONS ===
@@ -155,6 +172,7 @@ def main():
     application.add_handler(CommandHandler('export', export_command))
     application.add_handler(CommandHandler('delete', delete_command))
     application.add_handler(CommandHandler('edit', edit_command))
+    application.add_handler(CommandHandler('perf', perf_command))
 
     # === CONVERSATION HANDLERS ===
     application.add_handler(transaction_conv_handler)
@@ -167,7 +185,7 @@ def main():
 
     # Stats and recommendations
     application.add_handler(CallbackQueryHandler(stats_callback, pattern='^stats$'))
-    application.add_handler(CallbackQueryHandler(recommendations_callback, pattern='^recommendations$'))
+    application.add_handler(CallbackQueryHandler(recommendations_callback, pattern='^recommendations$', block=False))
 
     # Balance
     application.add_handler(CallbackQueryHandler(
@@ -180,17 +198,19 @@ def main():
 
     # Period selection (can be for stats or export)
     async def period_router(update, context):
-        """Route period selection to stats or export based on context"""
-        if context.user_data.get('export_mode'):
-            await export_period_callback(update, context)
-        else:
-            await stats_period_callback(update, context)
+        """Route period selection to stats or export based on context
+
+        The mode is read here, in update order; the report itself is built in
+        the background.
+        """
+        handler = export_period_callback if context.user_data.get('export_mode') else stats_period_callback
+        context.application.create_task(handler(update, context), update=update)
 
     application.add_handler(CallbackQueryHandler(period_router, pattern='^period_'))
 
     # Transaction confirmation
-    application.add_handler(CallbackQueryHandler(save_transaction_callback, pattern='^save_transaction$'))
-    application.add_handler(CallbackQueryHandler(cancel_transaction_callback, pattern='^cancel_transaction$'))
+    application.add_handler(CallbackQueryHandler(save_transaction_callback, pattern='^save_transaction:'))
+    application.add_handler(CallbackQueryHandler(cancel_transaction_callback, pattern='^cancel_transaction:'))
 
     # Delete and Edit handlers
     application.add_handler(CallbackQueryHandler(delete_callback, pattern='^delete$'))
@@ -205,24 +225,43 @@ def main():
 
     # === MESSAGE HANDLERS ===
     # Voice messages
-    application.add_handler(MessageHandler(filters.VOICE, handle_voice_message))
+    application.add_handler(MessageHandler(filters.VOICE, handle_voice_message, block=False))
 
     # Photo messages (receipts)
-    application.add_handler(MessageHandler(filters.PHOTO, handle_photo_message))
+    application.add_handler(MessageHandler(filters.PHOTO, handle_photo_message, block=False))
 
     # Text messages (natural language transactions)
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND,
-        process_text_transaction
+        process_text_transaction,
+        block=False
     ))
 
     # === ERROR HANDLER ===
     async def error_handler(update, context):
-        """Log errors"""
+        """Log errors and tell the user when the database is unavailable"""
         logger.error(f"Update {update} caused error {context.error}")
 
+        if isinstance(context.error, DatabaseUnavailableError) and isinstance(update, Update):
+            resilience = getattr(db, 'resilience', None)
+            if resilience is not None:
+                logger.warning(f"Database resilience: {resilience.stats()}")
+
+            if update.effective_message:
+                await update.effective_message.reply_text(
+                    "⚠️ База данных временно недоступна. Попробуйте через минуту."
+                )
+
     application.add_error_handler(error_handler)
 
+    # Replay transactions left in the offline journal by a previous run
+    if db.journal is not None:
+        journal_stats = db.journal.stats()
+        logger.info(f"Journal: {journal_stats['pending']} transactions pending, {journal_stats['dead']} dead-lettered")
+        if journal_stats['dead']:
+            logger.warning(f"Journal: dead-lettered transactions were never stored, see {db.journal.path}")
+        db.journal.start()
+
     # Start bot
     logger.info("Starting MyWallet bot...")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
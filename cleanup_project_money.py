@@ -1,46 +1,59 @@
 """
 Скрипт для удаления проектных денег из базы
 Оставляем только личные доходы и расходы
+
+Использование:
+    python cleanup_project_money.py            # удалить
+    python cleanup_project_money.py --dry-run  # только показать, что будет удалено
 """
+import sys
 from services.database import db
 from utils.config import Config
 
-def cleanup_project_transactions():
-    """Удаляем проектные транзакции"""
+# Каждое правило удаляется одним запросом на сервере
+CLEANUP_RULES = [
+    # 1. 1800$ проектных
+    ("1800$ проектных", {
+        'amount': 1800,
+        'currency': 'USD',
+        'description': ('ilike', '%университета%'),
+    }),
+    # 2. ВСЕ переводы партнерам (это распределение проектных денег)
+    ("Переводы партнерам", {
+        'category': 'Партнерам',
+    }),
+]
 
-    print("🧹 Начинаем очистку проектных транзакций...")
 
-    # Получаем все транзакции
-    all_transactions = db.get_transactions(
-        user_id=Config.USER_TELEGRAM_ID,
-        limit=10000
-    )
+def cleanup_project_transactions(dry_run: bool = False):
+    """Удаляем проектные транзакции"""
 
-    print(f"📊 Всего транзакций: {len(all_transactions)}")
+    mode = "Проверка" if dry_run else "Очистка"
+    print(f"🧹 {mode} проектных транзакций...")
 
     deleted_count = 0
 
-    for t in all_transactions:
-        should_delete = False
+    for title, rule in CLEANUP_RULES:
+        filters = {'user_telegram_id': Config.USER_TELEGRAM_ID, **rule}
 
-        # 1. Удаляем 1800$ проектных
-        if (t.get('amount') == 1800.0 and
-            t.get('currency') == 'USD' and
-            'университета' in t.get('description', '').lower()):
-            should_delete = True
-            print(f"❌ Удаляем: 1800$ проектных - {t.get('description')}")
+        if dry_run:
+            result = db.delete_where(filters, dry_run=True)
+            print(f"\n❌ {title}: {result.count}")
+            for t in result.rows:
+                print(f"   {t.get('amount')} {t.get('currency')} - {t.get('description')}")
+            if result.count > len(result.rows):
+                print(f"   ... и еще {result.count - len(result.rows)}")
+        else:
+            result = db.delete_where(filters)
+            print(f"❌ {title}: удалено {result.count}")
 
-        # 2. Удаляем ВСЕ переводы партнерам (это распределение проектных денег)
-        if t.get('category') == 'Партнерам':
-            should_delete = True
-            print(f"❌ Удаляем: Перевод партнерам - {t.get('amount')} {t.get('currency')} - {t.get('description')}")
+        deleted_count += result.count
 
-        if should_delete:
-            db.delete_transaction(t['id'])
-            deleted_count += 1
+    action = "Будет удалено" if dry_run else "Удалено"
+    print(f"\n✅ {action} транзакций: {deleted_count}")
 
-    print(f"\n✅ Удалено транзакций: {deleted_count}")
-    print(f"📊 Осталось транзакций: {len(all_transactions) - deleted_count}")
+    if dry_run:
+        return
 
     # Проверяем новый баланс
     print("\n💰 Новый баланс:")
@@ -57,4 +70,4 @@ def cleanup_project_transactions():
 
 if __name__ == '__main__':
     Config.validate()
-    cleanup_project_transactions()
+    cleanup_project_transactions(dry_run='--dry-run' in sys.argv)
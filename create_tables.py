@@ -72,11 +72,7 @@ def create_tables_via_rest():
         """,
 
         # Create indexes
-        "CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_telegram_id);",
-        "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type);",
-        "CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category);",
-        "CREATE INDEX IF NOT EXISTS idx_recommendations_user_id ON ai_recommendations(user_telegram_id);",
+        # Indexes are created by migrate.py (database/migrations/008_hot_path_indexes.sql)
 
         # Enable RLS
         "ALTER TABLE transactions ENABLE ROW LEVEL SECURITY;",
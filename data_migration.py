@@ -2,15 +2,16 @@
 import json
 import logging
 from datetime import datetime
-from openai import OpenAI
 from services.database import db
 from services.categorization_service import categorization_service
+from services.openai_client import get_client
+from models.transaction import ImportKeys
 from utils.config import Config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
+client = get_client()
 
 
 def parse_notes_with_ai(notes_text: str) -> list:
@@ -104,6 +105,7 @@ def import_transactions(transactions: list, user_telegram_id: int) -> int:
     """Import parsed transactions to database"""
 
     imported_count = 0
+    import_keys = ImportKeys(f'data_migration:{user_telegram_id}')
 
     for t in transactions:
         try:
@@ -114,6 +116,7 @@ def import_transactions(transactions: list, user_telegram_id: int) -> int:
                 'description': t.get('description', ''),
                 'user_telegram_id': user_telegram_id,
                 'ai_categorized': True,
+                'idempotency_key': import_keys(t),
             }
 
             # Add project if specified
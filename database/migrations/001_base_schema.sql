@@ -0,0 +1,56 @@
+-- Base tables used by the bot and scripts
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    user_telegram_id BIGINT NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL,
+    type VARCHAR(10) NOT NULL CHECK (type IN ('income', 'expense')),
+    category VARCHAR(100),
+    description TEXT,
+    payment_method VARCHAR(50),
+    project VARCHAR(100),
+    date TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    ai_categorized BOOLEAN DEFAULT FALSE,
+    voice_transcription TEXT,
+    receipt_image_url TEXT
+);
+
+-- Multi-currency and team finance columns added after the first release
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS currency VARCHAR(10) DEFAULT 'UAH';
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS original_amount DECIMAL(15, 2);
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS original_currency VARCHAR(10);
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS is_team_finance BOOLEAN DEFAULT FALSE;
+
+CREATE TABLE IF NOT EXISTS categories (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    type VARCHAR(10) NOT NULL CHECK (type IN ('income', 'expense')),
+    parent_category VARCHAR(100),
+    emoji VARCHAR(10),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(name, type)
+);
+
+CREATE TABLE IF NOT EXISTS ai_recommendations (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    user_telegram_id BIGINT NOT NULL,
+    recommendation_text TEXT NOT NULL,
+    category VARCHAR(50),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    is_read BOOLEAN DEFAULT FALSE
+);
+
+ALTER TABLE transactions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE categories ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ai_recommendations ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow all for authenticated users" ON transactions;
+CREATE POLICY "Allow all for authenticated users" ON transactions FOR ALL USING (true) WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow all for categories" ON categories;
+CREATE POLICY "Allow all for categories" ON categories FOR ALL USING (true) WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow all for recommendations" ON ai_recommendations;
+CREATE POLICY "Allow all for recommendations" ON ai_recommendations FOR ALL USING (true) WITH CHECK (true);
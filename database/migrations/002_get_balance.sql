@@ -0,0 +1,55 @@
+-- Server-side balance aggregation used by Database.get_balance
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+-- Internal transfers (наличные на карту) are not real expenses
+CREATE OR REPLACE FUNCTION is_internal_transfer(p_category TEXT, p_description TEXT)
+RETURNS BOOLEAN
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(p_category, '') = 'Переводы'
+        AND (
+            LOWER(COALESCE(p_description, '')) LIKE '%на карту%'
+            OR (
+                LOWER(COALESCE(p_description, '')) LIKE '%налич%'
+                AND LOWER(COALESCE(p_description, '')) LIKE '%карт%'
+            )
+        );
+$$;
+
+CREATE OR REPLACE FUNCTION get_balance(p_user_telegram_id BIGINT)
+RETURNS TABLE (
+    currency TEXT,
+    income NUMERIC,
+    expense NUMERIC,
+    balance NUMERIC
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        COALESCE(t.currency, 'UAH')::TEXT AS currency,
+        COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'income'), 0) AS income,
+        COALESCE(SUM(t.amount) FILTER (WHERE t.type <> 'income' AND NOT t.is_internal_transfer), 0) AS expense,
+        COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'income'), 0)
+            - COALESCE(SUM(t.amount) FILTER (WHERE t.type <> 'income' AND NOT t.is_internal_transfer), 0) AS balance
+    FROM (
+        SELECT
+            amount,
+            type,
+            currency,
+            is_internal_transfer(category, description) AS is_internal_transfer
+        FROM transactions
+        WHERE user_telegram_id = p_user_telegram_id
+    ) t
+    GROUP BY COALESCE(t.currency, 'UAH');
+$$;
+
+-- Supabase API roles; absent on a plain local Postgres
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        GRANT EXECUTE ON FUNCTION get_balance(BIGINT) TO anon, authenticated, service_role;
+    END IF;
+END;
+$$;
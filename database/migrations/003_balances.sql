@@ -0,0 +1,141 @@
+-- Incrementally maintained balance ledger read by Database.get_balance
+-- Requires 002_get_balance.sql (is_internal_transfer)
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+CREATE TABLE IF NOT EXISTS balances (
+    user_telegram_id BIGINT NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    income DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    expense DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    balance DECIMAL(15, 2) GENERATED ALWAYS AS (income - expense) STORED,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_telegram_id, currency)
+);
+
+ALTER TABLE balances ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow all for balances" ON balances;
+CREATE POLICY "Allow all for balances" ON balances FOR ALL USING (true) WITH CHECK (true);
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one transaction from the ledger
+CREATE OR REPLACE FUNCTION apply_balance_delta(
+    p_user_telegram_id BIGINT,
+    p_currency TEXT,
+    p_type TEXT,
+    p_category TEXT,
+    p_description TEXT,
+    p_amount NUMERIC,
+    p_sign INTEGER
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_type <> 'income' AND is_internal_transfer(p_category, p_description) THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO balances (user_telegram_id, currency, income, expense)
+    VALUES (
+        p_user_telegram_id,
+        COALESCE(p_currency, 'UAH'),
+        CASE WHEN p_type = 'income' THEN p_sign * p_amount ELSE 0 END,
+        CASE WHEN p_type = 'income' THEN 0 ELSE p_sign * p_amount END
+    )
+    ON CONFLICT (user_telegram_id, currency) DO UPDATE
+    SET income = balances.income + EXCLUDED.income,
+        expense = balances.expense + EXCLUDED.expense,
+        updated_at = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION transactions_maintain_balances()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_balance_delta(
+            OLD.user_telegram_id, OLD.currency, OLD.type, OLD.category, OLD.description, OLD.amount, -1
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_balance_delta(
+            NEW.user_telegram_id, NEW.currency, NEW.type, NEW.category, NEW.description, NEW.amount, 1
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_balances ON transactions;
+CREATE TRIGGER trg_transactions_balances
+    AFTER INSERT OR UPDATE OR DELETE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION transactions_maintain_balances();
+
+-- Recompute the ledger from transactions and report drift per (user, currency).
+-- With p_dry_run the ledger is left untouched.
+CREATE OR REPLACE FUNCTION rebuild_balances(
+    p_user_telegram_id BIGINT DEFAULT NULL,
+    p_dry_run BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    user_telegram_id BIGINT,
+    currency TEXT,
+    ledger_balance NUMERIC,
+    actual_balance NUMERIC,
+    drift NUMERIC
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    DROP TABLE IF EXISTS _actual_balances;
+    CREATE TEMP TABLE _actual_balances ON COMMIT DROP AS
+    SELECT
+        t.user_telegram_id AS uid,
+        COALESCE(t.currency, 'UAH')::TEXT AS cur,
+        COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'income'), 0) AS income,
+        COALESCE(SUM(t.amount) FILTER (
+            WHERE t.type <> 'income' AND NOT is_internal_transfer(t.category, t.description)
+        ), 0) AS expense
+    FROM transactions t
+    WHERE p_user_telegram_id IS NULL OR t.user_telegram_id = p_user_telegram_id
+    GROUP BY 1, 2;
+
+    RETURN QUERY
+    SELECT
+        COALESCE(a.uid, b.user_telegram_id),
+        COALESCE(a.cur, b.currency)::TEXT,
+        COALESCE(b.balance, 0)::NUMERIC,
+        COALESCE(a.income - a.expense, 0)::NUMERIC,
+        (COALESCE(a.income - a.expense, 0) - COALESCE(b.balance, 0))::NUMERIC
+    FROM _actual_balances a
+    FULL OUTER JOIN (
+        SELECT * FROM balances
+        WHERE p_user_telegram_id IS NULL OR balances.user_telegram_id = p_user_telegram_id
+    ) b ON a.uid = b.user_telegram_id AND a.cur = b.currency;
+
+    IF NOT p_dry_run THEN
+        DELETE FROM balances
+        WHERE p_user_telegram_id IS NULL OR balances.user_telegram_id = p_user_telegram_id;
+
+        INSERT INTO balances (user_telegram_id, currency, income, expense)
+        SELECT uid, cur, income, expense FROM _actual_balances;
+    END IF;
+END;
+$$;
+
+-- Supabase API roles; absent on a plain local Postgres
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        GRANT EXECUTE ON FUNCTION rebuild_balances(BIGINT, BOOLEAN) TO anon, authenticated, service_role;
+    END IF;
+END;
+$$;
+
+-- Seed the ledger from existing history
+SELECT * FROM rebuild_balances();
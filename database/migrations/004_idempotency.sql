@@ -0,0 +1,8 @@
+-- Idempotency keys for transaction inserts
+-- Journal replays upsert on this key, so a transaction is stored at most once
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS idempotency_key UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_idempotency_key
+    ON transactions(idempotency_key);
@@ -0,0 +1,79 @@
+-- One-round-trip statistics for a period, used by Database.get_period_snapshot
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+-- Expenses left out of the stats screen totals: project payouts (Партнерам)
+-- and self-transfers (наличные на карту)
+CREATE OR REPLACE FUNCTION is_stats_excluded_expense(p_category TEXT, p_description TEXT)
+RETURNS BOOLEAN
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(p_category, '') = 'Партнерам'
+        OR (
+            LOWER(COALESCE(p_description, '')) LIKE '%на карту%'
+            AND LOWER(COALESCE(p_description, '')) LIKE '%налич%'
+        );
+$$;
+
+-- Returns {"transaction_count": n,
+--          "totals": {"<currency>": {"income", "expense", "expense_net"}},
+--          "categories": {"expense": [{"category", "total"}], "income": [...]}}
+-- Category breakdowns span all currencies, largest first.
+CREATE OR REPLACE FUNCTION get_period_snapshot(
+    p_user_telegram_id BIGINT,
+    p_start TIMESTAMPTZ DEFAULT NULL,
+    p_end TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    WITH period AS (
+        SELECT
+            amount,
+            type,
+            COALESCE(currency, 'UAH') AS currency,
+            category,
+            is_stats_excluded_expense(category, description) AS excluded
+        FROM transactions
+        WHERE user_telegram_id = p_user_telegram_id
+          AND (p_start IS NULL OR date >= p_start)
+          AND (p_end IS NULL OR date <= p_end)
+    ),
+    totals AS (
+        SELECT
+            currency,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'income'), 0) AS income,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'expense'), 0) AS expense,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'expense' AND NOT excluded), 0) AS expense_net
+        FROM period
+        GROUP BY currency
+    ),
+    categories AS (
+        SELECT type, category, SUM(amount) AS total
+        FROM period
+        GROUP BY type, category
+    )
+    SELECT json_build_object(
+        'transaction_count', (SELECT COUNT(*) FROM period),
+        'totals', COALESCE(
+            (SELECT json_object_agg(
+                currency,
+                json_build_object('income', income, 'expense', expense, 'expense_net', expense_net)
+            ) FROM totals),
+            '{}'::json
+        ),
+        'categories', json_build_object(
+            'expense', COALESCE(
+                (SELECT json_agg(json_build_object('category', category, 'total', total) ORDER BY total DESC)
+                 FROM categories WHERE type = 'expense'),
+                '[]'::json
+            ),
+            'income', COALESCE(
+                (SELECT json_agg(json_build_object('category', category, 'total', total) ORDER BY total DESC)
+                 FROM categories WHERE type = 'income'),
+                '[]'::json
+            )
+        )
+    );
+$$;
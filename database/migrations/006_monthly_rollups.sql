@@ -0,0 +1,166 @@
+-- Monthly rollups read by Database.get_monthly_rollups (year / all-time stats, export)
+-- Requires 005_period_snapshot.sql (is_stats_excluded_expense)
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+-- One row per user x month x type x category x currency x is_team_finance.
+-- excluded_total is the part of total that the stats screen leaves out of
+-- expenses (is_stats_excluded_expense).
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_telegram_id BIGINT NOT NULL,
+    month DATE NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    category VARCHAR(100) NOT NULL DEFAULT '',
+    currency VARCHAR(10) NOT NULL DEFAULT 'UAH',
+    is_team_finance BOOLEAN NOT NULL DEFAULT FALSE,
+    total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    excluded_total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_telegram_id, month, type, category, currency, is_team_finance)
+);
+
+ALTER TABLE monthly_rollups ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow all for monthly_rollups" ON monthly_rollups;
+CREATE POLICY "Allow all for monthly_rollups" ON monthly_rollups FOR ALL USING (true) WITH CHECK (true);
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one transaction from its rollup row
+CREATE OR REPLACE FUNCTION apply_rollup_delta(t transactions, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO monthly_rollups (
+        user_telegram_id, month, type, category, currency, is_team_finance,
+        total, excluded_total, transaction_count
+    )
+    VALUES (
+        t.user_telegram_id,
+        date_trunc('month', t.date AT TIME ZONE 'UTC')::DATE,
+        t.type,
+        COALESCE(t.category, ''),
+        COALESCE(t.currency, 'UAH'),
+        COALESCE(t.is_team_finance, FALSE),
+        p_sign * t.amount,
+        CASE WHEN is_stats_excluded_expense(t.category, t.description) THEN p_sign * t.amount ELSE 0 END,
+        p_sign
+    )
+    ON CONFLICT (user_telegram_id, month, type, category, currency, is_team_finance) DO UPDATE
+    SET total = monthly_rollups.total + EXCLUDED.total,
+        excluded_total = monthly_rollups.excluded_total + EXCLUDED.excluded_total,
+        transaction_count = monthly_rollups.transaction_count + EXCLUDED.transaction_count,
+        updated_at = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION transactions_maintain_rollups()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_rollup_delta(OLD, -1);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_rollup_delta(NEW, 1);
+    END IF;
+
+    -- Drop rows whose transactions have all moved or been deleted
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM monthly_rollups
+        WHERE user_telegram_id = OLD.user_telegram_id
+          AND month = date_trunc('month', OLD.date AT TIME ZONE 'UTC')::DATE
+          AND transaction_count = 0;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_rollups ON transactions;
+CREATE TRIGGER trg_transactions_rollups
+    AFTER INSERT OR UPDATE OR DELETE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION transactions_maintain_rollups();
+
+-- Recompute rollups from transactions and report rows that drifted.
+-- With p_dry_run the rollups are left untouched.
+CREATE OR REPLACE FUNCTION rebuild_monthly_rollups(
+    p_user_telegram_id BIGINT DEFAULT NULL,
+    p_dry_run BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    user_telegram_id BIGINT,
+    month DATE,
+    type TEXT,
+    category TEXT,
+    currency TEXT,
+    is_team_finance BOOLEAN,
+    rollup_total NUMERIC,
+    actual_total NUMERIC,
+    drift NUMERIC
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    DROP TABLE IF EXISTS _actual_rollups;
+    CREATE TEMP TABLE _actual_rollups ON COMMIT DROP AS
+    SELECT
+        t.user_telegram_id AS uid,
+        date_trunc('month', t.date AT TIME ZONE 'UTC')::DATE AS mon,
+        t.type::TEXT AS typ,
+        COALESCE(t.category, '')::TEXT AS cat,
+        COALESCE(t.currency, 'UAH')::TEXT AS cur,
+        COALESCE(t.is_team_finance, FALSE) AS team,
+        SUM(t.amount) AS total,
+        COALESCE(SUM(t.amount) FILTER (WHERE is_stats_excluded_expense(t.category, t.description)), 0) AS excluded_total,
+        COUNT(*)::INTEGER AS cnt
+    FROM transactions t
+    WHERE p_user_telegram_id IS NULL OR t.user_telegram_id = p_user_telegram_id
+    GROUP BY 1, 2, 3, 4, 5, 6;
+
+    RETURN QUERY
+    SELECT
+        COALESCE(a.uid, r.user_telegram_id),
+        COALESCE(a.mon, r.month),
+        COALESCE(a.typ, r.type)::TEXT,
+        COALESCE(a.cat, r.category)::TEXT,
+        COALESCE(a.cur, r.currency)::TEXT,
+        COALESCE(a.team, r.is_team_finance),
+        COALESCE(r.total, 0)::NUMERIC,
+        COALESCE(a.total, 0)::NUMERIC,
+        (COALESCE(a.total, 0) - COALESCE(r.total, 0))::NUMERIC
+    FROM _actual_rollups a
+    FULL OUTER JOIN (
+        SELECT * FROM monthly_rollups
+        WHERE p_user_telegram_id IS NULL OR monthly_rollups.user_telegram_id = p_user_telegram_id
+    ) r ON a.uid = r.user_telegram_id AND a.mon = r.month AND a.typ = r.type
+       AND a.cat = r.category AND a.cur = r.currency AND a.team = r.is_team_finance
+    WHERE COALESCE(a.total, 0) <> COALESCE(r.total, 0)
+       OR COALESCE(a.cnt, 0) <> COALESCE(r.transaction_count, 0);
+
+    IF NOT p_dry_run THEN
+        DELETE FROM monthly_rollups
+        WHERE p_user_telegram_id IS NULL OR monthly_rollups.user_telegram_id = p_user_telegram_id;
+
+        INSERT INTO monthly_rollups (
+            user_telegram_id, month, type, category, currency, is_team_finance,
+            total, excluded_total, transaction_count
+        )
+        SELECT uid, mon, typ, cat, cur, team, total, excluded_total, cnt FROM _actual_rollups;
+    END IF;
+END;
+$$;
+
+-- Supabase API roles; absent on a plain local Postgres
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        GRANT EXECUTE ON FUNCTION rebuild_monthly_rollups(BIGINT, BOOLEAN) TO anon, authenticated, service_role;
+    END IF;
+END;
+$$;
+
+-- Seed the rollups from existing history
+SELECT * FROM rebuild_monthly_rollups();
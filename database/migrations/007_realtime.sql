@@ -0,0 +1,30 @@
+-- Realtime change feed read by services.change_feed.RealtimeChangeFeed
+-- Applied by migrate.py (or run by hand in Supabase Dashboard > SQL Editor)
+
+-- Publish row changes of the tables the bot caches (the publication only
+-- exists on Supabase)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        RETURN;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_publication_tables
+        WHERE pubname = 'supabase_realtime' AND tablename = 'transactions'
+    ) THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE transactions;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_publication_tables
+        WHERE pubname = 'supabase_realtime' AND tablename = 'categories'
+    ) THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE categories;
+    END IF;
+END;
+$$;
+
+-- Deletes carry the whole old row (including user_telegram_id), so the bot
+-- can drop only that user's cached reads
+ALTER TABLE transactions REPLICA IDENTITY FULL;
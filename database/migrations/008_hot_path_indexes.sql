@@ -0,0 +1,31 @@
+-- Composite indexes matching Database's access patterns
+-- Applied by migrate.py; `python migrate.py --explain` checks the hot queries use them
+
+-- get_transactions / iter_transactions / period snapshot: one user, a date
+-- range, keyset-paged by (date, id) descending
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id
+    ON transactions(user_telegram_id, date DESC, id DESC);
+
+-- get_recent_transactions: one user, newest created first
+CREATE INDEX IF NOT EXISTS idx_transactions_user_created
+    ON transactions(user_telegram_id, created_at DESC);
+
+-- Income- or expense-only reads (category stats, transaction_type filters)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date
+    ON transactions(user_telegram_id, type, date);
+
+-- get_recommendations: one user, newest first
+CREATE INDEX IF NOT EXISTS idx_recommendations_user_created
+    ON ai_recommendations(user_telegram_id, created_at DESC);
+
+-- Superseded: prefixes of the composites above, or columns never queried
+-- without the user
+DROP INDEX IF EXISTS idx_transactions_user_date;
+DROP INDEX IF EXISTS idx_transactions_user_id;
+DROP INDEX IF EXISTS idx_transactions_date;
+DROP INDEX IF EXISTS idx_transactions_type;
+DROP INDEX IF EXISTS idx_transactions_category;
+DROP INDEX IF EXISTS idx_recommendations_user_id;
+
+ANALYZE transactions;
+ANALYZE ai_recommendations;
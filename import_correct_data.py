@@ -3,8 +3,10 @@
 """
 
 import os
-from supabase import create_client
 from dotenv import load_dotenv
+from services.database import Database
+from services.supabase_client import create_supabase_client
+from models.transaction import ImportKeys
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -16,11 +18,18 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 USER_ID = 393832759
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+supabase = create_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+store = Database(client=supabase)
+
+# Транзакции копятся здесь и отправляются пачками в flush()
+pending = []
+
+# Ключи строятся из содержимого строки, поэтому повторный запуск не создает дублей
+import_keys = ImportKeys('import_correct_data')
 
 
 def add(amount, type_t, category, description, date='2025-01-01T00:00:00Z', project=None, payment_method=None, currency='UAH'):
-    """Добавить транзакцию"""
+    """Добавить транзакцию в очередь на импорт"""
     try:
         transaction = {
             'user_telegram_id': USER_ID,
@@ -34,14 +43,32 @@ def add(amount, type_t, category, description, date='2025-01-01T00:00:00Z', proj
             'currency': currency,
             'ai_categorized': False
         }
+        transaction['idempotency_key'] = import_keys(transaction)
 
-        result = supabase.table('transactions').insert(transaction).execute()
+        pending.append(transaction)
         return True
     except Exception as e:
         logger.error(f"Ошибка: {e} | {description[:40]}")
         return False
 
 
+def flush() -> int:
+    """Отправить накопленные транзакции пачками, вернуть число добавленных"""
+    result = store.add_transactions(pending)
+
+    for error in result.errors:
+        logger.error(f"Пачка {error['start']}-{error['end'] - 1} не добавлена: {error['error']}")
+        for t in pending[error['start']:error['end']]:
+            logger.error(f"   - {t['type']}: {t['amount']} - {t['description'][:40]}")
+
+    skipped = len(pending) - result.inserted - sum(e['end'] - e['start'] for e in result.errors)
+    if skipped:
+        logger.info(f"Уже импортированы ранее, пропущено: {skipped}")
+
+    pending.clear()
+    return result.inserted
+
+
 def import_data():
     """Импорт всех данных"""
     print("\n" + "="*60)
@@ -248,8 +275,10 @@ def import_data():
     add(250, 'expense', 'Другое', 'Karim пополнение счета', date='2026-01-01T11:00:00Z', payment_method='Карта')
     count += 3
 
+    imported = flush()
+
     print("\n" + "="*60)
-    print(f"✅ Импортировано транзакций: {count}")
+    print(f"✅ Импортировано транзакций: {imported} из {count}")
     print("="*60 + "\n")
 
     # Подсчет итогов
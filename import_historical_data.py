@@ -2,8 +2,11 @@
 
 
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
+from services.database import Database
+from services.supabase_client import create_supabase_client
+from models.transaction import ImportKeys
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -15,11 +18,18 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 USER_TELEGRAM_ID = os.getenv('TELEGRAM_USER_ID', '123456789')
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+supabase: Client = create_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+store = Database(client=supabase)
+
+# Транзакции копятся здесь и отправляются пачками в flush_transactions()
+pending_transactions = []
+
+# Ключи строятся из содержимого строки, поэтому повторный запуск не создает дублей
+import_keys = ImportKeys('import_historical_data')
 
 
 def add_transaction(amount, type_trans, category, description, project=None, payment_method=None):
-    """Добавить транзакцию в базу данных"""
+    """Добавить транзакцию в очередь на импорт"""
     try:
         transaction = {
             'user_telegram_id': int(USER_TELEGRAM_ID),
@@ -32,8 +42,9 @@ def add_transaction(amount, type_trans, category, description, project=None, pay
             'payment_method': payment_method,
             'ai_categorized': False
         }
+        transaction['idempotency_key'] = import_keys(transaction)
 
-        result = supabase.table('transactions').insert(transaction).execute()
+        pending_transactions.append(transaction)
         logger.info(f"✅ {type_trans}: {amount} грн - {description[:40]}")
         return True
     except Exception as e:
@@ -41,6 +52,24 @@ def add_transaction(amount, type_trans, category, description, project=None, pay
         return False
 
 
+def flush_transactions() -> int:
+    """Отправить накопленные транзакции пачками, вернуть число добавленных"""
+    result = store.add_transactions(pending_transactions)
+
+    for error in result.errors:
+        failed = pending_transactions[error['start']:error['end']]
+        logger.error(f"❌ Пачка {error['start']}-{error['end'] - 1} не добавлена: {error['error']}")
+        for t in failed:
+            logger.error(f"   - {t['type']}: {t['amount']} - {t['description'][:40]}")
+
+    skipped = len(pending_transactions) - result.inserted - sum(e['end'] - e['start'] for e in result.errors)
+    if skipped:
+        logger.info(f"⏭️ Уже импортированы ранее, пропущено: {skipped}")
+
+    pending_transactions.clear()
+    return result.inserted
+
+
 def import_all_data():
     """Импорт всех исторических данных"""
     print("\n" + "="*60)
@@ -210,8 +239,10 @@ def import_all_data():
     add_transaction(2500, 'expense', 'Переводы', 'Рахиму', payment_method='Наличные')
     total_count += 5
 
+    imported = flush_transactions()
+
     print("\n" + "="*60)
-    print(f"✅ Импортировано транзакций: {total_count}")
+    print(f"✅ Импортировано транзакций: {imported} из {total_count}")
     print("="*60 + "\n")
 
     # Расчет итогов
@@ -0,0 +1,263 @@
+"""
+Версионные миграции схемы из database/migrations
+Каждый файл NNN_name.sql применяется один раз, в своей транзакции,
+и записывается в таблицу schema_migrations
+
+Использование:
+    python migrate.py               # применить новые миграции
+    python migrate.py --status      # показать, что применено
+    python migrate.py --baseline 7  # отметить 001-007 как примененные (база настроена вручную)
+    python migrate.py --explain     # проверить, что горячие запросы идут по индексам
+
+Подключение берется из DATABASE_URL (строка подключения Postgres из
+Supabase Dashboard > Settings > Database или локальный Postgres)
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+from utils.config import Config
+
+MIGRATIONS_DIR = os.path.join(Config.BASE_DIR, 'database', 'migrations')
+
+# Arbitrary key for pg_advisory_lock so two runners don't apply the same migration
+MIGRATION_LOCK_ID = 4_242_001
+
+# Hot queries of services.database.Database as PostgREST runs them; each must
+# be answerable without a sequential scan
+HOT_QUERIES = [
+    ("get_transactions / iter_transactions", """
+        SELECT id, date, amount, type, currency, category, description FROM transactions
+        WHERE user_telegram_id = %(user)s AND date >= %(start)s AND date <= %(end)s
+        ORDER BY date DESC, id DESC LIMIT 1000
+    """),
+    ("fetch_transactions_page (следующая страница)", """
+        SELECT id, date, amount FROM transactions
+        WHERE user_telegram_id = %(user)s
+          AND (date < %(end)s OR (date = %(end)s AND id < %(id)s))
+        ORDER BY date DESC, id DESC LIMIT 1000
+    """),
+    ("get_recent_transactions", """
+        SELECT * FROM transactions
+        WHERE user_telegram_id = %(user)s
+        ORDER BY created_at DESC LIMIT 10
+    """),
+    ("transaction_type filter / get_category_stats", """
+        SELECT amount, category FROM transactions
+        WHERE user_telegram_id = %(user)s AND type = 'expense'
+          AND date >= %(start)s AND date <= %(end)s
+    """),
+    ("get_period_snapshot", """
+        SELECT amount, type, currency, category, description FROM transactions
+        WHERE user_telegram_id = %(user)s AND date >= %(start)s AND date <= %(end)s
+    """),
+    ("get_monthly_rollups", """
+        SELECT * FROM monthly_rollups
+        WHERE user_telegram_id = %(user)s AND month >= %(start)s::date
+        ORDER BY month, type, category, currency, is_team_finance LIMIT 1000
+    """),
+    ("get_balance", """
+        SELECT currency, income, expense, balance FROM balances
+        WHERE user_telegram_id = %(user)s
+    """),
+    ("get_recommendations", """
+        SELECT * FROM ai_recommendations
+        WHERE user_telegram_id = %(user)s
+        ORDER BY created_at DESC
+    """),
+    ("journal replay (idempotency_key)", """
+        SELECT id FROM transactions WHERE idempotency_key = %(id)s
+    """),
+]
+
+
+def connect():
+    """Подключение к Postgres по DATABASE_URL"""
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ Нужен psycopg2: pip install psycopg2-binary")
+        sys.exit(1)
+
+    if not Config.DATABASE_URL:
+        print("❌ DATABASE_URL не задан в .env")
+        sys.exit(1)
+
+    return psycopg2.connect(Config.DATABASE_URL)
+
+
+def load_migrations():
+    """Файлы миграций по порядку: (версия, имя, SQL, контрольная сумма)"""
+    migrations = []
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '*.sql'))):
+        name = os.path.basename(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            sql = f.read()
+        migrations.append((int(name.split('_', 1)[0]), name, sql, hashlib.sha256(sql.encode()).hexdigest()))
+    return migrations
+
+
+def applied_migrations(conn):
+    """Примененные миграции: версия -> контрольная сумма"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        """)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        rows = dict(cur.fetchall())
+    conn.commit()
+    return rows
+
+
+def check_changed(migrations, applied):
+    """Предупреждаем о примененных миграциях, которые потом отредактировали"""
+    for version, name, _, checksum in migrations:
+        if version in applied and applied[version] != checksum:
+            print(f"⚠️  {name} изменен после применения - правки не попадут в базу, нужна новая миграция")
+
+
+def migrate():
+    """Применяем новые миграции"""
+
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+
+        migrations = load_migrations()
+        applied = applied_migrations(conn)
+        check_changed(migrations, applied)
+
+        pending = [m for m in migrations if m[0] not in applied]
+        if not pending:
+            print("✅ Новых миграций нет")
+            return
+
+        for version, name, sql, checksum in pending:
+            print(f"🔧 {name}...")
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (version, name, checksum)
+                    )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ {name}: {e}")
+                sys.exit(1)
+
+        print(f"\n✅ Применено миграций: {len(pending)}")
+    finally:
+        conn.close()
+
+
+def status():
+    """Показываем, какие миграции применены"""
+
+    conn = connect()
+    try:
+        migrations = load_migrations()
+        applied = applied_migrations(conn)
+
+        for version, name, _, checksum in migrations:
+            if version not in applied:
+                marker = "⏳"
+            elif applied[version] != checksum:
+                marker = "⚠️ "
+            else:
+                marker = "✅"
+            print(f"{marker} {name}")
+    finally:
+        conn.close()
+
+
+def baseline(version: int):
+    """Отмечаем миграции до version как примененные, не выполняя их"""
+
+    conn = connect()
+    try:
+        applied = applied_migrations(conn)
+        with conn.cursor() as cur:
+            for number, name, _, checksum in load_migrations():
+                if number <= version and number not in applied:
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (number, name, checksum)
+                    )
+                    print(f"📌 {name}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def plan_nodes(plan):
+    """Все узлы плана EXPLAIN (FORMAT JSON), рекурсивно"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain():
+    """Проверяем, что горячие запросы не делают последовательного сканирования
+
+    enable_seqscan = off заставляет планировщик взять индекс, если он вообще
+    подходит, так что проверка осмысленна и на почти пустой локальной базе.
+    """
+
+    params = {
+        'user': Config.USER_TELEGRAM_ID or 0,
+        'start': '2025-01-01T00:00:00+00:00',
+        'end': '2025-12-31T23:59:59+00:00',
+        'id': '00000000-0000-0000-0000-000000000000',
+    }
+
+    conn = connect()
+    seq_scans = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+
+            for title, sql in HOT_QUERIES:
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = list(plan_nodes(plan[0]['Plan']))
+
+                scans = [n.get('Relation Name') for n in nodes if n['Node Type'] == 'Seq Scan']
+                indexes = [n['Index Name'] for n in nodes if 'Index Name' in n]
+                needs_sort = any(n['Node Type'] in ('Sort', 'Incremental Sort') for n in nodes)
+
+                if scans:
+                    seq_scans += 1
+                    print(f"❌ {title}: последовательное сканирование {', '.join(scans)}")
+                else:
+                    note = " (+ сортировка)" if needs_sort else ""
+                    print(f"✅ {title}: {', '.join(indexes)}{note}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if seq_scans:
+        print(f"\n❌ Запросов без индекса: {seq_scans}")
+        sys.exit(1)
+    print("\n✅ Все горячие запросы идут по индексам")
+
+
+if __name__ == '__main__':
+    if '--status' in sys.argv:
+        status()
+    elif '--baseline' in sys.argv:
+        baseline(int(sys.argv[sys.argv.index('--baseline') + 1]))
+    elif '--explain' in sys.argv:
+        explain()
+    else:
+        migrate()
@@ -1,8 +1,44 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Union
+from typing import Dict, Optional, Union
+import json
+import uuid
 from utils.date_helper import get_current_date, parse_date_input
 
+# uuid5 namespace for idempotency keys derived from a transaction's origin
+IDEMPOTENCY_NAMESPACE = uuid.UUID('3b8f6c1e-5d47-4f0a-9e2b-7c61a4d8f935')
+
+
+def idempotency_key(*parts) -> str:
+    """Stable idempotency key for the transaction identified by parts
+
+    The same parts (a Telegram chat and message id, an import row) always give
+    the same key, so a retried update or a re-run import upserts onto the row
+    it already created instead of adding a duplicate.
+    """
+    return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, ':'.join(str(part) for part in parts)))
+
+
+class ImportKeys:
+    """Idempotency keys for the rows of an import script
+
+    A row's key is derived from its content; identical rows are told apart by
+    their occurrence number, so every run maps each row to the same key.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._seen: Dict[str, int] = {}
+
+    def __call__(self, row: Dict) -> str:
+        content = json.dumps(
+            {k: v for k, v in row.items() if k != 'idempotency_key'},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        occurrence = self._seen.get(content, 0)
+        self._seen[content] = occurrence + 1
+        return idempotency_key(self.source, content, occurrence)
+
 
 @dataclass
 class Transaction:
@@ -24,6 +60,8 @@ class Transaction:
     original_amount: Optional[float] = None
     original_currency: Optional[str] = None
     is_team_finance: bool = False
+    # Client-generated, so saving the same transaction twice stores it once
+    idempotency_key: Optional[str] = field(default_factory=lambda: str(uuid.uuid4()))
 
     def to_dict(self) -> dict:
         """Convert to dictionary for database insertion"""
@@ -75,6 +113,8 @@ class Transaction:
             data['original_amount'] = self.original_amount
         if self.original_currency:
             data['original_currency'] = self.original_currency
+        if self.idempotency_key:
+            data['idempotency_key'] = self.idempotency_key
 
         return data
 
@@ -102,4 +142,5 @@ class Transaction:
             original_amount=data.get('original_amount'),
             original_currency=data.get('original_currency'),
             is_team_finance=data.get('is_team_finance', False),
+            idempotency_key=data.get('idempotency_key'),
         )
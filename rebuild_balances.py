@@ -0,0 +1,65 @@
+"""
+Пересчет таблиц balances и monthly_rollups из transactions
+Показывает расхождение (drift) между проекциями и реальными суммами
+
+Использование:
+    python rebuild_balances.py            # пересчитать
+    python rebuild_balances.py --dry-run  # только показать расхождения
+"""
+import sys
+from services.database import db
+from utils.config import Config
+
+
+def rebuild(dry_run: bool = False):
+    """Пересчитываем леджер балансов"""
+
+    mode = "Проверка" if dry_run else "Пересчет"
+    print(f"🧮 {mode} леджера балансов...\n")
+
+    rows = db.rebuild_balances(user_id=Config.USER_TELEGRAM_ID, dry_run=dry_run)
+
+    drifted = 0
+    for row in rows:
+        drift = float(row['drift'])
+        marker = "⚠️ " if abs(drift) >= 0.01 else "✅"
+        if abs(drift) >= 0.01:
+            drifted += 1
+
+        print(f"{marker} {row['currency']}: леджер {float(row['ledger_balance']):.2f}, "
+              f"факт {float(row['actual_balance']):.2f}, расхождение {drift:+.2f}")
+
+    if drifted:
+        action = "найдено" if dry_run else "исправлено"
+        print(f"\n⚠️  Расхождений {action}: {drifted}")
+    else:
+        print("\n✅ Леджер совпадает с транзакциями")
+
+
+def rebuild_rollups(dry_run: bool = False):
+    """Пересчитываем месячные сводки"""
+
+    mode = "Проверка" if dry_run else "Пересчет"
+    print(f"\n🧮 {mode} месячных сводок...\n")
+
+    rows = db.rebuild_monthly_rollups(user_id=Config.USER_TELEGRAM_ID, dry_run=dry_run)
+
+    for row in rows:
+        category = row['category'] or 'Без категории'
+        team = " [Команда]" if row['is_team_finance'] else ""
+        print(f"⚠️  {row['month'][:7]} {row['type']} {category} {row['currency']}{team}: "
+              f"сводка {float(row['rollup_total']):.2f}, факт {float(row['actual_total']):.2f}, "
+              f"расхождение {float(row['drift']):+.2f}")
+
+    if rows:
+        action = "найдено" if dry_run else "исправлено"
+        print(f"\n⚠️  Расхождений {action}: {len(rows)}")
+    else:
+        print("✅ Месячные сводки совпадают с транзакциями")
+
+
+if __name__ == '__main__':
+    Config.validate()
+    dry_run = '--dry-run' in sys.argv
+    rebuild(dry_run=dry_run)
+    rebuild_rollups(dry_run=dry_run)
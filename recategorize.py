@@ -0,0 +1,77 @@
+"""
+Перекатегоризация транзакций через AI пачками
+Описания упаковываются в несколько запросов (см. AIService.categorize_batch),
+а изменения записываются одним update_where на каждую новую категорию
+
+Использование:
+    python recategorize.py                      # транзакции из категории "Другое"
+    python recategorize.py --category Переводы  # транзакции из другой категории
+    python recategorize.py --dry-run            # только показать, что изменится
+"""
+import asyncio
+import sys
+from collections import defaultdict
+from services.ai_service import ai_service
+from services.categorization_service import categorization_service
+from services.database import db
+from utils.config import Config
+
+# Сколько id передавать в одном фильтре in (длина URL у PostgREST ограничена)
+IDS_PER_UPDATE = 200
+
+
+def recategorize(source_category: str = 'Другое', dry_run: bool = False):
+    """Подбираем категории для транзакций из source_category"""
+
+    mode = "Проверка" if dry_run else "Перекатегоризация"
+    print(f"🤖 {mode} транзакций из категории \"{source_category}\"...\n")
+
+    transactions = list(db.iter_transactions(
+        Config.USER_TELEGRAM_ID,
+        category=source_category,
+        columns=('id', 'date', 'amount', 'type', 'category', 'description')
+    ))
+    if not transactions:
+        print("✅ Транзакций нет")
+        return
+
+    categories = {
+        transaction_type: [
+            c for c in categorization_service.get_available_categories(transaction_type) if c != source_category
+        ]
+        for transaction_type in ('expense', 'income')
+    }
+    results = asyncio.run(ai_service.categorize_batch(transactions, categories))
+
+    # Новая категория -> id транзакций
+    moves = defaultdict(list)
+    for t, category in zip(transactions, results):
+        if category and category != t['category']:
+            moves[(t['type'], category)].append(t['id'])
+            print(f"   {t['amount']} - {(t.get('description') or '')[:40]} → {category}")
+
+    print(f"\n📊 Транзакций: {len(transactions)}, новая категория найдена: {sum(len(ids) for ids in moves.values())}")
+
+    if dry_run or not moves:
+        return
+
+    updated = 0
+    for (transaction_type, category), ids in moves.items():
+        for start in range(0, len(ids), IDS_PER_UPDATE):
+            result = db.update_where(
+                {
+                    'user_telegram_id': Config.USER_TELEGRAM_ID,
+                    'type': transaction_type,
+                    'id': ('in', ids[start:start + IDS_PER_UPDATE]),
+                },
+                {'category': category, 'ai_categorized': True}
+            )
+            updated += result.count
+
+    print(f"✅ Обновлено транзакций: {updated}")
+
+
+if __name__ == '__main__':
+    Config.validate()
+    source = sys.argv[sys.argv.index('--category') + 1] if '--category' in sys.argv else 'Другое'
+    recategorize(source, dry_run='--dry-run' in sys.argv)
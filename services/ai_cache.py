@@ -0,0 +1,121 @@
+from utils.config import Config
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_entry(text: Optional[str]) -> str:
+    """Case, ё and spacing-insensitive form of a free-text entry; digits are kept"""
+    return ' '.join((text or '').lower().replace('ё', 'е').split()).strip(' .,!?;:')
+
+
+def categories_version(categories: Iterable[str]) -> str:
+    """Short digest of a category list; adding or renaming a category changes it"""
+    return hashlib.sha256('\n'.join(sorted(categories)).encode()).hexdigest()[:16]
+
+
+class AIResponseCache:
+    """Persistent cache of OpenAI answers, keyed by normalized input
+
+    A key combines the kind of call, the model, the normalized text and the
+    version of the category list the answer was chosen from, so new
+    categories or a model change never return stale answers. Entries expire
+    after `ttl` seconds; beyond `max_entries` the least recently used are
+    dropped. Stored in SQLite, so warm entries survive restarts.
+    """
+
+    # Evictions run once per this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(last_used)')
+        self._lock = threading.Lock()
+        self.prune()
+
+    @staticmethod
+    def key(kind: str, model: str, text: str, categories: Iterable[str] = (), *extra) -> str:
+        parts = [kind, model, text, categories_version(categories), *map(str, extra)]
+        return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached answer, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM ai_cache WHERE key = ? AND created_at >= ?', (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE ai_cache SET last_used = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, kind: str, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO ai_cache (key, kind, value, created_at, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, kind, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._writes += 1
+            due = self._writes % self.PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired entries and the least recently used beyond max_entries"""
+        with self._lock:
+            expired = self._conn.execute(
+                'DELETE FROM ai_cache WHERE created_at < ?', (time.time() - self.ttl,)
+            ).rowcount
+            evicted = self._conn.execute("""
+                DELETE FROM ai_cache WHERE key IN (
+                    SELECT key FROM ai_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+        if expired or evicted:
+            logger.info(f"AI cache pruned: {expired} expired, {evicted} evicted")
+        return expired + evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM ai_cache')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'size': size}
+
+
+ai_cache = AIResponseCache(
+    Config.AI_CACHE_PATH,
+    max_entries=Config.AI_CACHE_MAX_ENTRIES,
+    ttl=Config.AI_CACHE_TTL
+) if Config.AI_CACHE_ENABLED else None
@@ -1,23 +1,87 @@
-from openai import OpenAI
+from services.ai_cache import ai_cache, normalize_entry
+from services.local_categorizer import normalize_text
+from services.openai_client import get_async_client, get_client
 from utils.config import Config
+from typing import Any, Dict, List, Optional
+import asyncio
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
+
+def estimate_tokens(text: str) -> int:
+    """Rough GPT-4 token count; Cyrillic runs about two characters per token"""
+    return len(text) // 2 + 1
+
+
+class RateLimiter:
+    """Spaces request starts evenly to stay under requests_per_minute"""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / max(requests_per_minute, 1)
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
 class AIService:
-    """OpenAI AI service for various NLP tasks"""
+    """OpenAI AI service for various NLP tasks
+
+    Every call has a blocking form for scripts and an *_async form for the
+    bot's handlers; both send the same request. The handlers awaiting them
+    (text, voice, photo, recommendations) are registered with block=False,
+    so a slow completion holds up only its own message. Categorisation and
+    parsing answers are kept in ai_cache, so a repeated input skips the
+    network.
+    """
+
+    MODEL = Config.OPENAI_MODEL
 
     @staticmethod
-    def categorize_transaction(description: str, amount: float, transaction_type: str, available_categories: list) -> str:
-        """Automatically categorize a transaction using GPT-4"""
+    def _cache_get(key: Optional[str]) -> Optional[Any]:
+        if ai_cache is None or not key:
+            return None
         try:
-            categories_str = ", ".join(available_categories)
+            return ai_cache.get(key)
+        except Exception as e:
+            logger.error(f"Error reading AI cache: {e}")
+            return None
+
+    @staticmethod
+    def _cache_put(kind: str, key: Optional[str], value: Any):
+        if ai_cache is not None and key:
+            try:
+                ai_cache.put(kind, key, value)
+            except Exception as e:
+                logger.error(f"Error writing AI cache: {e}")
+
+    @staticmethod
+    def _categorize_key(description: str, transaction_type: str, available_categories: list) -> Optional[str]:
+        # The amount is left out: it doesn't change the category
+        if ai_cache is None or not normalize_text(description):
+            return None
+        return ai_cache.key('categorize', AIService.MODEL, normalize_text(description), available_categories, transaction_type)
 
-            prompt = f"""Проанализируй финансовую транзакцию и определи наиболее подходящую категорию.
+    @staticmethod
+    def _parse_key(text: str, available_categories: list) -> Optional[str]:
+        if ai_cache is None or not normalize_entry(text):
+            return None
+        return ai_cache.key('parse', AIService.MODEL, normalize_entry(text), available_categories)
+
+    @staticmethod
+    def _categorize_request(description: str, amount: float, transaction_type: str, available_categories: list) -> dict:
+        categories_str = ", ".join(available_categories)
+
+        prompt = f"""Проанализируй финансовую транзакцию и определи наиболее подходящую категорию.
 
 Описание: {description}
 Сумма: {amount} грн
@@ -27,28 +91,19 @@ class AIService:
 
 Верни ТОЛЬКО название категории из списка выше, без дополнительного текста."""
 
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=50
-            )
-
-            category = response.choices[0].message.content.strip()
-            logger.info(f"AI categorized: {category}")
-            return category
-
-        except Exception as e:
-            logger.error(f"Error in AI categorization: {e}")
-            return "Другое"
+        return dict(
+            model=AIService.MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=50,
+            timeout=Config.OPENAI_TIMEOUT
+        )
 
     @staticmethod
-    def parse_natural_language_transaction(text: str, available_categories: list) -> dict:
-        """Parse natural language transaction input"""
-        try:
-            categories_str = ", ".join(available_categories)
+    def _parse_request(text: str, available_categories: list) -> dict:
+        categories_str = ", ".join(available_categories)
 
-            prompt = f"""Извлеки информацию о финансовой транзакции из текста на русском или украинском языке.
+        prompt = f"""Извлеки информацию о финансовой транзакции из текста на русском или украинском языке.
 
 Текст: "{text}"
 
@@ -65,16 +120,224 @@ class AIService:
 
 Если информация не указана явно, используй логические предположения."""
 
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=200,
-                response_format={"type": "json_object"}
+        return dict(
+            model=AIService.MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            max_tokens=200,
+            response_format={"type": "json_object"},
+            timeout=Config.OPENAI_TIMEOUT
+        )
+
+    @staticmethod
+    def _recommendations_request(snapshot: Dict) -> dict:
+        summary = AIService._summarize_snapshot(snapshot)
+
+        prompt = f"""Ты финансовый советник. На основе данных о тратах за последний период, дай персональные рекомендации.
+
+{summary}
+
+Дай 3-5 конкретных рекомендаций по оптимизации бюджета. Будь конструктивным и практичным."""
+
+        return dict(
+            model=AIService.MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=500,
+            timeout=Config.OPENAI_TIMEOUT
+        )
+
+    @staticmethod
+    def categorize_transaction(description: str, amount: float, transaction_type: str, available_categories: list) -> str:
+        """Automatically categorize a transaction using GPT-4"""
+        key = AIService._categorize_key(description, transaction_type, available_categories)
+        cached = AIService._cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = get_client().chat.completions.create(
+                **AIService._categorize_request(description, amount, transaction_type, available_categories)
+            )
+
+            category = response.choices[0].message.content.strip()
+            logger.info(f"AI categorized: {category}")
+            if key and category in available_categories:
+                AIService._cache_put('categorize', key, category)
+            return category
+
+        except Exception as e:
+            logger.error(f"Error in AI categorization: {e}")
+            return "Другое"
+
+    @staticmethod
+    async def categorize_transaction_async(
+        description: str,
+        amount: float,
+        transaction_type: str,
+        available_categories: list
+    ) -> str:
+        """categorize_transaction without blocking the event loop"""
+        key = AIService._categorize_key(description, transaction_type, available_categories)
+        cached = AIService._cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await get_async_client().chat.completions.create(
+                **AIService._categorize_request(description, amount, transaction_type, available_categories)
+            )
+
+            category = response.choices[0].message.content.strip()
+            logger.info(f"AI categorized: {category}")
+            if key and category in available_categories:
+                AIService._cache_put('categorize', key, category)
+            return category
+
+        except Exception as e:
+            logger.error(f"Error in AI categorization: {e}")
+            return "Другое"
+
+    @staticmethod
+    def _batch_request(items: List[Dict], transaction_type: str, available_categories: list) -> dict:
+        categories_str = ", ".join(available_categories)
+        lines = "\n".join(
+            f"{i}. {item.get('description') or ''} ({item.get('amount', 0)} грн)"
+            for i, item in enumerate(items)
+        )
+
+        prompt = f"""Определи категорию для каждой финансовой транзакции ({"расходы" if transaction_type == "expense" else "доходы"}).
+
+Транзакции:
+{lines}
+
+Доступные категории: {categories_str}
+
+Верни ответ строго в формате JSON, по одному элементу на каждый номер:
+{{"results": [{{"i": <номер>, "category": "<категория из списка>"}}]}}"""
+
+        return dict(
+            model=AIService.MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            max_tokens=20 * len(items) + 50,
+            response_format={"type": "json_object"},
+            timeout=Config.OPENAI_TIMEOUT
+        )
+
+    @staticmethod
+    def _batch_chunks(indexes: List[int], items: List[Dict], available_categories: list) -> List[List[int]]:
+        """Split item indexes into chunks whose prompt fits the token budget"""
+        overhead = estimate_tokens(", ".join(available_categories)) + 150
+        chunks, chunk, used = [], [], overhead
+
+        for index in indexes:
+            cost = estimate_tokens(str(items[index].get('description') or '')) + 10
+            if chunk and (used + cost > Config.AI_BATCH_TOKEN_BUDGET or len(chunk) >= Config.AI_BATCH_MAX_ITEMS):
+                chunks.append(chunk)
+                chunk, used = [], overhead
+            chunk.append(index)
+            used += cost
+
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    async def _categorize_chunk(
+        chunk: List[int],
+        items: List[Dict],
+        transaction_type: str,
+        available_categories: list,
+        results: List[Optional[str]],
+        semaphore: asyncio.Semaphore,
+        limiter: RateLimiter
+    ):
+        chunk_items = [items[index] for index in chunk]
+        async with semaphore:
+            await limiter.wait()
+            try:
+                response = await get_async_client().chat.completions.create(
+                    **AIService._batch_request(chunk_items, transaction_type, available_categories)
+                )
+                answers = json.loads(response.choices[0].message.content).get('results', [])
+            except Exception as e:
+                logger.error(f"Error in batch categorization of {len(chunk)} items: {e}")
+                return
+
+        for answer in answers:
+            try:
+                position = int(answer.get('i'))
+            except (AttributeError, TypeError, ValueError):
+                continue
+            category = answer.get('category')
+            if 0 <= position < len(chunk) and category in available_categories:
+                results[chunk[position]] = category
+                AIService._cache_put(
+                    'categorize',
+                    AIService._categorize_key(chunk_items[position].get('description'), transaction_type, available_categories),
+                    category
+                )
+
+    @staticmethod
+    async def categorize_batch(items: List[Dict], available_categories: Dict[str, list]) -> List[Optional[str]]:
+        """Categorize many transactions with a few packed requests
+
+        items are dicts with description, amount and type; available_categories
+        maps each type to its category list. Returns a category per item, in
+        order, or None where the model gave no valid answer. Cached answers
+        are reused; the rest go out in chunks of at most AI_BATCH_TOKEN_BUDGET
+        estimated prompt tokens, AI_BATCH_CONCURRENCY at a time and no faster
+        than AI_BATCH_REQUESTS_PER_MINUTE.
+        """
+        results: List[Optional[str]] = [None] * len(items)
+        pending: Dict[str, List[int]] = {}
+
+        for index, item in enumerate(items):
+            transaction_type = item.get('type', 'expense')
+            categories = available_categories.get(transaction_type) or []
+            if not categories:
+                continue
+            cached = AIService._cache_get(
+                AIService._categorize_key(item.get('description'), transaction_type, categories)
+            )
+            if cached is not None:
+                results[index] = cached
+            elif normalize_text(item.get('description')):
+                pending.setdefault(transaction_type, []).append(index)
+
+        semaphore = asyncio.Semaphore(Config.AI_BATCH_CONCURRENCY)
+        limiter = RateLimiter(Config.AI_BATCH_REQUESTS_PER_MINUTE)
+        tasks = [
+            AIService._categorize_chunk(
+                chunk, items, transaction_type, available_categories[transaction_type], results, semaphore, limiter
             )
+            for transaction_type, indexes in pending.items()
+            for chunk in AIService._batch_chunks(indexes, items, available_categories[transaction_type])
+        ]
+        await asyncio.gather(*tasks)
+
+        logger.info(
+            f"Batch categorized {sum(1 for r in results if r is not None)}/{len(items)} items "
+            f"with {len(tasks)} requests"
+        )
+        return results
+
+    @staticmethod
+    def parse_natural_language_transaction(text: str, available_categories: list) -> dict:
+        """Parse natural language transaction input"""
+        key = AIService._parse_key(text, available_categories)
+        cached = AIService._cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = get_client().chat.completions.create(**AIService._parse_request(text, available_categories))
 
             result = json.loads(response.choices[0].message.content)
             logger.info(f"Parsed transaction: {result}")
+            if key and 'amount' in result:
+                AIService._cache_put('parse', key, result)
             return result
 
         except Exception as e:
@@ -82,23 +345,33 @@ class AIService:
             return {}
 
     @staticmethod
-    def generate_financial_recommendations(transactions_data: list) -> str:
-        """Generate personalized financial recommendations"""
-        try:
-            summary = AIService._summarize_transactions(transactions_data)
+    async def parse_natural_language_transaction_async(text: str, available_categories: list) -> dict:
+        """parse_natural_language_transaction without blocking the event loop"""
+        key = AIService._parse_key(text, available_categories)
+        cached = AIService._cache_get(key)
+        if cached is not None:
+            return cached
 
-            prompt = f"""Ты финансовый советник. На основе данных о тратах за последний период, дай персональные рекомендации.
+        try:
+            response = await get_async_client().chat.completions.create(
+                **AIService._parse_request(text, available_categories)
+            )
 
-{summary}
+            result = json.loads(response.choices[0].message.content)
+            logger.info(f"Parsed transaction: {result}")
+            if key and 'amount' in result:
+                AIService._cache_put('parse', key, result)
+            return result
 
-Дай 3-5 конкретных рекомендаций по оптимизации бюджета. Будь конструктивным и практичным."""
+        except Exception as e:
+            logger.error(f"Error parsing NLP transaction: {e}")
+            return {}
 
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500
-            )
+    @staticmethod
+    def generate_financial_recommendations(snapshot: Dict) -> str:
+        """Generate personalized financial recommendations from a period snapshot"""
+        try:
+            response = get_client().chat.completions.create(**AIService._recommendations_request(snapshot))
 
             recommendations = response.choices[0].message.content.strip()
             logger.info("Financial recommendations generated")
@@ -109,21 +382,40 @@ class AIService:
             return "Не удалось сгенерировать рекомендации."
 
     @staticmethod
-    def _summarize_transactions(transactions: list) -> str:
-        """Summarize transactions for AI analysis"""
-        category_totals = {}
-        total_expense = 0
+    async def generate_financial_recommendations_async(snapshot: Dict) -> str:
+        """generate_financial_recommendations without blocking the event loop"""
+        try:
+            response = await get_async_client().chat.completions.create(
+                **AIService._recommendations_request(snapshot)
+            )
+
+            recommendations = response.choices[0].message.content.strip()
+            logger.info("Financial recommendations generated")
+            return recommendations
 
-        for t in transactions:
-            if t['type'] == 'expense':
-                category = t.get('category', 'Другое')
-                category_totals[category] = category_totals.get(category, 0) + t['amount']
-                total_expense += t['amount']
+        except Exception as e:
+            logger.error(f"Error generating recommendations: {e}")
+            return "Не удалось сгенерировать рекомендации."
 
-        summary = f"Общие траты: {total_expense:.2f} грн\n\nРаспределение по категориям:\n"
-        for category, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
-            percentage = (amount / total_expense * 100) if total_expense > 0 else 0
-            summary += f"- {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    @staticmethod
+    def _summarize_snapshot(snapshot: Dict) -> str:
+        """Summarize a period snapshot (see build_period_snapshot) for AI analysis
+
+        The snapshot comes from monthly rollups, so the prompt costs the same
+        however many transactions the period holds.
+        """
+        summary = "Общие траты:\n"
+        for currency, totals in sorted(snapshot['totals'].items()):
+            if totals['expense']:
+                summary += f"- {totals['expense']:.2f} {currency}\n"
+
+        expense_categories = snapshot['categories'].get('expense', [])
+        total_expense = sum(row['total'] for row in expense_categories)
+
+        summary += "\nРаспределение по категориям:\n"
+        for row in expense_categories:
+            percentage = (row['total'] / total_expense * 100) if total_expense > 0 else 0
+            summary += f"- {row['category'] or 'Другое'}: {row['total']:.2f} ({percentage:.1f}%)\n"
 
         return summary
 
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class TransactionCache:
+    """Bounded LRU cache for per-user transaction reads
+
+    Entries are tagged with the user and, for single-row reads, the transaction
+    id they came from, so writes can drop exactly the windows they affect.
+    Loads that started before a write are discarded instead of cached, so a
+    slow read can't put stale rows back after an invalidation.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self) -> int:
+        """Current write version; pass it back to put() after loading"""
+        return self._write_version
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value) and refresh the entry's LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry['stored_at'] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry['value']
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        version: int,
+        user_id: Optional[int] = None,
+        transaction_id: Optional[str] = None
+    ):
+        """Store a loaded value unless a write happened while it was loading"""
+        with self._lock:
+            if version != self._write_version:
+                return
+
+            self._entries[key] = {
+                'value': value,
+                'stored_at': time.monotonic(),
+                'user_id': user_id,
+                'transaction_id': transaction_id
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: Optional[int] = None, transaction_id: Optional[str] = None):
+        """Drop entries for a user and/or a transaction; with neither, drop everything"""
+        with self._lock:
+            self._write_version += 1
+
+            if user_id is None and transaction_id is None:
+                dropped = list(self._entries)
+            else:
+                dropped = [
+                    key for key, entry in self._entries.items()
+                    if (user_id is not None and entry['user_id'] == user_id)
+                    or (transaction_id is not None and entry['transaction_id'] == transaction_id)
+                    # Single-row entries loaded without knowing their user
+                    or (user_id is not None and entry['user_id'] is None)
+                ]
+
+            for key in dropped:
+                del self._entries[key]
+            self.invalidations += len(dropped)
+
+    def clear(self):
+        """Drop every entry"""
+        self.invalidate()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -1,12 +1,91 @@
 from services.ai_service import ai_service
-from services.database import db
+from services.database import async_db, db
+from services.local_categorizer import Prediction, local_categorizer
+from services.rule_parser import rule_parser
+from utils.config import Config
+from typing import Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class CategorizationService:
-    """Service for smart categorization of transactions"""
+    """Service for smart categorization of transactions
+
+    Categories are looked up in the local categorizer first (learned from the
+    ledger's history) and only asked of the LLM when it isn't confident.
+    """
+
+    # History columns the local categorizer learns from
+    HISTORY_COLUMNS = ('id', 'date', 'type', 'category', 'description', 'idempotency_key')
+
+    @staticmethod
+    def train_local_categorizer(user_id: int = Config.USER_TELEGRAM_ID):
+        """Learn the user's history and follow writes made by other processes
+
+        Blocking; the bot runs it on a background thread at startup.
+        """
+        if not Config.LOCAL_CATEGORIZER_ENABLED:
+            return
+
+        if db.change_feed is not None:
+            db.change_feed.subscribe(local_categorizer.observe)
+
+        try:
+            local_categorizer.train(db.iter_transactions(user_id, columns=CategorizationService.HISTORY_COLUMNS))
+        except Exception as e:
+            logger.error(f"Error training local categorizer: {e}")
+
+    @staticmethod
+    def learn(transaction_data: Dict):
+        """Teach the local categorizer a transaction that was just saved"""
+        if Config.LOCAL_CATEGORIZER_ENABLED:
+            local_categorizer.learn(transaction_data)
+
+    @staticmethod
+    def predict_category(description: str, transaction_type: str, available_categories: list) -> Optional[Prediction]:
+        """Confident category from history, or None"""
+        if not Config.LOCAL_CATEGORIZER_ENABLED:
+            return None
+        prediction = local_categorizer.predict(description, transaction_type, available_categories)
+        if prediction:
+            logger.info(f"Locally categorized: {prediction.category} ({prediction.source}, {prediction.confidence:.2f})")
+        return prediction
+
+    @staticmethod
+    async def parse_text_async(text: str, expense_categories: list, income_categories: list) -> dict:
+        """Parse a free-text entry, asking the LLM only what rules and history can't settle
+
+        Returns the fields of AIService.parse_natural_language_transaction plus
+        'source': 'rules' when neither the amount nor the category needed the
+        LLM, 'ai' otherwise. Empty dict when nothing could be parsed.
+        """
+        parsed = rule_parser.parse(text)
+
+        if parsed:
+            categories = {'expense': expense_categories, 'income': income_categories}
+            types = [parsed['type']] if parsed['type'] else ['expense', 'income']
+            predictions = [
+                (transaction_type, prediction) for transaction_type in types
+                if (prediction := CategorizationService.predict_category(
+                    parsed['description'], transaction_type, categories[transaction_type]
+                ))
+            ]
+
+            if len(predictions) == 1:
+                transaction_type, prediction = predictions[0]
+                return {**parsed, 'type': transaction_type, 'category': prediction.category, 'source': 'rules'}
+
+            if parsed['type'] and not predictions:
+                # Amount and type are certain; a short categorisation call is enough
+                category = await ai_service.categorize_transaction_async(
+                    parsed['description'], parsed['amount'], parsed['type'], categories[parsed['type']]
+                )
+                if category in categories[parsed['type']]:
+                    return {**parsed, 'category': category, 'source': 'ai'}
+
+        result = await ai_service.parse_natural_language_transaction_async(text, expense_categories + income_categories)
+        return {**result, 'source': 'ai'} if result else {}
 
     @staticmethod
     def get_available_categories(transaction_type: str) -> list:
@@ -14,6 +93,12 @@ class CategorizationService:
         categories = db.get_categories(category_type=transaction_type)
         return [cat['name'] for cat in categories if not cat.get('parent_category')]
 
+    @staticmethod
+    async def get_available_categories_async(transaction_type: str) -> list:
+        """get_available_categories without blocking the event loop"""
+        categories = await async_db.get_categories(category_type=transaction_type)
+        return [cat['name'] for cat in categories if not cat.get('parent_category')]
+
     @staticmethod
     def auto_categorize(description: str, amount: float, transaction_type: str) -> str:
         """Automatically categorize a transaction"""
@@ -23,6 +108,10 @@ class CategorizationService:
             if not available_categories:
                 return "Другое"
 
+            prediction = CategorizationService.predict_category(description, transaction_type, available_categories)
+            if prediction:
+                return prediction.category
+
             category = ai_service.categorize_transaction(
                 description=description,
                 amount=amount,
@@ -41,6 +130,37 @@ class CategorizationService:
             logger.error(f"Error in auto categorization: {e}")
             return "Другое"
 
+    @staticmethod
+    async def auto_categorize_async(description: str, amount: float, transaction_type: str) -> str:
+        """auto_categorize without blocking the event loop"""
+        try:
+            available_categories = await CategorizationService.get_available_categories_async(transaction_type)
+
+            if not available_categories:
+                return "Другое"
+
+            prediction = CategorizationService.predict_category(description, transaction_type, available_categories)
+            if prediction:
+                return prediction.category
+
+            category = await ai_service.categorize_transaction_async(
+                description=description,
+                amount=amount,
+                transaction_type=transaction_type,
+                available_categories=available_categories
+            )
+
+            # Validate that returned category exists
+            if category in available_categories:
+                return category
+            else:
+                logger.warning(f"AI returned invalid category: {category}")
+                return "Другое"
+
+        except Exception as e:
+            logger.error(f"Error in auto categorization: {e}")
+            return "Другое"
+
     @staticmethod
     def suggest_subcategory(parent_category: str, transaction_type: str) -> list:
         """Get subcategories for a parent category"""
@@ -0,0 +1,236 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tables whose writes invalidate in-process caches
+WATCHED_TABLES = ('transactions', 'categories')
+
+
+class ChangeEvent:
+    """One row change: table, type (INSERT/UPDATE/DELETE) and the row before/after"""
+
+    def __init__(self, table: str, type: str, record: Optional[Dict] = None, old_record: Optional[Dict] = None):
+        self.table = table
+        self.type = type
+        self.record = record or {}
+        self.old_record = old_record or {}
+
+    @property
+    def row_id(self) -> Optional[str]:
+        return self.record.get('id') or self.old_record.get('id')
+
+    @property
+    def user_ids(self) -> List[int]:
+        """Owners of the row before and after the change, when known"""
+        ids = []
+        for row in (self.old_record, self.record):
+            user_id = row.get('user_telegram_id')
+            if user_id is not None and user_id not in ids:
+                ids.append(user_id)
+        return ids
+
+    def __repr__(self) -> str:
+        return f"ChangeEvent({self.table}, {self.type}, {self.row_id})"
+
+
+class ChangeFeed(ABC):
+    """Stream of row changes written by any process, delivered to listeners
+
+    Listeners get every ChangeEvent and, through on_status, whether the feed
+    is live. Events can be missed while it is down, so a listener should
+    treat a reconnect (on_status(True)) as "everything may have changed".
+    Callbacks run on the feed's own thread.
+    """
+
+    def __init__(self, tables: Sequence[str] = WATCHED_TABLES):
+        self.tables = tuple(tables)
+        self.connected = False
+        self.events = 0
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self._status_listeners: List[Callable[[bool], None]] = []
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, on_change: Callable[[ChangeEvent], None], on_status: Optional[Callable[[bool], None]] = None):
+        """Register callbacks for changes and for the feed going up or down; repeats are ignored"""
+        if on_change not in self._listeners:
+            self._listeners.append(on_change)
+        if on_status is not None and on_status not in self._status_listeners:
+            self._status_listeners.append(on_status)
+
+    def _dispatch(self, event: ChangeEvent):
+        self.events += 1
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Change listener failed on {event}: {e}")
+
+    def _set_connected(self, connected: bool):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        logger.info(f"Change feed {'connected' if connected else 'disconnected'}")
+        for listener in self._status_listeners:
+            try:
+                listener(connected)
+            except Exception as e:
+                logger.error(f"Change feed status listener failed: {e}")
+
+    def start(self):
+        """Start the feed thread if it isn't running"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f'{type(self).__name__}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._set_connected(False)
+
+    def stats(self) -> Dict:
+        return {'connected': self.connected, 'events': self.events, 'tables': list(self.tables)}
+
+    @abstractmethod
+    def _run(self):
+        """Feed loop, run on the feed's thread until stop() is called"""
+
+
+class RealtimeChangeFeed(ChangeFeed):
+    """Supabase Realtime postgres_changes subscription
+
+    Runs its own event loop on a daemon thread and reconnects with backoff.
+    The watched tables must be in the supabase_realtime publication, and
+    need REPLICA IDENTITY FULL for deletes to carry the row's owner
+    (migrations/007_realtime.sql).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        tables: Sequence[str] = WATCHED_TABLES,
+        max_backoff: float = 60.0
+    ):
+        super().__init__(tables)
+        self.url = url
+        self.key = key
+        self.max_backoff = max_backoff
+
+    def _run(self):
+        asyncio.run(self._listen_forever())
+
+    async def _listen_forever(self):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            try:
+                await self._listen_once()
+                backoff = 1.0
+            except Exception as e:
+                logger.warning(f"Realtime change feed failed, retrying in {backoff:.0f}s: {e}")
+            finally:
+                self._set_connected(False)
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _listen_once(self):
+        """Subscribe and block until the socket drops or the feed is stopped"""
+        from realtime import AsyncRealtimeClient
+
+        client = AsyncRealtimeClient(f"{self.url}/realtime/v1", self.key, auto_reconnect=False)
+        await client.connect()
+        try:
+            channel = client.channel('mywallet-changes')
+            for table in self.tables:
+                channel.on_postgres_changes('*', callback=self._on_payload, table=table, schema='public')
+            await channel.subscribe(self._on_subscribe_state)
+
+            # Older realtime releases pump messages in listen(); newer ones do it
+            # in the background and keep listen() as a no-op
+            listener = asyncio.ensure_future(client.listen())
+            while client.is_connected and not self._stopping.is_set():
+                await asyncio.sleep(1)
+            listener.cancel()
+        finally:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+    def _on_subscribe_state(self, state, error=None):
+        state = getattr(state, 'value', state)
+        if state == 'SUBSCRIBED':
+            self._set_connected(True)
+        else:
+            logger.warning(f"Realtime subscription {state}: {error}")
+            self._set_connected(False)
+
+    def _on_payload(self, payload: Dict):
+        data = payload.get('data', payload)
+        self._dispatch(ChangeEvent(
+            table=data.get('table'),
+            type=str(data.get('type', '')).upper(),
+            record=data.get('record'),
+            old_record=data.get('old_record')
+        ))
+
+
+class SQLiteChangeFeed(ChangeFeed):
+    """Local stand-in for Realtime: tails the change_log table of a SQLite store
+
+    SQLiteDatabase fills change_log from triggers, so writes made by scripts
+    through their own connection are seen too. Rows older than `retention`
+    seconds are pruned.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        tables: Sequence[str] = WATCHED_TABLES,
+        poll_interval: float = 1.0,
+        retention: float = 24 * 3600
+    ):
+        super().__init__(tables)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+            self._set_connected(True)
+
+            while not self._stopping.wait(self.poll_interval):
+                rows = conn.execute(
+                    'SELECT seq, table_name, op, record, old_record FROM change_log WHERE seq > ? ORDER BY seq',
+                    (last_seq,)
+                ).fetchall()
+
+                for seq, table, op, record, old_record in rows:
+                    last_seq = seq
+                    if table in self.tables:
+                        self._dispatch(ChangeEvent(
+                            table, op,
+                            json.loads(record) if record else None,
+                            json.loads(old_record) if old_record else None
+                        ))
+
+                if rows:
+                    conn.execute('DELETE FROM change_log WHERE changed_at < ?', (time.time() - self.retention,))
+        except Exception as e:
+            logger.error(f"SQLite change feed stopped: {e}")
+        finally:
+            conn.close()
+            self._set_connected(False)
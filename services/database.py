@@ -1,253 +1,860 @@
-from supabase import create_client, Client
+from supabase import Client
+from postgrest.types import CountMethod, ReturnMethod
+from services.supabase_client import create_supabase_client
+from services.cache import TransactionCache
+from services.journal import TransactionJournal
+from services.change_feed import ChangeEvent, ChangeFeed, RealtimeChangeFeed, SQLiteChangeFeed
+from services.resilience import CircuitBreaker, DatabaseUnavailableError, Resilience
+from services.storage import (
+    BulkInsertResult, BulkWriteResult, ColumnSet, Columns, Condition, Storage,
+    aggregate_balance, filtered_user_ids, parse_filters, project_row, select_columns,
+    with_idempotency_key
+)
+from services.metrics import instrumented
 from utils.config import Config
-from typing import List, Dict, Optional
-from datetime import datetime
+from utils.image_helper import compress_image, file_digest, receipt_paths
+from typing import AsyncIterator, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import date, datetime
+import asyncio
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
-class Database:
+class Database(Storage):
     """Supabase database service"""
 
-    def __init__(self):
-        self.client: Client = create_client(
-            Config.SUPABASE_URL,
-            Config.SUPABASE_KEY
+    def __init__(
+        self,
+        client: Optional[Client] = None,
+        journal: Optional[TransactionJournal] = None,
+        resilience: Optional[Resilience] = None,
+        change_feed: Optional[ChangeFeed] = None
+    ):
+        self.client: Client = client or create_supabase_client()
+        self.resilience = resilience or Resilience(
+            attempts=Config.DB_RETRY_ATTEMPTS,
+            base_delay=Config.DB_RETRY_BASE_DELAY,
+            max_delay=Config.DB_RETRY_MAX_DELAY,
+            breaker=CircuitBreaker(
+                failure_threshold=Config.DB_BREAKER_THRESHOLD,
+                reset_timeout=Config.DB_BREAKER_RESET_TIMEOUT
+            )
+        )
+        self.journal = journal
+        if journal is not None:
+            journal.sink = self._replay_journal_batch
+        self.change_feed = change_feed
+        self._category_lock = threading.Lock()
+        self._category_cache: Optional[Dict] = None
+        self._category_version = 0
+        self.category_cache_ttl = Config.CATEGORY_CACHE_TTL
+        self._stored_receipts = set()
+        self.transaction_cache = TransactionCache(
+            max_entries=Config.TRANSACTION_CACHE_SIZE,
+            ttl=Config.TRANSACTION_CACHE_TTL
         )
 
+    def _execute(self, query, idempotent: bool = True):
+        """Execute a PostgREST query under the retry and circuit-breaker policy
+
+        Reads and key-based upserts are idempotent and retried on transient
+        errors; plain inserts and updates are sent once.
+        """
+        return self.resilience.call(query.execute, idempotent=idempotent)
+
+    def _insert_chunked(
+        self,
+        table: str,
+        rows: List[Dict],
+        chunk_size: int,
+        on_conflict: Optional[str] = None
+    ) -> BulkInsertResult:
+        """Insert rows with one multi-row request per chunk
+
+        A failing chunk is recorded in the result and the remaining chunks are
+        still sent. With on_conflict, rows that already exist are skipped and
+        matched back to their input position by the conflict columns.
+        """
+        result = BulkInsertResult(rows=[None] * len(rows))
+        key_columns = on_conflict.split(',') if on_conflict else None
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                if on_conflict:
+                    query = self.client.table(table).upsert(
+                        chunk, on_conflict=on_conflict, ignore_duplicates=True, default_to_null=False
+                    )
+                else:
+                    query = self.client.table(table).insert(chunk, default_to_null=False)
+
+                created = self._execute(query, idempotent=bool(on_conflict)).data or []
+            except Exception as e:
+                logger.error(f"Error inserting {table} rows {start}-{start + len(chunk) - 1}: {e}")
+                result.errors.append({
+                    'start': start,
+                    'end': start + len(chunk),
+                    'error': str(e)
+                })
+                continue
+
+            if key_columns:
+                by_key = {tuple(row.get(c) for c in key_columns): row for row in created}
+                for offset, row in enumerate(chunk):
+                    result.rows[start + offset] = by_key.get(tuple(row.get(c) for c in key_columns))
+            else:
+                result.rows[start:start + len(created)] = created
+
+        logger.info(f"Bulk insert into {table}: {result.inserted}/{len(rows)} rows, {len(result.errors)} failed chunks")
+        return result
+
     # ===== TRANSACTIONS =====
 
+    # Reads of transaction windows, single rows and balances go through
+    # transaction_cache; every transaction write invalidates what it touches.
+
+    @instrumented
     def add_transaction(self, transaction_data: Dict) -> Dict:
-        """Add a new transaction"""
+        """Add a new transaction
+
+        With a journal configured the transaction is written to the local
+        journal and returned right away (with its idempotency_key); the
+        journal's flusher delivers it to Supabase in the background. That
+        payload has no database `id` yet, so callers must identify the
+        transaction by idempotency_key instead.
+        Otherwise it is upserted on idempotency_key, so a retried call returns
+        the row the first one stored.
+        """
+        if self.journal is not None:
+            try:
+                return self.journal.append(transaction_data)
+            finally:
+                # The flusher was just woken; cached reads must not outlive the write
+                self.transaction_cache.invalidate(user_id=transaction_data.get('user_telegram_id'))
+
+        transaction_data = with_idempotency_key(transaction_data)
+        key = transaction_data['idempotency_key']
         try:
-            response = self.client.table('transactions').insert(transaction_data).execute()
-            logger.info(f"Transaction added: {response.data}")
+            response = self._execute(self.client.table('transactions').upsert(
+                transaction_data, on_conflict='idempotency_key', ignore_duplicates=True, default_to_null=False
+            ))
+            if response.data:
+                logger.info(f"Transaction added: {response.data}")
+                return response.data[0]
+
+            response = self._execute(self.client.table('transactions').select('*').eq('idempotency_key', key))
+            logger.info(f"Transaction {key} already stored")
             return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"Error adding transaction: {e}")
             raise
+        finally:
+            self.transaction_cache.invalidate(user_id=transaction_data.get('user_telegram_id'))
 
-    def get_transactions(
+    @instrumented
+    def add_transactions(self, rows: List[Dict], chunk_size: int = Config.DB_INSERT_CHUNK_SIZE) -> BulkInsertResult:
+        """Add many transactions using multi-row upserts of chunk_size rows"""
+        try:
+            return self._insert_chunked(
+                'transactions', [with_idempotency_key(row) for row in rows], chunk_size, on_conflict='idempotency_key'
+            )
+        finally:
+            for user_id in {row.get('user_telegram_id') for row in rows}:
+                self.transaction_cache.invalidate(user_id=user_id)
+
+    def _replay_journal_batch(self, rows: List[Dict]):
+        """Deliver journaled transactions, skipping ones already stored"""
+        try:
+            self._execute(self.client.table('transactions').upsert(
+                rows, on_conflict='idempotency_key', ignore_duplicates=True, default_to_null=False
+            ))
+        finally:
+            for user_id in {row.get('user_telegram_id') for row in rows}:
+                self.transaction_cache.invalidate(user_id=user_id)
+
+    def _transactions_query(
         self,
         user_id: int,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         transaction_type: Optional[str] = None,
         category: Optional[str] = None,
-        limit: int = 100
-    ) -> List[Dict]:
-        """Get transactions with optional filters"""
-        try:
-            query = self.client.table('transactions').select('*').eq('user_telegram_id', user_id)
+        columns: ColumnSet = Columns.ALL
+    ):
+        """Build a transactions select with the common filters applied"""
+        query = self.client.table('transactions').select(select_columns(columns)).eq('user_telegram_id', user_id)
+
+        if start_date:
+            query = query.gte('date', start_date.isoformat())
 
-            if start_date:
-                query = query.gte('date', start_date.isoformat())
+        if end_date:
+            query = query.lte('date', end_date.isoformat())
 
-            if end_date:
-                query = query.lte('date', end_date.isoformat())
+        if transaction_type:
+            query = query.eq('type', transaction_type)
 
-            if transaction_type:
-                query = query.eq('type', transaction_type)
+        if category:
+            query = query.eq('category', category)
 
-            if category:
-                query = query.eq('category', category)
+        return query
 
+    @instrumented
+    def get_transactions(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 100,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get transactions with optional filters"""
+        key = (
+            'transactions', user_id, start_date, end_date, transaction_type,
+            category, limit, select_columns(columns)
+        )
+        found, cached = self.transaction_cache.get(key)
+        if found:
+            return cached
+
+        try:
+            version = self.transaction_cache.version()
+            query = self._transactions_query(user_id, start_date, end_date, transaction_type, category, columns)
             query = query.order('date', desc=True).limit(limit)
 
-            response = query.execute()
+            response = self._execute(query)
+            self.transaction_cache.put(key, response.data, version, user_id=user_id)
             return response.data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching transactions: {e}")
             return []
 
-    def get_recent_transactions(self, user_id: int, limit: int = 10) -> List[Dict]:
+    @instrumented
+    def fetch_transactions_page(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        after: Optional[Dict] = None,
+        page_size: int = Config.DB_PAGE_SIZE,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Fetch one page of transactions ordered by (date, id) descending
+
+        `after` is the last row of the previous page; the next page starts
+        strictly below its (date, id) key, so the keyset columns are always
+        added to the projection.
+        """
+        columns = select_columns(columns, required=('date', 'id'))
+        query = self._transactions_query(user_id, start_date, end_date, transaction_type, category, columns)
+
+        if after:
+            last_date = f'"{after["date"]}"'
+            query = query.or_(f'date.lt.{last_date},and(date.eq.{last_date},id.lt.{after["id"]})')
+
+        query = query.order('date', desc=True).order('id', desc=True).limit(page_size)
+        return self._execute(query).data or []
+
+    @instrumented
+    def get_recent_transactions(
+        self,
+        user_id: int,
+        limit: int = 10,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
         """Get most recent transactions"""
+        key = ('recent', user_id, limit, select_columns(columns))
+        found, cached = self.transaction_cache.get(key)
+        if found:
+            return cached
+
         try:
-            response = (
+            version = self.transaction_cache.version()
+            response = self._execute(
                 self.client.table('transactions')
-                .select('*')
+                .select(select_columns(columns))
                 .eq('user_telegram_id', user_id)
                 .order('created_at', desc=True)
                 .limit(limit)
-                .execute()
             )
+            self.transaction_cache.put(key, response.data, version, user_id=user_id)
             return response.data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching recent transactions: {e}")
             return []
 
-    def get_transaction_by_id(self, transaction_id: str) -> Optional[Dict]:
+    @instrumented
+    def get_transaction_by_id(self, transaction_id: str, columns: ColumnSet = Columns.ALL) -> Optional[Dict]:
         """Get a single transaction by ID"""
+        key = ('by_id', transaction_id, select_columns(columns))
+        found, cached = self.transaction_cache.get(key)
+        if found:
+            return cached
+
         try:
-            response = self.client.table('transactions').select('*').eq('id', transaction_id).execute()
-            return response.data[0] if response.data else None
+            version = self.transaction_cache.version()
+            response = self._execute(
+                self.client.table('transactions')
+                .select(select_columns(columns))
+                .eq('id', transaction_id)
+            )
+            row = response.data[0] if response.data else None
+            if row:
+                self.transaction_cache.put(
+                    key, row, version,
+                    user_id=row.get('user_telegram_id'),
+                    transaction_id=transaction_id
+                )
+            return row
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching transaction: {e}")
             return None
 
+    @instrumented
     def update_transaction(self, transaction_id: str, update_data: Dict) -> Dict:
         """Update a transaction"""
         try:
-            response = self.client.table('transactions').update(update_data).eq('id', transaction_id).execute()
+            response = self._execute(
+                self.client.table('transactions').update(update_data).eq('id', transaction_id),
+                idempotent=False
+            )
             logger.info(f"Transaction updated: {transaction_id}")
+            self._invalidate_transaction_rows(transaction_id, response.data)
             return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"Error updating transaction: {e}")
+            self._invalidate_transaction_rows(transaction_id, None)
             raise
 
+    @instrumented
     def delete_transaction(self, transaction_id: str) -> bool:
         """Delete a transaction"""
         try:
-            self.client.table('transactions').delete().eq('id', transaction_id).execute()
+            response = self._execute(self.client.table('transactions').delete().eq('id', transaction_id))
             logger.info(f"Transaction deleted: {transaction_id}")
+            self._invalidate_transaction_rows(transaction_id, response.data)
             return True
         except Exception as e:
             logger.error(f"Error deleting transaction: {e}")
+            self._invalidate_transaction_rows(transaction_id, None)
             return False
 
-    def get_balance(self, user_id: int) -> Dict:
-        """Get current balance by currency - simple income minus expenses"""
-        try:
-            transactions = self.get_transactions(user_id, limit=10000)
-
-            # Group by currency
-            balances = {}
-
-            for t in transactions:
-                currency = t.get('currency', 'UAH')
-                category = t.get('category', '')
-                description = t.get('description', '').lower()
-
-                if currency not in balances:
-                    balances[currency] = {
-                        'income': 0,
-                        'expense': 0,
-                        'balance': 0
-                    }
+    def _invalidate_transaction_rows(self, transaction_id: str, rows: Optional[List[Dict]]):
+        """Drop cached reads affected by a write to one transaction
+
+        The written rows tell us the owning user; without them every cached
+        window is dropped.
+        """
+        user_ids = {row.get('user_telegram_id') for row in rows or []} - {None}
+        if not user_ids:
+            self.transaction_cache.invalidate()
+            return
+
+        for user_id in user_ids:
+            self.transaction_cache.invalidate(user_id=user_id, transaction_id=transaction_id)
+
+    # Bulk writes run as one filtered DELETE/UPDATE on the server. Journaled
+    # inserts are flushed first so the filter sees every transaction.
+
+    @staticmethod
+    def _apply_filters(query, conditions: List[Condition]):
+        """Add parsed filter conditions to a PostgREST query"""
+        for column, operator, value in conditions:
+            if operator == 'in':
+                query = query.in_(column, list(value))
+            elif operator == 'is':
+                query = query.is_(column, 'null' if value is None else str(value).lower())
+            else:
+                query = getattr(query, operator)(column, value)
+        return query
+
+    def _preview_where(self, conditions: List[Condition], preview_limit: int, columns: ColumnSet) -> BulkWriteResult:
+        """Count the rows a bulk write would touch and return the newest of them"""
+        query = self.client.table('transactions').select(select_columns(columns), count=CountMethod.exact)
+        query = self._apply_filters(query, conditions).order('date', desc=True).limit(preview_limit)
+        response = self._execute(query)
+        return BulkWriteResult(count=response.count or 0, rows=response.data or [], dry_run=True)
+
+    def _invalidate_where(self, conditions: List[Condition], values: Optional[Dict] = None):
+        """Drop cached reads of the users a bulk write could have touched"""
+        user_ids = filtered_user_ids(conditions)
+        if user_ids is None or (values and 'user_telegram_id' in values):
+            self.transaction_cache.invalidate()
+            return
+        for user_id in user_ids:
+            self.transaction_cache.invalidate(user_id=user_id)
+
+    @instrumented
+    def delete_where(
+        self,
+        filters: Dict,
+        dry_run: bool = False,
+        preview_limit: int = 100,
+        columns: ColumnSet = Columns.LISTING
+    ) -> BulkWriteResult:
+        """Delete every transaction matching filters in one request
+
+        filters maps columns to a value or an (operator, value) pair, e.g.
+        {'user_telegram_id': uid, 'description': ('ilike', '%налич%')}.
+        With dry_run nothing is deleted and the matching rows are previewed.
+        """
+        conditions = parse_filters(filters)
+        if dry_run:
+            return self._preview_where(conditions, preview_limit, columns)
+
+        if self.journal is not None:
+            self.journal.flush()
 
-                amount = t['amount']
+        try:
+            query = self.client.table('transactions').delete(count=CountMethod.exact, returning=ReturnMethod.minimal)
+            response = self._execute(self._apply_filters(query, conditions))
+            logger.info(f"Transactions deleted by filter: {response.count}")
+            return BulkWriteResult(count=response.count or 0)
+        except Exception as e:
+            logger.error(f"Error deleting transactions by filter: {e}")
+            raise
+        finally:
+            self._invalidate_where(conditions)
 
-                # Skip internal transfers (наличные на карту) - they are not real expenses
-                is_internal_transfer = (
-                    category == 'Переводы' and
-                    ('на карту' in description or ('налич' in description and 'карт' in description))
-                )
+    @instrumented
+    def update_where(
+        self,
+        filters: Dict,
+        values: Dict,
+        dry_run: bool = False,
+        preview_limit: int = 100,
+        columns: ColumnSet = Columns.LISTING
+    ) -> BulkWriteResult:
+        """Set values on every transaction matching filters in one request
+
+        Filters work as in delete_where; the dry run previews the rows as
+        they are before the update.
+        """
+        conditions = parse_filters(filters)
+        if dry_run:
+            return self._preview_where(conditions, preview_limit, columns)
+
+        if self.journal is not None:
+            self.journal.flush()
 
-                if t['type'] == 'income':
-                    balances[currency]['income'] += amount
-                elif not is_internal_transfer:  # Only count real expenses
-                    balances[currency]['expense'] += amount
+        try:
+            query = self.client.table('transactions').update(
+                values, count=CountMethod.exact, returning=ReturnMethod.minimal
+            )
+            response = self._execute(self._apply_filters(query, conditions), idempotent=False)
+            logger.info(f"Transactions updated by filter: {response.count}")
+            return BulkWriteResult(count=response.count or 0)
+        except Exception as e:
+            logger.error(f"Error updating transactions by filter: {e}")
+            raise
+        finally:
+            self._invalidate_where(conditions, values)
 
-                # Calculate balance
-                balances[currency]['balance'] = balances[currency]['income'] - balances[currency]['expense']
+    @instrumented
+    def get_balance(self, user_id: int) -> Dict:
+        """Get current balance by currency - simple income minus expenses"""
+        key = ('balance', user_id)
+        found, cached = self.transaction_cache.get(key)
+        if found:
+            return cached
 
+        try:
+            version = self.transaction_cache.version()
+            balances = self._load_balance(user_id)
+            self.transaction_cache.put(key, balances, version, user_id=user_id)
             return balances
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error calculating balance: {e}")
             return {}
 
-    # ===== CATEGORIES =====
+    def _load_balance(self, user_id: int) -> Dict:
+        """Load balances by currency
 
-    def get_categories(self, category_type: Optional[str] = None) -> List[Dict]:
-        """Get all categories, optionally filtered by type"""
+        Reads the trigger-maintained balances ledger (migrations/003_balances.sql),
+        falling back to the get_balance aggregation function
+        (migrations/002_get_balance.sql) and finally to client-side aggregation.
+        """
+        try:
+            response = self._execute(
+                self.client.table('balances')
+                .select('currency,income,expense,balance')
+                .eq('user_telegram_id', user_id)
+            )
+            if response.data:
+                return self._balance_rows_to_dict(response.data)
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning(f"Balance ledger unavailable, aggregating: {e}")
+
+        try:
+            response = self._execute(self.client.rpc('get_balance', {'p_user_telegram_id': user_id}))
+            return self._balance_rows_to_dict(response.data or [])
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning(f"get_balance RPC failed, aggregating client-side: {e}")
+
+        return aggregate_balance(self.iter_transactions(user_id, columns=Columns.BALANCE))
+
+    @staticmethod
+    def _balance_rows_to_dict(rows: List[Dict]) -> Dict:
+        """Convert (currency, income, expense, balance) rows to the get_balance shape"""
+        balances = {}
+        for row in rows:
+            balances[row['currency']] = {
+                'income': float(row['income']),
+                'expense': float(row['expense']),
+                'balance': float(row['balance'])
+            }
+        return balances
+
+    @instrumented
+    def rebuild_balances(self, user_id: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """Recompute the balances ledger from transactions and return per-currency drift"""
         try:
-            query = self.client.table('categories').select('*')
+            response = self._execute(self.client.rpc(
+                'rebuild_balances',
+                {'p_user_telegram_id': user_id, 'p_dry_run': dry_run}
+            ))
+            logger.info(f"Balances ledger rebuilt (dry_run={dry_run})")
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Error rebuilding balances: {e}")
+            raise
 
-            if category_type:
-                query = query.eq('type', category_type)
+    # ===== CATEGORIES =====
+    # Categories are small and change rarely, so the whole table is cached in
+    # memory with id, type and (name, type) indexes. The cache expires after
+    # category_cache_ttl seconds and is dropped by every category write, ours
+    # or (through the change feed) anyone else's.
+
+    def _category_index(self) -> Dict:
+        """Return the category cache, reloading it when missing or expired
+
+        The lock only guards reading and swapping the cache; the reload runs
+        outside it, so a slow Supabase call doesn't block other readers. A
+        reload that raced an invalidation is returned but not kept.
+        """
+        with self._category_lock:
+            cache = self._category_cache
+            version = self._category_version
+        if cache and time.monotonic() - cache['loaded_at'] < self.category_cache_ttl:
+            return cache
 
-            response = query.order('name').execute()
-            return response.data
+        try:
+            response = self._execute(self.client.table('categories').select('*').order('name'))
+        except Exception as e:
+            if cache:
+                logger.warning(f"Error refreshing categories, serving cached copy: {e}")
+                return cache
+            raise
+
+        rows = response.data or []
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row.get('type'), []).append(row)
+
+        index = {
+            'loaded_at': time.monotonic(),
+            'all': rows,
+            'by_type': by_type,
+            'by_id': {row['id']: row for row in rows if row.get('id')},
+            'by_name': {(row.get('name'), row.get('type')): row for row in rows}
+        }
+        with self._category_lock:
+            if self._category_version == version:
+                self._category_cache = index
+        return index
+
+    def invalidate_categories(self):
+        """Drop the category cache so the next read reloads it"""
+        with self._category_lock:
+            self._category_cache = None
+            self._category_version += 1
+
+    @instrumented
+    def get_categories(
+        self,
+        category_type: Optional[str] = None,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get all categories, optionally filtered by type"""
+        try:
+            index = self._category_index()
+            rows = index['by_type'].get(category_type, []) if category_type else index['all']
+            return [project_row(row, columns) for row in rows]
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching categories: {e}")
             return []
 
+    @instrumented
     def add_category(self, category_data: Dict) -> Dict:
         """Add a new category"""
         try:
-            response = self.client.table('categories').insert(category_data).execute()
+            response = self._execute(self.client.table('categories').insert(category_data), idempotent=False)
             logger.info(f"Category added: {response.data}")
             return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"Error adding category: {e}")
             raise
+        finally:
+            self.invalidate_categories()
 
-    def get_category_by_name(self, name: str, category_type: str) -> Optional[Dict]:
+    @instrumented
+    def add_categories(
+        self,
+        rows: List[Dict],
+        chunk_size: int = Config.DB_INSERT_CHUNK_SIZE,
+        ignore_duplicates: bool = False
+    ) -> BulkInsertResult:
+        """Add many categories; with ignore_duplicates existing (name, type) pairs are skipped"""
+        on_conflict = 'name,type' if ignore_duplicates else None
+        try:
+            return self._insert_chunked('categories', rows, chunk_size, on_conflict=on_conflict)
+        finally:
+            self.invalidate_categories()
+
+    @instrumented
+    def get_category_by_name(
+        self,
+        name: str,
+        category_type: str,
+        columns: ColumnSet = Columns.ALL
+    ) -> Optional[Dict]:
         """Get category by name and type"""
         try:
-            response = self.client.table('categories').select('*').eq('name', name).eq('type', category_type).execute()
-            return response.data[0] if response.data else None
+            row = self._category_index()['by_name'].get((name, category_type))
+            return project_row(row, columns) if row else None
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching category: {e}")
+            return None
+
+    @instrumented
+    def get_category_by_id(self, category_id: str, columns: ColumnSet = Columns.ALL) -> Optional[Dict]:
+        """Get category by ID"""
+        try:
+            row = self._category_index()['by_id'].get(category_id)
+            return project_row(row, columns) if row else None
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching category: {e}")
             return None
 
     # ===== STATISTICS =====
 
-    def get_category_stats(
+    def _scan_period_snapshot(
         self,
         user_id: int,
-        start_date: datetime,
-        end_date: datetime,
-        transaction_type: str
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict:
+        """Period snapshot from one get_period_snapshot RPC (migrations/005_period_snapshot.sql)
+
+        Falls back to a single streamed read aggregated client-side.
+        """
+        try:
+            response = self._execute(self.client.rpc('get_period_snapshot', {
+                'p_user_telegram_id': user_id,
+                'p_start': start_date.isoformat() if start_date else None,
+                'p_end': end_date.isoformat() if end_date else None
+            }))
+            return self._snapshot_from_rpc(response.data)
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning(f"get_period_snapshot RPC failed, aggregating client-side: {e}")
+
+        return super()._scan_period_snapshot(user_id, start_date, end_date)
+
+    @staticmethod
+    def _snapshot_from_rpc(data: Dict) -> Dict:
+        """Convert the RPC's JSON numerics to floats"""
+        return {
+            'transaction_count': data['transaction_count'],
+            'totals': {
+                currency: {name: float(value) for name, value in totals.items()}
+                for currency, totals in (data.get('totals') or {}).items()
+            },
+            'categories': {
+                transaction_type: [
+                    {'category': row['category'], 'total': float(row['total'])}
+                    for row in (data.get('categories') or {}).get(transaction_type) or []
+                ]
+                for transaction_type in ('expense', 'income')
+            }
+        }
+
+    @instrumented
+    def get_monthly_rollups(
+        self,
+        user_id: int,
+        start_month: Optional[date] = None,
+        end_month: Optional[date] = None
     ) -> List[Dict]:
-        """Get spending/income by category for a date range"""
+        """Monthly totals per type, category, currency and is_team_finance
+
+        Reads the trigger-maintained monthly_rollups table
+        (migrations/006_monthly_rollups.sql), falling back to aggregating the
+        months' transactions client-side.
+        """
+        key = ('rollups', user_id, start_month, end_month)
+        found, cached = self.transaction_cache.get(key)
+        if found:
+            return cached
+
+        version = self.transaction_cache.version()
         try:
-            transactions = self.get_transactions(
-                user_id=user_id,
-                start_date=start_date,
-                end_date=end_date,
-                transaction_type=transaction_type,
-                limit=10000
-            )
-
-            category_totals = {}
-            for t in transactions:
-                category = t.get('category', 'Без категории')
-                category_totals[category] = category_totals.get(category, 0) + t['amount']
-
-            stats = [
-                {'category': cat, 'total': total}
-                for cat, total in category_totals.items()
+            rows = []
+            while True:
+                query = (
+                    self.client.table('monthly_rollups')
+                    .select('month,type,category,currency,is_team_finance,total,excluded_total,transaction_count')
+                    .eq('user_telegram_id', user_id)
+                )
+                if start_month:
+                    query = query.gte('month', start_month.isoformat())
+                if end_month:
+                    query = query.lt('month', end_month.isoformat())
+
+                query = (
+                    query.order('month').order('type').order('category')
+                    .order('currency').order('is_team_finance')
+                    .range(len(rows), len(rows) + Config.DB_PAGE_SIZE - 1)
+                )
+                page = self._execute(query).data or []
+                rows.extend(page)
+                if len(page) < Config.DB_PAGE_SIZE:
+                    break
+
+            rollups = [
+                {
+                    **row,
+                    'category': row['category'] or None,
+                    'total': float(row['total']),
+                    'excluded_total': float(row['excluded_total'])
+                }
+                for row in rows
             ]
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning(f"Monthly rollups unavailable, aggregating client-side: {e}")
+            rollups = self._scan_monthly_rollups(user_id, start_month, end_month)
 
-            stats.sort(key=lambda x: x['total'], reverse=True)
-            return stats
+        self.transaction_cache.put(key, rollups, version, user_id=user_id)
+        return rollups
 
+    def rebuild_monthly_rollups(self, user_id: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """Recompute monthly_rollups from transactions and return the rows that drifted"""
+        try:
+            response = self._execute(self.client.rpc(
+                'rebuild_monthly_rollups',
+                {'p_user_telegram_id': user_id, 'p_dry_run': dry_run}
+            ))
+            logger.info(f"Monthly rollups rebuilt (dry_run={dry_run})")
+            if not dry_run:
+                self.transaction_cache.invalidate(user_id=user_id)
+            return response.data or []
         except Exception as e:
-            logger.error(f"Error calculating category stats: {e}")
-            return []
+            logger.error(f"Error rebuilding monthly rollups: {e}")
+            raise
+
+    # ===== CHANGE FEED =====
+    # Import scripts write behind the bot's back; Realtime events for their
+    # rows drop the cached reads they touch. While the feed is live the
+    # caches can keep entries for CHANGE_FEED_CACHE_TTL instead of the short
+    # default TTLs.
+
+    def apply_change(self, event: ChangeEvent):
+        """Drop cached reads made stale by a write from any process"""
+        if event.table == 'categories':
+            self.invalidate_categories()
+        elif event.table == 'transactions':
+            user_ids = event.user_ids
+            if not user_ids:
+                # Without REPLICA IDENTITY FULL a delete carries only the id
+                self.transaction_cache.invalidate()
+            for user_id in user_ids:
+                self.transaction_cache.invalidate(user_id=user_id, transaction_id=event.row_id)
+
+    def on_change_feed_status(self, connected: bool):
+        """Switch cache TTLs with the feed; changes may have been missed either way, so drop everything"""
+        self.transaction_cache.invalidate()
+        self.invalidate_categories()
+
+        if connected:
+            self.transaction_cache.ttl = Config.CHANGE_FEED_CACHE_TTL
+            self.category_cache_ttl = Config.CHANGE_FEED_CACHE_TTL
+        else:
+            self.transaction_cache.ttl = Config.TRANSACTION_CACHE_TTL
+            self.category_cache_ttl = Config.CATEGORY_CACHE_TTL
 
     # ===== AI RECOMMENDATIONS =====
 
+    @instrumented
     def add_recommendation(self, recommendation_data: Dict) -> Dict:
         """Add an AI recommendation"""
         try:
-            response = self.client.table('ai_recommendations').insert(recommendation_data).execute()
+            response = self._execute(self.client.table('ai_recommendations').insert(recommendation_data), idempotent=False)
             logger.info(f"Recommendation added")
             return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"Error adding recommendation: {e}")
             raise
 
-    def get_recommendations(self, user_id: int, unread_only: bool = False) -> List[Dict]:
+    @instrumented
+    def get_recommendations(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
         """Get AI recommendations"""
         try:
-            query = self.client.table('ai_recommendations').select('*').eq('user_telegram_id', user_id)
+            query = (
+                self.client.table('ai_recommendations')
+                .select(select_columns(columns))
+                .eq('user_telegram_id', user_id)
+            )
 
             if unread_only:
                 query = query.eq('is_read', False)
 
-            response = query.order('created_at', desc=True).execute()
+            response = self._execute(query.order('created_at', desc=True))
             return response.data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching recommendations: {e}")
             return []
 
+    @instrumented
     def mark_recommendation_read(self, recommendation_id: str) -> bool:
         """Mark recommendation as read"""
         try:
-            self.client.table('ai_recommendations').update({'is_read': True}).eq('id', recommendation_id).execute()
+            self._execute(self.client.table('ai_recommendations').update({'is_read': True}).eq('id', recommendation_id))
             return True
         except Exception as e:
             logger.error(f"Error marking recommendation as read: {e}")
@@ -255,24 +862,145 @@ class Database:
 
     # ===== STORAGE (for receipt images) =====
 
-    def upload_receipt_image(self, file_path: str, file_name: str) -> Optional[str]:
-        """Upload receipt image to Supabase storage"""
-        try:
-            with open(file_path, 'rb') as file:
-                response = self.client.storage.from_('receipts').upload(
-                    file_name,
-                    file
-                )
+    # Receipts are keyed by the SHA-256 of the photo, so a receipt sent twice
+    # is stored once. Objects are immutable: the key changes with the content.
 
-            if response:
-                public_url = self.client.storage.from_('receipts').get_public_url(file_name)
-                logger.info(f"Receipt uploaded: {public_url}")
-                return public_url
+    def _receipt_stored(self, bucket, digest: str) -> bool:
+        """Whether a receipt with this content hash is already in the bucket"""
+        if digest in self._stored_receipts:
+            return True
 
-            return None
+        path, _ = receipt_paths(digest)
+        folder, name = path.split('/')
+        listed = self.resilience.call(partial(bucket.list, folder, {'search': digest, 'limit': 10}))
+        if any(item.get('name') == name for item in listed or []):
+            self._stored_receipts.add(digest)
+            return True
+        return False
+
+    @instrumented
+    def upload_receipt_image(self, file_path: str) -> Optional[str]:
+        """Upload a compressed receipt and its thumbnail to Supabase storage, skipping known ones"""
+        try:
+            bucket = self.client.storage.from_('receipts')
+            digest = file_digest(file_path)
+            path, thumb_path = receipt_paths(digest)
+
+            if self._receipt_stored(bucket, digest):
+                logger.info(f"Receipt already stored: {path}")
+            else:
+                variants = (
+                    (thumb_path, compress_image(file_path, Config.RECEIPT_THUMB_SIDE, Config.RECEIPT_THUMB_QUALITY)),
+                    (path, compress_image(file_path, Config.RECEIPT_MAX_SIDE, Config.RECEIPT_JPEG_QUALITY)),
+                )
+                # Thumbnail first: the full image's presence marks a complete upload
+                for object_path, data in variants:
+                    self.resilience.call(partial(
+                        bucket.upload, object_path, data,
+                        {'content-type': 'image/jpeg', 'cache-control': '31536000', 'upsert': 'true'}
+                    ))
+                self._stored_receipts.add(digest)
+
+            public_url = bucket.get_public_url(path)
+            logger.info(f"Receipt uploaded: {public_url}")
+            return public_url
         except Exception as e:
             logger.error(f"Error uploading receipt: {e}")
             return None
 
 
-db = Database()
+class AsyncDatabase:
+    """Awaitable facade over Database for use inside async handlers
+
+    Every Database method is exposed under the same name as a coroutine that runs
+    the blocking Supabase call in a bounded thread pool, so a slow round trip
+    doesn't freeze the bot's event loop for other chats.
+    """
+
+    def __init__(self, database: Storage, max_workers: int = Config.DB_MAX_WORKERS):
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking call in the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def iter_transactions(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        page_size: int = Config.DB_PAGE_SIZE,
+        columns: ColumnSet = Columns.ALL
+    ) -> AsyncIterator[Dict]:
+        """Async variant of Database.iter_transactions, one page in flight at a time"""
+        after = None
+        while True:
+            page = await self._run(
+                self._db.fetch_transactions_page,
+                user_id, start_date, end_date, transaction_type, category,
+                after=after, page_size=page_size, columns=columns
+            )
+            for transaction in page:
+                yield transaction
+
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._db, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+
+
+def create_database(backend: Optional[str] = None) -> Storage:
+    """Create the storage backend selected by Config.STORAGE_BACKEND
+
+    'supabase' (default) is the remote store with the offline journal in
+    front of it; 'sqlite' is a local file at Config.SQLITE_PATH for running
+    and benchmarking without the remote service. Either comes with a change
+    feed when CHANGE_FEED_ENABLED; it only runs once start_change_feed() is
+    called, which the bot does and one-off scripts don't.
+    """
+    backend = (backend or Config.STORAGE_BACKEND).lower()
+
+    if backend == 'sqlite':
+        from services.sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(
+            Config.SQLITE_PATH,
+            change_feed=SQLiteChangeFeed(
+                Config.SQLITE_PATH,
+                poll_interval=Config.CHANGE_FEED_POLL_INTERVAL
+            ) if Config.CHANGE_FEED_ENABLED else None
+        )
+
+    if backend == 'supabase':
+        return Database(
+            journal=TransactionJournal(
+                Config.JOURNAL_PATH,
+                batch_size=Config.JOURNAL_BATCH_SIZE,
+                flush_interval=Config.JOURNAL_FLUSH_INTERVAL,
+                max_failures=Config.JOURNAL_MAX_FAILURES
+            ) if Config.JOURNAL_ENABLED else None,
+            change_feed=RealtimeChangeFeed(
+                Config.SUPABASE_URL,
+                Config.SUPABASE_KEY
+            ) if Config.CHANGE_FEED_ENABLED else None
+        )
+
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+db = create_database()
+async_db = AsyncDatabase(db)
@@ -1,8 +1,9 @@
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
-from datetime import datetime
-from services.database import db
+from datetime import datetime, timedelta
+from services.database import db, Columns
+from services.storage import build_monthly_rollups, month_start
 from utils.helpers import format_currency
 from utils.config import Config
 import logging
@@ -19,12 +20,12 @@ class ExportService:
         """Export transactions to Excel file"""
         try:
             # Get transactions
-            transactions = db.get_transactions(
+            transactions = list(db.iter_transactions(
                 user_id=user_id,
                 start_date=start_date,
                 end_date=end_date,
-                limit=10000
-            )
+                columns=Columns.EXPORT
+            ))
 
             # Create workbook
             wb = openpyxl.Workbook()
@@ -36,7 +37,7 @@ class ExportService:
             ExportService._create_category_summary_sheet(wb, transactions)
 
             # Sheet 3: Monthly Summary
-            ExportService._create_monthly_summary_sheet(wb, user_id, start_date, end_date)
+            ExportService._create_monthly_summary_sheet(wb, user_id, start_date, end_date, transactions)
 
             # Save file
             filename = f"MyWallet_Export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
@@ -141,7 +142,7 @@ class ExportService:
         ws.append(["БАЛАНС", total_income - total_expense])
 
     @staticmethod
-    def _create_monthly_summary_sheet(wb, user_id, start_date, end_date):
+    def _create_monthly_summary_sheet(wb, user_id, start_date, end_date, transactions):
         """Create sheet with monthly summary"""
         ws = wb.create_sheet("Месячная сводка")
 
@@ -160,5 +161,32 @@ class ExportService:
             ws.append(["Баланс:", data['balance']])
             ws.append([])
 
+        # Помесячно: целые месяцы периода из monthly_rollups, неполные первый
+        # и последний - из транзакций периода, чтобы не выходить за его границы
+        first_full = month_start(start_date)
+        if first_full < start_date:
+            first_full = (first_full + timedelta(days=32)).replace(day=1)
+        last_partial = month_start(end_date)
+
+        rollups = []
+        if first_full < last_partial:
+            rollups = db.get_monthly_rollups(user_id, first_full.date(), last_partial.date())
+
+        full_months = (first_full.strftime('%Y-%m-01'), last_partial.strftime('%Y-%m-01'))
+        rollups += build_monthly_rollups(
+            t for t in transactions
+            if not full_months[0] <= str(t['date'])[:7] + '-01' < full_months[1]
+        )
+
+        months = {}
+        for row in rollups:
+            totals = months.setdefault((row['month'][:7], row['currency']), {'income': 0, 'expense': 0})
+            if row['type'] in totals:
+                totals[row['type']] += row['total']
+
+        ws.append(["Месяц", "Валюта", "Доход", "Расход", "Баланс"])
+        for (month, currency), totals in sorted(months.items()):
+            ws.append([month, currency, totals['income'], totals['expense'], totals['income'] - totals['expense']])
+
 
 export_service = ExportService()
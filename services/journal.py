@@ -0,0 +1,285 @@
+from services.resilience import TRANSIENT, classify_error
+from typing import Callable, Dict, List, Optional
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionJournal:
+    """Local write-ahead journal for transaction inserts
+
+    Entries are appended to a SQLite file and acknowledged immediately; a
+    background thread replays them to the remote store in batches through
+    `sink`. Every entry carries an idempotency_key, so a batch that is
+    replayed twice (crash after send, retry after timeout) creates each
+    transaction only once.
+
+    Transient errors stop the flush and the flusher retries with backoff. A
+    batch rejected for good is retried one entry at a time, so a single bad
+    entry can't hold up the rest; an entry rejected `max_failures` times is
+    moved to the dead_letter table.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sink: Optional[Callable[[List[Dict]], None]] = None,
+        batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_backoff: float = 60.0,
+        retention: float = 7 * 24 * 3600,
+        max_failures: int = 5
+    ):
+        self.path = path
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self.max_failures = max_failures
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                flushed_at REAL,
+                failures INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Journals written before permanent failures were counted
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(journal)')}
+        if 'failures' not in columns:
+            self._conn.execute('ALTER TABLE journal ADD COLUMN failures INTEGER NOT NULL DEFAULT 0')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_journal_pending ON journal(flushed_at, seq)')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                seq INTEGER PRIMARY KEY,
+                idempotency_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                dead_at REAL NOT NULL
+            )
+        """)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ===== WRITES =====
+
+    def append(self, transaction_data: Dict) -> Dict:
+        """Durably record a transaction and wake the flusher
+
+        Returns the payload with its idempotency_key; appending the same key
+        twice is a no-op.
+        """
+        payload = dict(transaction_data)
+        payload.setdefault('idempotency_key', str(uuid.uuid4()))
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO journal (idempotency_key, payload, created_at) VALUES (?, ?, ?)',
+                (payload['idempotency_key'], json.dumps(payload, ensure_ascii=False, default=str), time.time())
+            )
+
+        logger.info(f"Transaction journaled: {payload['idempotency_key']}")
+        self.start()
+        self._wakeup.set()
+        return payload
+
+    def pending(self, limit: Optional[int] = None, after: int = 0) -> List[Dict]:
+        """Entries not yet acknowledged by the remote store, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, payload FROM journal WHERE flushed_at IS NULL AND seq > ? ORDER BY seq LIMIT ?',
+                (after, limit or -1)
+            ).fetchall()
+        return [{'seq': seq, 'payload': json.loads(payload)} for seq, payload in rows]
+
+    def pending_count(self) -> int:
+        """Number of entries waiting to be flushed"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM journal WHERE flushed_at IS NULL').fetchone()[0]
+
+    def dead_letter_count(self) -> int:
+        """Number of entries given up on after repeated permanent failures"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM dead_letter').fetchone()[0]
+
+    def dead_letters(self, limit: Optional[int] = None) -> List[Dict]:
+        """Dead-lettered entries with their last error, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, payload, attempts, last_error, dead_at FROM dead_letter ORDER BY seq LIMIT ?',
+                (limit or -1,)
+            ).fetchall()
+        return [
+            {'seq': seq, 'payload': json.loads(payload), 'attempts': attempts, 'last_error': error, 'dead_at': dead_at}
+            for seq, payload, attempts, error, dead_at in rows
+        ]
+
+    def stats(self) -> Dict:
+        return {'pending': self.pending_count(), 'dead': self.dead_letter_count()}
+
+    # ===== FLUSHING =====
+
+    def flush(self) -> int:
+        """Replay pending entries to the sink in batches; returns entries flushed
+
+        Raises on the first transient failure, leaving the batch pending for
+        the next try. Entries rejected permanently are skipped until the next
+        flush, or dead-lettered once they have failed max_failures times.
+        """
+        if self.sink is None:
+            return 0
+
+        flushed = 0
+        after = 0
+        while True:
+            batch = self.pending(self.batch_size, after=after)
+            if not batch:
+                break
+            after = batch[-1]['seq']
+
+            seqs = [entry['seq'] for entry in batch]
+            try:
+                self.sink([entry['payload'] for entry in batch])
+            except Exception as e:
+                if classify_error(e) == TRANSIENT:
+                    self._mark(seqs, error=str(e))
+                    raise
+                logger.warning(f"Journal batch rejected, retrying {len(batch)} entries one by one: {e}")
+                flushed += self._flush_one_by_one(batch)
+                continue
+
+            self._mark(seqs)
+            flushed += len(batch)
+
+        if flushed:
+            logger.info(f"Journal flushed {flushed} transactions")
+            self._prune()
+        return flushed
+
+    def _flush_one_by_one(self, batch: List[Dict]) -> int:
+        """Send a rejected batch entry by entry to find the bad ones"""
+        flushed = 0
+        for entry in batch:
+            try:
+                self.sink([entry['payload']])
+            except Exception as e:
+                if classify_error(e) == TRANSIENT:
+                    self._mark([entry['seq']], error=str(e))
+                    raise
+                self._fail(entry, str(e))
+                continue
+
+            self._mark([entry['seq']])
+            flushed += 1
+        return flushed
+
+    def _fail(self, entry: Dict, error: str):
+        """Count a permanent failure, moving the entry to dead_letter after max_failures"""
+        seq = entry['seq']
+        with self._lock:
+            self._conn.execute(
+                'UPDATE journal SET attempts = attempts + 1, failures = failures + 1, last_error = ? WHERE seq = ?',
+                (error[:500], seq)
+            )
+            failures = self._conn.execute('SELECT failures FROM journal WHERE seq = ?', (seq,)).fetchone()[0]
+            if failures < self.max_failures:
+                logger.warning(f"Journal entry {seq} rejected ({failures}/{self.max_failures}): {error}")
+                return
+
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute(
+                'INSERT OR REPLACE INTO dead_letter (seq, idempotency_key, payload, created_at, attempts, last_error, dead_at) '
+                'SELECT seq, idempotency_key, payload, created_at, attempts, last_error, ? FROM journal WHERE seq = ?',
+                (time.time(), seq)
+            )
+            self._conn.execute('DELETE FROM journal WHERE seq = ?', (seq,))
+            self._conn.execute('COMMIT')
+
+        logger.error(
+            f"Journal entry {seq} ({entry['payload'].get('idempotency_key')}) moved to dead letter "
+            f"after {failures} failures: {error}"
+        )
+
+    def _mark(self, seqs: List[int], error: Optional[str] = None):
+        """Record a flush attempt for the given entries"""
+        placeholders = ','.join('?' * len(seqs))
+        with self._lock:
+            if error is None:
+                self._conn.execute(
+                    f'UPDATE journal SET flushed_at = ?, attempts = attempts + 1, last_error = NULL '
+                    f'WHERE seq IN ({placeholders})',
+                    (time.time(), *seqs)
+                )
+            else:
+                self._conn.execute(
+                    f'UPDATE journal SET attempts = attempts + 1, last_error = ? WHERE seq IN ({placeholders})',
+                    (error[:500], *seqs)
+                )
+
+    def _prune(self):
+        """Forget entries acknowledged longer than `retention` seconds ago"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM journal WHERE flushed_at IS NOT NULL AND flushed_at < ?',
+                (time.time() - self.retention,)
+            )
+
+    def start(self):
+        """Start the background flusher thread if it isn't running"""
+        if self.sink is None or (self._thread and self._thread.is_alive()):
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='journal-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the flusher after a final flush attempt"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        """Flusher loop: flush on wakeup or every flush_interval, backing off on errors"""
+        backoff = self.flush_interval
+
+        while True:
+            self._wakeup.wait(backoff)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+                backoff = self.flush_interval
+            except Exception as e:
+                backoff = min(backoff * 2, self.max_backoff)
+                logger.warning(f"Journal flush failed, retrying in {backoff:.1f}s: {e}")
+
+            if self._stopping.is_set():
+                return
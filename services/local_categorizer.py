@@ -0,0 +1,259 @@
+from services.change_feed import ChangeEvent
+from utils.config import Config
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'[^\W\d_]+')
+
+# Words that say nothing about the category
+STOP_WORDS = frozenset({
+    'и', 'в', 'во', 'на', 'с', 'со', 'за', 'из', 'к', 'по', 'для', 'от', 'до', 'у', 'о',
+    'грн', 'uah', 'usd', 'eur', 'доп', 'еще', 'ещё',
+})
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercased letters-only form of a description: 'KFC, 300 грн!' -> 'kfc грн'"""
+    return ' '.join(_WORD.findall((text or '').lower().replace('ё', 'е')))
+
+
+def tokens(text: Optional[str]) -> List[str]:
+    """Meaningful words of a description, normalized"""
+    return [word for word in normalize_text(text).split() if len(word) > 1 and word not in STOP_WORDS]
+
+
+def char_ngrams(normalized: str, n: int = 3) -> Set[str]:
+    """Character n-grams of each word, padded so short words still match"""
+    grams = set()
+    for word in normalized.split():
+        padded = f' {word} '
+        grams.update(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return grams
+
+
+class Prediction(NamedTuple):
+    category: str
+    confidence: float
+    source: str  # 'exact', 'tokens' or 'similar'
+
+
+class LocalCategorizer:
+    """Category guesser learned from the ledger's own (description -> category) history
+
+    Three levels, tried in order, each answering only when it is confident:
+    the exact normalized description, a vote of its words (merchant names
+    like 'kfc' or 'атб' end up pointing at one category), and character
+    trigram similarity to descriptions seen before, which catches typos and
+    word forms ('такси' / 'таксі'). The first two are dictionary lookups.
+
+    Rows are learned once per idempotency_key (or id); updates and deletes
+    seen on the change feed move the counts accordingly.
+    """
+
+    def __init__(
+        self,
+        min_confidence: float = Config.LOCAL_CATEGORIZER_MIN_CONFIDENCE,
+        min_support: int = Config.LOCAL_CATEGORIZER_MIN_SUPPORT,
+        min_similarity: float = Config.LOCAL_CATEGORIZER_MIN_SIMILARITY
+    ):
+        self.min_confidence = min_confidence
+        self.min_support = min_support
+        self.min_similarity = min_similarity
+        self.trained = False
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._seen: Set[str] = set()
+        # (type, normalized description) -> category counts
+        self._exact: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        # (type, word) -> category counts
+        self._tokens: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        # (type, trigram) -> normalized descriptions containing it
+        self._ngram_index: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+
+    # ===== LEARNING =====
+
+    def _add(self, description: Optional[str], category: Optional[str], transaction_type: Optional[str], weight: int):
+        normalized = normalize_text(description)
+        if not normalized or not category or not transaction_type:
+            return
+
+        exact = self._exact[(transaction_type, normalized)]
+        exact[category] += weight
+        for word in set(tokens(description)):
+            self._tokens[(transaction_type, word)][category] += weight
+
+        if weight > 0:
+            for gram in char_ngrams(normalized):
+                self._ngram_index[(transaction_type, gram)].add(normalized)
+        elif not +exact:
+            # Last example of this description is gone
+            del self._exact[(transaction_type, normalized)]
+            for gram in char_ngrams(normalized):
+                self._ngram_index[(transaction_type, gram)].discard(normalized)
+
+    def learn(self, row: Dict) -> bool:
+        """Count one transaction row; rows already counted (by idempotency_key or id) are skipped"""
+        key = row.get('idempotency_key') or row.get('id')
+        with self._lock:
+            if key:
+                key = str(key)
+                if key in self._seen:
+                    return False
+                self._seen.add(key)
+            self._add(row.get('description'), row.get('category'), row.get('type'), 1)
+        return True
+
+    def train(self, rows: Iterable[Dict]) -> int:
+        """Learn from a batch of history rows, return how many were new"""
+        learned = sum(1 for row in rows if self.learn(row))
+        self.trained = True
+        logger.info(f"Local categorizer trained on {learned} transactions, {len(self._exact)} distinct descriptions")
+        return learned
+
+    def observe(self, event: ChangeEvent):
+        """Change feed listener: follow inserts, recategorisations and deletes made elsewhere
+
+        Only events that carry the row's description and category are used
+        (Supabase Realtime does; the SQLite change_log keeps just the owner).
+        """
+        if event.table != 'transactions':
+            return
+
+        if event.type == 'INSERT' and 'category' in event.record:
+            self.learn(event.record)
+        elif event.type == 'UPDATE' and 'category' in event.record and 'category' in event.old_record:
+            with self._lock:
+                self._add(event.old_record.get('description'), event.old_record.get('category'), event.old_record.get('type'), -1)
+                self._add(event.record.get('description'), event.record.get('category'), event.record.get('type'), 1)
+        elif event.type == 'DELETE' and 'category' in event.old_record:
+            with self._lock:
+                self._add(event.old_record.get('description'), event.old_record.get('category'), event.old_record.get('type'), -1)
+
+    # ===== PREDICTION =====
+
+    def _confident(self, counts: Counter, source: str, categories: Optional[Set[str]]) -> Optional[Prediction]:
+        if categories is not None:
+            counts = Counter({c: n for c, n in counts.items() if c in categories})
+        counts = +counts
+        total = sum(counts.values())
+        if total < self.min_support:
+            return None
+
+        category, count = counts.most_common(1)[0]
+        confidence = count / total
+        if confidence < self.min_confidence:
+            return None
+        return Prediction(category, confidence, source)
+
+    def predict(
+        self,
+        description: Optional[str],
+        transaction_type: str,
+        categories: Optional[Iterable[str]] = None
+    ) -> Optional[Prediction]:
+        """Best category for the description, or None when the history isn't conclusive
+
+        categories, when given, limits the answer to categories that still exist.
+        """
+        allowed = set(categories) if categories is not None else None
+        with self._lock:
+            prediction = self._predict(normalize_text(description), description, transaction_type, allowed)
+
+        if prediction:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return prediction
+
+    def _predict(
+        self,
+        normalized: str,
+        description: Optional[str],
+        transaction_type: str,
+        allowed: Optional[Set[str]]
+    ) -> Optional[Prediction]:
+        if not normalized:
+            return None
+
+        exact = self._exact.get((transaction_type, normalized))
+        if exact:
+            prediction = self._confident(exact, 'exact', allowed)
+            if prediction:
+                return prediction
+
+        # Words vote with their own history, weighted by how decided they are:
+        # 'kfc' (always Рестораны) outweighs 'оплата' (spread everywhere)
+        votes = Counter()
+        support = 0
+        for word in set(tokens(description)):
+            counts = self._tokens.get((transaction_type, word))
+            if not counts:
+                continue
+            if allowed is not None:
+                counts = Counter({c: n for c, n in counts.items() if c in allowed})
+            counts = +counts
+            total = sum(counts.values())
+            if total <= 0:
+                continue
+            purity = max(counts.values()) / total
+            weight = purity * math.log1p(total)
+            for category, count in counts.items():
+                votes[category] += weight * count / total
+            support += total
+
+        if votes and support >= self.min_support:
+            category, score = votes.most_common(1)[0]
+            confidence = score / sum(votes.values())
+            if confidence >= self.min_confidence:
+                return Prediction(category, confidence, 'tokens')
+
+        return self._predict_similar(normalized, transaction_type, allowed)
+
+    def _predict_similar(self, normalized: str, transaction_type: str, allowed: Optional[Set[str]]) -> Optional[Prediction]:
+        """Vote of known descriptions whose trigram Dice similarity reaches min_similarity"""
+        grams = char_ngrams(normalized)
+        shared = Counter()
+        for gram in grams:
+            for candidate in self._ngram_index.get((transaction_type, gram), ()):
+                shared[candidate] += 1
+
+        votes = Counter()
+        support = 0
+        for candidate, overlap in shared.most_common(50):
+            score = 2 * overlap / (len(grams) + len(char_ngrams(candidate)))
+            if score < self.min_similarity:
+                continue
+            for category, count in self._exact[(transaction_type, candidate)].items():
+                if count > 0 and (allowed is None or category in allowed):
+                    votes[category] += score * count
+                    support += count
+
+        if not votes or support < self.min_support:
+            return None
+
+        category, score = votes.most_common(1)[0]
+        confidence = score / sum(votes.values())
+        if confidence < self.min_confidence:
+            return None
+        return Prediction(category, confidence, 'similar')
+
+    def stats(self) -> Dict:
+        return {
+            'trained': self.trained,
+            'transactions': len(self._seen),
+            'descriptions': len(self._exact),
+            'words': len(self._tokens),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+local_categorizer = LocalCategorizer()
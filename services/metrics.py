@@ -0,0 +1,228 @@
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+import inspect
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class MethodMetrics:
+    """Counters and latency histogram for one storage method"""
+
+    def __init__(self, samples: int):
+        self.calls = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.rows = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.recent = deque(maxlen=samples)
+
+    def record(self, seconds: float, rows: int, error: bool):
+        self.calls += 1
+        self.errors += int(error)
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.rows += rows
+        self.recent.append(seconds)
+
+        ms = seconds * 1000
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def snapshot(self) -> Dict:
+        recent = sorted(self.recent)
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        labels = [f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS] + ['inf']
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': round(self.latency_total / self.calls * 1000, 2) if self.calls else 0.0,
+            'p50_ms': round(percentile(0.50), 2),
+            'p95_ms': round(percentile(0.95), 2),
+            'p99_ms': round(percentile(0.99), 2),
+            'max_ms': round(self.latency_max * 1000, 2),
+            'rows': self.rows,
+            'rows_per_call': round(self.rows / self.calls, 1) if self.calls else 0.0,
+            'bytes_received': self.bytes_received,
+            'bytes_sent': self.bytes_sent,
+            'histogram': dict(zip(labels, self.buckets)),
+        }
+
+
+def count_rows(result) -> int:
+    """Rows carried by a storage method's return value"""
+    if result is None or isinstance(result, bool):
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if hasattr(result, 'inserted'):
+        return result.inserted
+    if isinstance(getattr(result, 'count', None), int):
+        return result.count
+    if isinstance(result, dict):
+        # get_balance and friends return {currency: {...}}; single rows are flat
+        values = list(result.values())
+        return len(values) if values and all(isinstance(v, dict) for v in values) else int(bool(result))
+    return 1
+
+
+class Metrics:
+    """Per-method latency, row and byte counters for the storage layer
+
+    Methods are timed by the `instrumented` decorator. HTTP byte counts are
+    reported by the Supabase session hooks through add_bytes() and credited to
+    every instrumented method active on the calling thread, so a public call
+    includes the bytes of the queries it makes.
+    """
+
+    def __init__(self, samples: int = 500):
+        self.samples = samples
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._methods: Dict[str, MethodMetrics] = {}
+        self._local = threading.local()
+
+    def _method(self, name: str) -> MethodMetrics:
+        method = self._methods.get(name)
+        if method is None:
+            method = self._methods[name] = MethodMetrics(self.samples)
+        return method
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def track(self, name: str):
+        """Mark `name` as running on this thread so HTTP bytes are credited to it"""
+        stack = self._stack()
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def record(self, name: str, seconds: float, rows: int = 0, error: bool = False):
+        with self._lock:
+            self._method(name).record(seconds, rows, error)
+
+    def add_bytes(self, received: int = 0, sent: int = 0):
+        names = set(self._stack())
+        if not names:
+            return
+        with self._lock:
+            for name in names:
+                method = self._method(name)
+                method.bytes_received += received
+                method.bytes_sent += sent
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Metrics of every method called so far, by method name"""
+        with self._lock:
+            return {name: method.snapshot() for name, method in sorted(self._methods.items())}
+
+    def dump(self, path: Optional[str] = None, extra: Optional[Dict] = None) -> str:
+        """Serialise the metrics as JSON, optionally writing them to path"""
+        data = {
+            'started_at': self.started_at,
+            'generated_at': time.time(),
+            'methods': self.snapshot(),
+        }
+        if extra:
+            data.update(extra)
+
+        payload = json.dumps(data, ensure_ascii=False, indent=2, default=str)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+        return payload
+
+    def report(self, limit: int = 20) -> str:
+        """Plain-text table of the slowest methods by total time"""
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "Нет данных: к базе еще не было запросов."
+
+        ranked = sorted(snapshot.items(), key=lambda item: item[1]['avg_ms'] * item[1]['calls'], reverse=True)
+        lines = [f"{'method':<28}{'calls':>6}{'avg':>8}{'p95':>8}{'rows':>8}{'KB':>8}"]
+        for name, m in ranked[:limit]:
+            lines.append(
+                f"{name[:27]:<28}{m['calls']:>6}{m['avg_ms']:>8.1f}{m['p95_ms']:>8.1f}"
+                f"{m['rows_per_call']:>8.1f}{m['bytes_received'] / 1024:>8.1f}"
+            )
+        return '\n'.join(lines)
+
+
+metrics = Metrics()
+
+
+def instrumented(method):
+    """Time a storage method and count the rows it returns
+
+    Generator methods are measured over the whole iteration, with one row per
+    yielded item; their bytes are credited to the page fetches they make.
+    """
+    name = method.__name__
+
+    if inspect.isgeneratorfunction(method):
+        @wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            rows = 0
+            error = False
+            try:
+                for item in method(*args, **kwargs):
+                    rows += 1
+                    yield item
+            except GeneratorExit:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                metrics.record(name, time.perf_counter() - started, rows, error)
+
+        return generator_wrapper
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = None
+        error = False
+        try:
+            with metrics.track(name):
+                result = method(*args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.record(name, time.perf_counter() - started, count_rows(result), error)
+
+    return wrapper
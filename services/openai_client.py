@@ -0,0 +1,57 @@
+from openai import AsyncOpenAI, OpenAI
+from utils.config import Config
+from typing import Optional
+import httpx
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_timeout() -> httpx.Timeout:
+    """Default timeouts for OpenAI requests; calls pass their own read timeout"""
+    return httpx.Timeout(Config.OPENAI_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT)
+
+
+def get_client() -> OpenAI:
+    """Return the process-wide synchronous OpenAI client (scripts), creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(
+                api_key=Config.OPENAI_API_KEY,
+                timeout=get_timeout(),
+                max_retries=Config.OPENAI_MAX_RETRIES
+            )
+        return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client, creating it on first use
+
+    AI, voice and vision calls from the bot's handlers share it, and with it
+    one pool of keep-alive connections to the API. Its connections belong to
+    the event loop that first uses it, which is the bot's loop.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncOpenAI(
+                api_key=Config.OPENAI_API_KEY,
+                timeout=get_timeout(),
+                max_retries=Config.OPENAI_MAX_RETRIES,
+                http_client=httpx.AsyncClient(
+                    timeout=get_timeout(),
+                    limits=httpx.Limits(
+                        max_connections=Config.OPENAI_POOL_SIZE,
+                        max_keepalive_connections=Config.OPENAI_POOL_SIZE,
+                        keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+                    )
+                )
+            )
+            logger.info(f"AsyncOpenAI client created: {Config.OPENAI_POOL_SIZE} connections")
+        return _async_client
@@ -0,0 +1,196 @@
+from postgrest.exceptions import APIError
+from typing import Callable, Dict, Optional, TypeVar
+import httpx
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# HTTP statuses that mean "try again later" rather than "this request is wrong"
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Postgres / PostgREST codes for connection loss, overload, timeouts and
+# serialization conflicts
+TRANSIENT_CODE_PREFIXES = ('08', '53', '57P', 'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003')
+TRANSIENT_CODES = {'40001', '40P01', '57014'}
+
+
+class DatabaseUnavailableError(Exception):
+    """The database could not be reached: retries ran out or the circuit is open
+
+    Raised instead of returning empty results, so callers can tell
+    "no transactions" from "Supabase is down".
+    """
+
+
+def classify_error(error: Exception) -> str:
+    """Return TRANSIENT for errors worth retrying, PERMANENT otherwise"""
+    if isinstance(error, DatabaseUnavailableError):
+        return TRANSIENT
+
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return TRANSIENT
+
+    if isinstance(error, httpx.HTTPStatusError):
+        return TRANSIENT if error.response.status_code in TRANSIENT_STATUSES else PERMANENT
+
+    if isinstance(error, APIError):
+        code = error.code
+        if isinstance(code, int):
+            return TRANSIENT if code in TRANSIENT_STATUSES else PERMANENT
+        if code and (code in TRANSIENT_CODES or code.startswith(TRANSIENT_CODE_PREFIXES)):
+            return TRANSIENT
+        return PERMANENT
+
+    return PERMANENT
+
+
+class CircuitBreaker:
+    """Fail fast while the remote service is down
+
+    Opens after failure_threshold consecutive transient failures and rejects
+    calls for reset_timeout seconds; then lets a single trial call through
+    (half-open) and closes again if it succeeds.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker closed, database reachable again")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                    logger.warning(f"Circuit breaker opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class Resilience:
+    """Retry and circuit-breaker policy for remote database calls
+
+    Idempotent calls (reads, upserts on a unique key) are retried on
+    transient errors with full-jitter exponential backoff; other writes are
+    tried once. Every call goes through the circuit breaker. Counters are
+    exposed by stats().
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._counters = {
+            'calls': 0,
+            'retries': 0,
+            'transient_errors': 0,
+            'permanent_errors': 0,
+            'rejected': 0,
+            'unavailable': 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def call(self, func: Callable[[], T], idempotent: bool = True) -> T:
+        """Run func under the retry and breaker policy
+
+        Raises DatabaseUnavailableError when the breaker is open or transient
+        errors outlast the retries; permanent errors are re-raised unchanged.
+        """
+        self._count('calls')
+        attempts = self.attempts if idempotent else 1
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self._count('rejected')
+                raise DatabaseUnavailableError("Database circuit is open")
+
+            try:
+                result = func()
+            except Exception as e:
+                if classify_error(e) == PERMANENT:
+                    # The server answered; the request itself is wrong
+                    self.breaker.record_success()
+                    self._count('permanent_errors')
+                    raise
+
+                self.breaker.record_failure()
+                self._count('transient_errors')
+
+                if attempt + 1 >= attempts:
+                    self._count('unavailable')
+                    raise DatabaseUnavailableError(str(e)) from e
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                logger.warning(f"Transient database error, retry {attempt + 1}/{attempts - 1} in {delay:.2f}s: {e}")
+                self._count('retries')
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict:
+        """Retry and breaker counters"""
+        with self._lock:
+            counters = dict(self._counters)
+        counters['breaker_state'] = self.breaker.state
+        counters['breaker_opened'] = self.breaker.opened_count
+        return counters
@@ -0,0 +1,152 @@
+from services.local_categorizer import tokens
+from typing import Dict, List, Optional, Tuple
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Currency written next to the amount: symbols and words, in any case
+CURRENCY_PATTERNS = [
+    ('USD', r'\$|usd|долл\w*|бакс\w*'),
+    ('EUR', r'€|eur|евро'),
+    ('UAH', r'₴|грн\.?|uah|гривен\w*|гривн\w*'),
+]
+
+# Payment method keywords, matched as whole words
+PAYMENT_KEYWORDS = {
+    'card': ('карта', 'картой', 'карте', 'карту', 'карты', 'карточкой', 'card', 'безнал', 'безналом'),
+    'cash': ('нал', 'налом', 'наличные', 'наличными', 'наличка', 'наличкой', 'кеш', 'кэш', 'cash'),
+    'transfer': ('перевод', 'переводом'),
+}
+
+# Words that make an entry an income; a leading + does the same
+INCOME_KEYWORDS = frozenset({
+    'доход', 'зарплата', 'зп', 'аванс', 'получил', 'получила', 'заработал', 'заработала',
+    'пришло', 'пришли', 'вернули', 'возврат', 'кэшбек', 'кешбек',
+})
+
+_CURRENCY = '|'.join(f'(?:{pattern})' for _, pattern in CURRENCY_PATTERNS)
+
+AMOUNT = re.compile(
+    r'(?<![\w.,])'
+    r'(?P<sign>[+-])?\s*'
+    rf'(?:(?P<currency_before>[$€₴])\s*)?'
+    r'(?P<number>\d{1,3}(?:[ \u00a0\u202f]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)'
+    # "1,5к" only when attached: "200 к врачу" is the preposition, not thousands
+    r'(?:(?P<multiplier>к|k|\s*(?:тыс\.?|тис\.?))(?!\w))?'
+    rf'(?:\s*(?P<currency_after>{_CURRENCY})(?!\w))?'
+    r'(?!\w)',
+    re.IGNORECASE
+)
+
+_WORD = re.compile(r'[^\W\d_]+')
+
+# A lone к/k right after the number: a preposition or a spaced-out multiplier
+_SEPARATED_K = re.compile(r'\s+[кk](?!\w)', re.IGNORECASE)
+
+
+def _number(raw: str, multiplied: bool) -> float:
+    """'15 000' -> 15000, '1,5' -> 1.5, '1,200' -> 1200 (a single separator before 3 digits groups thousands)"""
+    digits = re.sub(r'[ \u00a0\u202f]', '', raw)
+    separators = re.findall(r'[.,]', digits)
+    if len(separators) == 1:
+        whole, fraction = re.split(r'[.,]', digits)
+        if len(fraction) == 3 and not multiplied:
+            return float(whole + fraction)
+        return float(f'{whole}.{fraction}')
+    return float(digits)
+
+
+def _currency(token: Optional[str]) -> Optional[str]:
+    if not token:
+        return None
+    for code, pattern in CURRENCY_PATTERNS:
+        if re.fullmatch(pattern, token, re.IGNORECASE):
+            return code
+    return None
+
+
+class RuleParser:
+    """Deterministic parser for short free-text entries
+
+    Handles the usual shapes - "500 такси", "+42000 3д модели", "кофе 65 карта",
+    "$200 подписка", "1,5к продукты" - and returns the same fields as
+    AIService.parse_natural_language_transaction except the category. Anything
+    it can't read unambiguously (no amount, several numbers, a separated
+    "к" after the number, nothing but a number and stop words) returns None
+    and goes to the LLM.
+    """
+
+    @staticmethod
+    def _payment_method(words: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """The single payment method named in the text and the word naming it"""
+        found = [
+            (method, word) for word in words
+            for method, keywords in PAYMENT_KEYWORDS.items() if word in keywords
+        ]
+        # "наличные на карту" names two methods: it's a description, not a payment method
+        if len({method for method, _ in found}) != 1:
+            return None, None
+        return found[0]
+
+    @staticmethod
+    def parse(text: str) -> Optional[Dict]:
+        """amount, type (None when the text gives no hint), currency, description and payment_method"""
+        text = (text or '').strip()
+        if not text or len(text) > 200:
+            return None
+
+        matches = list(AMOUNT.finditer(text))
+        if len(matches) != 1:
+            return None
+        match = matches[0]
+        if _SEPARATED_K.match(text, match.end('number')):
+            return None
+
+        multiplier = match.group('multiplier')
+        amount = _number(match.group('number'), bool(multiplier))
+        if multiplier:
+            amount *= 1000
+        if amount <= 0:
+            return None
+
+        rest = (text[:match.start()] + ' ' + text[match.end():])
+        # Currency written apart from the amount ("65 карта грн") is dropped too
+        currency = _currency(match.group('currency_before')) or _currency(match.group('currency_after'))
+        for code, pattern in CURRENCY_PATTERNS:
+            standalone = re.compile(rf'(?<!\w)(?:{pattern})(?!\w)', re.IGNORECASE)
+            if standalone.search(rest):
+                if currency not in (None, code):
+                    return None
+                currency = code
+                rest = standalone.sub(' ', rest)
+
+        words = [word.lower().replace('ё', 'е') for word in _WORD.findall(rest)]
+        payment_method, payment_word = RuleParser._payment_method(words)
+        if payment_word:
+            rest = re.sub(rf'(?<!\w){payment_word}(?!\w)', ' ', rest, count=1, flags=re.IGNORECASE)
+
+        description = re.sub(r'\s+', ' ', rest).strip(' ,.;:-—')
+        # "100 usd на карту" leaves just "на"
+        if not tokens(description):
+            return None
+
+        if match.group('sign') == '+' or INCOME_KEYWORDS & set(words):
+            transaction_type = 'income'
+        elif match.group('sign') == '-':
+            transaction_type = 'expense'
+        else:
+            transaction_type = None
+
+        result = {
+            'amount': round(amount, 2),
+            'type': transaction_type,
+            'currency': currency or 'UAH',
+            'description': description[:1].upper() + description[1:],
+            'payment_method': payment_method,
+        }
+        logger.info(f"Rule-parsed transaction: {result}")
+        return result
+
+
+rule_parser = RuleParser()
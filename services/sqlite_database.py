@@ -0,0 +1,764 @@
+from services.storage import (
+    BulkInsertResult, BulkWriteResult, ColumnSet, Columns, Condition, Storage,
+    is_internal_transfer, is_stats_excluded_expense, parse_filters, select_columns,
+    with_idempotency_key
+)
+from services.metrics import instrumented
+from services.change_feed import ChangeFeed
+from utils.config import Config
+from utils.image_helper import compress_image, file_digest, receipt_paths
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_telegram_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+    category TEXT,
+    description TEXT,
+    payment_method TEXT,
+    project TEXT,
+    date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    ai_categorized INTEGER DEFAULT 0,
+    voice_transcription TEXT,
+    receipt_image_url TEXT,
+    currency TEXT DEFAULT 'UAH',
+    original_amount REAL,
+    original_currency TEXT,
+    is_team_finance INTEGER DEFAULT 0,
+    idempotency_key TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_telegram_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions(user_telegram_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date ON transactions(user_telegram_id, type, date);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_idempotency_key
+    ON transactions(idempotency_key) WHERE idempotency_key IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+    parent_category TEXT,
+    emoji TEXT,
+    created_at TEXT NOT NULL,
+    UNIQUE(name, type)
+);
+
+CREATE TABLE IF NOT EXISTS ai_recommendations (
+    id TEXT PRIMARY KEY,
+    user_telegram_id INTEGER NOT NULL,
+    recommendation_text TEXT NOT NULL,
+    category TEXT,
+    created_at TEXT NOT NULL,
+    is_read INTEGER DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_recommendations_user_created ON ai_recommendations(user_telegram_id, created_at DESC);
+
+-- Change feed for SQLiteChangeFeed: identifying columns of every written row
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    op TEXT NOT NULL,
+    record TEXT,
+    old_record TEXT,
+    changed_at REAL NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_transactions_insert_log AFTER INSERT ON transactions BEGIN
+    INSERT INTO change_log (table_name, op, record, changed_at)
+    VALUES ('transactions', 'INSERT', json_object('id', NEW.id, 'user_telegram_id', NEW.user_telegram_id), (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_transactions_update_log AFTER UPDATE ON transactions BEGIN
+    INSERT INTO change_log (table_name, op, record, old_record, changed_at)
+    VALUES ('transactions', 'UPDATE', json_object('id', NEW.id, 'user_telegram_id', NEW.user_telegram_id), json_object('id', OLD.id, 'user_telegram_id', OLD.user_telegram_id), (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_transactions_delete_log AFTER DELETE ON transactions BEGIN
+    INSERT INTO change_log (table_name, op, old_record, changed_at)
+    VALUES ('transactions', 'DELETE', json_object('id', OLD.id, 'user_telegram_id', OLD.user_telegram_id), (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_categories_insert_log AFTER INSERT ON categories BEGIN
+    INSERT INTO change_log (table_name, op, record, changed_at)
+    VALUES ('categories', 'INSERT', json_object('id', NEW.id, 'name', NEW.name, 'type', NEW.type), (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_categories_update_log AFTER UPDATE ON categories BEGIN
+    INSERT INTO change_log (table_name, op, record, old_record, changed_at)
+    VALUES ('categories', 'UPDATE', json_object('id', NEW.id, 'name', NEW.name, 'type', NEW.type), json_object('id', OLD.id, 'name', OLD.name, 'type', OLD.type), (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_categories_delete_log AFTER DELETE ON categories BEGIN
+    INSERT INTO change_log (table_name, op, old_record, changed_at)
+    VALUES ('categories', 'DELETE', json_object('id', OLD.id, 'name', OLD.name, 'type', OLD.type), (julianday('now') - 2440587.5) * 86400.0);
+END;
+"""
+
+# SQLite has no boolean type; these columns are stored as 0/1
+BOOLEAN_COLUMNS = {'ai_categorized', 'is_team_finance', 'is_read'}
+
+# Unique keys an insert with ignore_duplicates skips rows on
+CONFLICT_TARGETS = {
+    'transactions': '(idempotency_key) WHERE idempotency_key IS NOT NULL',
+    'categories': '(name, type)',
+}
+
+
+def _timestamp(value) -> str:
+    """Normalise a datetime or ISO string so stored dates sort as text"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace('Z', '+00:00')
+
+
+class SQLiteDatabase(Storage):
+    """Local SQLite storage backend
+
+    Same surface and row shapes as the Supabase Database, backed by a single
+    file, for running the bot without the remote service and for
+    reproducible benchmarks. Transaction reads are served by indexes on
+    (user_telegram_id, date) and (user_telegram_id, created_at); balances are
+    aggregated on the fly, so there is no ledger to rebuild. Triggers log
+    every transaction and category write to change_log for SQLiteChangeFeed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        receipts_dir: str = Config.RECEIPTS_DIR,
+        change_feed: Optional[ChangeFeed] = None
+    ):
+        self.path = path
+        self.receipts_dir = receipts_dir
+        self.change_feed = change_feed
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.create_function(
+            'is_internal_transfer', 2,
+            lambda category, description: is_internal_transfer(
+                {'category': category, 'description': description}
+            ),
+            deterministic=True
+        )
+        self._conn.create_function(
+            'is_stats_excluded_expense', 2,
+            lambda category, description: is_stats_excluded_expense(
+                {'category': category, 'description': description}
+            ),
+            deterministic=True
+        )
+        # SQLite's LOWER() only folds ASCII; ilike filters need Cyrillic too
+        self._conn.create_function(
+            'unicode_lower', 1,
+            lambda value: value.lower() if isinstance(value, str) else value,
+            deterministic=True
+        )
+        self._conn.executescript(SCHEMA)
+
+        # One connection shared by the AsyncDatabase worker threads
+        self._lock = threading.Lock()
+        self._table_columns = {
+            table: [row['name'] for row in self._conn.execute(f'PRAGMA table_info({table})')]
+            for table in ('transactions', 'categories', 'ai_recommendations')
+        }
+
+    # ===== HELPERS =====
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        """Run a read and return rows as dicts"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        for column in BOOLEAN_COLUMNS & data.keys():
+            if data[column] is not None:
+                data[column] = bool(data[column])
+        return data
+
+    def _select(self, table: str, columns: ColumnSet, required: Tuple = ()) -> str:
+        """Render a column set as a quoted select list, rejecting unknown columns"""
+        selected = select_columns(columns, required)
+        if selected == '*':
+            return '*'
+        names = selected.split(',')
+        self._check_columns(table, names)
+        return ', '.join(f'"{name}"' for name in names)
+
+    def _check_columns(self, table: str, names):
+        unknown = [name for name in names if name not in self._table_columns[table]]
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}")
+
+    def _prepare_row(self, table: str, data: Dict) -> Dict:
+        """Fill in the defaults Postgres would apply and encode values for SQLite"""
+        row = dict(data)
+        now = datetime.now().isoformat()
+        row.setdefault('id', str(uuid.uuid4()))
+        row['created_at'] = _timestamp(row.get('created_at') or now)
+        if table == 'transactions':
+            row['date'] = _timestamp(row.get('date') or now)
+        for column in BOOLEAN_COLUMNS & row.keys():
+            if row[column] is not None:
+                row[column] = int(bool(row[column]))
+        self._check_columns(table, row.keys())
+        return row
+
+    def _insert_row(self, table: str, data: Dict, ignore_duplicates: bool = False) -> Optional[Dict]:
+        """Insert one row inside the caller's transaction and return it as stored"""
+        row = self._prepare_row(table, data)
+        names = ', '.join(f'"{name}"' for name in row)
+        placeholders = ', '.join('?' for _ in row)
+        sql = f'INSERT INTO {table} ({names}) VALUES ({placeholders})'
+        if ignore_duplicates:
+            sql += f' ON CONFLICT {CONFLICT_TARGETS[table]} DO NOTHING'
+
+        cursor = self._conn.execute(sql, tuple(row.values()))
+        if cursor.rowcount == 0:
+            return None
+
+        stored = self._conn.execute(f'SELECT * FROM {table} WHERE id = ?', (row['id'],)).fetchone()
+        return self._row_to_dict(stored)
+
+    def _insert_chunked(
+        self,
+        table: str,
+        rows: List[Dict],
+        chunk_size: int,
+        ignore_duplicates: bool = False
+    ) -> BulkInsertResult:
+        """Insert rows with one SQLite transaction per chunk
+
+        A failing chunk is rolled back and recorded in the result; the
+        remaining chunks are still written.
+        """
+        result = BulkInsertResult(rows=[None] * len(rows))
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            with self._lock:
+                try:
+                    self._conn.execute('BEGIN')
+                    created = [self._insert_row(table, row, ignore_duplicates) for row in chunk]
+                    self._conn.execute('COMMIT')
+                except Exception as e:
+                    self._conn.execute('ROLLBACK')
+                    logger.error(f"Error inserting {table} rows {start}-{start + len(chunk) - 1}: {e}")
+                    result.errors.append({
+                        'start': start,
+                        'end': start + len(chunk),
+                        'error': str(e)
+                    })
+                    continue
+
+            result.rows[start:start + len(chunk)] = created
+
+        logger.info(f"Bulk insert into {table}: {result.inserted}/{len(rows)} rows, {len(result.errors)} failed chunks")
+        return result
+
+    def _transactions_where(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> Tuple[str, List]:
+        """Build the WHERE clause for the common transaction filters"""
+        clauses = ['user_telegram_id = ?']
+        params = [user_id]
+
+        if start_date:
+            clauses.append('date >= ?')
+            params.append(_timestamp(start_date))
+
+        if end_date:
+            clauses.append('date <= ?')
+            params.append(_timestamp(end_date))
+
+        if transaction_type:
+            clauses.append('type = ?')
+            params.append(transaction_type)
+
+        if category:
+            clauses.append('category = ?')
+            params.append(category)
+
+        return ' AND '.join(clauses), params
+
+    # ===== TRANSACTIONS =====
+
+    @instrumented
+    def add_transaction(self, transaction_data: Dict) -> Dict:
+        """Add a new transaction; a repeated idempotency_key returns the stored row"""
+        transaction_data = with_idempotency_key(transaction_data)
+        try:
+            with self._lock:
+                created = self._insert_row('transactions', transaction_data, ignore_duplicates=True)
+                if created is None and transaction_data.get('idempotency_key'):
+                    existing = self._conn.execute(
+                        'SELECT * FROM transactions WHERE idempotency_key = ?',
+                        (transaction_data['idempotency_key'],)
+                    ).fetchone()
+                    created = self._row_to_dict(existing) if existing else None
+            logger.info(f"Transaction added: {created}")
+            return created or {}
+        except Exception as e:
+            logger.error(f"Error adding transaction: {e}")
+            raise
+
+    @instrumented
+    def add_transactions(self, rows: List[Dict], chunk_size: int = Config.DB_INSERT_CHUNK_SIZE) -> BulkInsertResult:
+        """Add many transactions, one SQLite transaction per chunk"""
+        return self._insert_chunked(
+            'transactions', [with_idempotency_key(row) for row in rows], chunk_size, ignore_duplicates=True
+        )
+
+    @instrumented
+    def get_transactions(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 100,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get transactions with optional filters"""
+        try:
+            where, params = self._transactions_where(user_id, start_date, end_date, transaction_type, category)
+            return self._query(
+                f'SELECT {self._select("transactions", columns)} FROM transactions '
+                f'WHERE {where} ORDER BY date DESC LIMIT ?',
+                (*params, limit)
+            )
+        except Exception as e:
+            logger.error(f"Error fetching transactions: {e}")
+            return []
+
+    @instrumented
+    def fetch_transactions_page(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        after: Optional[Dict] = None,
+        page_size: int = Config.DB_PAGE_SIZE,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Fetch one page of transactions ordered by (date, id) descending"""
+        where, params = self._transactions_where(user_id, start_date, end_date, transaction_type, category)
+
+        if after:
+            where += ' AND (date < ? OR (date = ? AND id < ?))'
+            params += [after['date'], after['date'], after['id']]
+
+        return self._query(
+            f'SELECT {self._select("transactions", columns, required=("date", "id"))} FROM transactions '
+            f'WHERE {where} ORDER BY date DESC, id DESC LIMIT ?',
+            (*params, page_size)
+        )
+
+    @instrumented
+    def get_recent_transactions(
+        self,
+        user_id: int,
+        limit: int = 10,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get most recent transactions"""
+        try:
+            return self._query(
+                f'SELECT {self._select("transactions", columns)} FROM transactions '
+                f'WHERE user_telegram_id = ? ORDER BY created_at DESC LIMIT ?',
+                (user_id, limit)
+            )
+        except Exception as e:
+            logger.error(f"Error fetching recent transactions: {e}")
+            return []
+
+    @instrumented
+    def get_transaction_by_id(self, transaction_id: str, columns: ColumnSet = Columns.ALL) -> Optional[Dict]:
+        """Get a single transaction by ID"""
+        try:
+            rows = self._query(
+                f'SELECT {self._select("transactions", columns)} FROM transactions WHERE id = ?',
+                (transaction_id,)
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.error(f"Error fetching transaction: {e}")
+            return None
+
+    @instrumented
+    def update_transaction(self, transaction_id: str, update_data: Dict) -> Dict:
+        """Update a transaction"""
+        try:
+            values = dict(update_data)
+            if 'date' in values:
+                values['date'] = _timestamp(values['date'])
+            for column in BOOLEAN_COLUMNS & values.keys():
+                if values[column] is not None:
+                    values[column] = int(bool(values[column]))
+            self._check_columns('transactions', values.keys())
+
+            assignments = ', '.join(f'"{name}" = ?' for name in values)
+            with self._lock:
+                self._conn.execute(
+                    f'UPDATE transactions SET {assignments} WHERE id = ?',
+                    (*values.values(), transaction_id)
+                )
+                row = self._conn.execute('SELECT * FROM transactions WHERE id = ?', (transaction_id,)).fetchone()
+            logger.info(f"Transaction updated: {transaction_id}")
+            return self._row_to_dict(row) if row else {}
+        except Exception as e:
+            logger.error(f"Error updating transaction: {e}")
+            raise
+
+    @instrumented
+    def delete_transaction(self, transaction_id: str) -> bool:
+        """Delete a transaction"""
+        try:
+            with self._lock:
+                self._conn.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+            logger.info(f"Transaction deleted: {transaction_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting transaction: {e}")
+            return False
+
+    def _where(self, conditions: List[Condition]) -> Tuple[str, Tuple]:
+        """Render parsed filter conditions as a WHERE clause and its parameters"""
+        self._check_columns('transactions', [column for column, _, _ in conditions])
+
+        clauses, params = [], []
+        for column, operator, value in conditions:
+            if isinstance(value, bool):
+                value = int(value)
+
+            if operator == 'is':
+                clauses.append(f'"{column}" IS {"NULL" if value is None else "?"}')
+                params += [] if value is None else [value]
+            elif operator == 'in':
+                values = list(value)
+                clauses.append(f'"{column}" IN ({", ".join("?" for _ in values) or "NULL"})')
+                params += values
+            elif operator == 'ilike':
+                clauses.append(f'unicode_lower("{column}") LIKE unicode_lower(?)')
+                params.append(value)
+            else:
+                sql_operator = {
+                    'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=', 'like': 'LIKE'
+                }[operator]
+                clauses.append(f'"{column}" {sql_operator} ?')
+                params.append(_timestamp(value) if column == 'date' else value)
+
+        return ' AND '.join(clauses), tuple(params)
+
+    def _preview_where(self, conditions: List[Condition], preview_limit: int, columns: ColumnSet) -> BulkWriteResult:
+        """Count the rows a bulk write would touch and return the newest of them"""
+        where, params = self._where(conditions)
+        count = self._query(f'SELECT COUNT(*) AS count FROM transactions WHERE {where}', params)[0]['count']
+        rows = self._query(
+            f'SELECT {self._select("transactions", columns)} FROM transactions WHERE {where} '
+            f'ORDER BY date DESC, id DESC LIMIT ?',
+            (*params, preview_limit)
+        )
+        return BulkWriteResult(count=count, rows=rows, dry_run=True)
+
+    @instrumented
+    def delete_where(
+        self,
+        filters: Dict,
+        dry_run: bool = False,
+        preview_limit: int = 100,
+        columns: ColumnSet = Columns.LISTING
+    ) -> BulkWriteResult:
+        """Delete every transaction matching filters in one statement"""
+        conditions = parse_filters(filters)
+        if dry_run:
+            return self._preview_where(conditions, preview_limit, columns)
+
+        try:
+            where, params = self._where(conditions)
+            with self._lock:
+                cursor = self._conn.execute(f'DELETE FROM transactions WHERE {where}', params)
+            logger.info(f"Transactions deleted by filter: {cursor.rowcount}")
+            return BulkWriteResult(count=cursor.rowcount)
+        except Exception as e:
+            logger.error(f"Error deleting transactions by filter: {e}")
+            raise
+
+    @instrumented
+    def update_where(
+        self,
+        filters: Dict,
+        values: Dict,
+        dry_run: bool = False,
+        preview_limit: int = 100,
+        columns: ColumnSet = Columns.LISTING
+    ) -> BulkWriteResult:
+        """Set values on every transaction matching filters in one statement"""
+        conditions = parse_filters(filters)
+        if dry_run:
+            return self._preview_where(conditions, preview_limit, columns)
+
+        try:
+            values = dict(values)
+            if 'date' in values:
+                values['date'] = _timestamp(values['date'])
+            for column in BOOLEAN_COLUMNS & values.keys():
+                if values[column] is not None:
+                    values[column] = int(bool(values[column]))
+            self._check_columns('transactions', values.keys())
+
+            where, params = self._where(conditions)
+            assignments = ', '.join(f'"{name}" = ?' for name in values)
+            with self._lock:
+                cursor = self._conn.execute(
+                    f'UPDATE transactions SET {assignments} WHERE {where}',
+                    (*values.values(), *params)
+                )
+            logger.info(f"Transactions updated by filter: {cursor.rowcount}")
+            return BulkWriteResult(count=cursor.rowcount)
+        except Exception as e:
+            logger.error(f"Error updating transactions by filter: {e}")
+            raise
+
+    @instrumented
+    def get_balance(self, user_id: int) -> Dict:
+        """Get current balance by currency - income minus expenses, skipping internal transfers"""
+        try:
+            rows = self._query(
+                """
+                SELECT
+                    COALESCE(currency, 'UAH') AS currency,
+                    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) AS income,
+                    SUM(CASE WHEN type <> 'income' AND NOT is_internal_transfer(category, description)
+                        THEN amount ELSE 0 END) AS expense
+                FROM transactions
+                WHERE user_telegram_id = ?
+                GROUP BY COALESCE(currency, 'UAH')
+                """,
+                (user_id,)
+            )
+            return {
+                row['currency']: {
+                    'income': row['income'],
+                    'expense': row['expense'],
+                    'balance': row['income'] - row['expense']
+                }
+                for row in rows
+            }
+        except Exception as e:
+            logger.error(f"Error calculating balance: {e}")
+            return {}
+
+    @instrumented
+    def rebuild_balances(self, user_id: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """Balances are aggregated on every read here, so there is never any drift"""
+        return []
+
+    @instrumented
+    def get_monthly_rollups(
+        self,
+        user_id: int,
+        start_month: Optional[date] = None,
+        end_month: Optional[date] = None
+    ) -> List[Dict]:
+        """Monthly totals per type, category, currency and is_team_finance, grouped on the (user, date) index"""
+        where, params = self._transactions_where(
+            user_id,
+            start_date=datetime.combine(start_month, datetime.min.time()) if start_month else None
+        )
+        if end_month:
+            where += ' AND date < ?'
+            params.append(end_month.isoformat())
+
+        return self._query(
+            f"""
+            SELECT
+                substr(date, 1, 7) || '-01' AS month,
+                type,
+                NULLIF(category, '') AS category,
+                COALESCE(currency, 'UAH') AS currency,
+                COALESCE(is_team_finance, 0) AS is_team_finance,
+                SUM(amount) AS total,
+                SUM(CASE WHEN is_stats_excluded_expense(category, description) THEN amount ELSE 0 END) AS excluded_total,
+                COUNT(*) AS transaction_count
+            FROM transactions
+            WHERE {where}
+            GROUP BY 1, 2, 3, 4, 5
+            ORDER BY 1, 2, 3, 4, 5
+            """,
+            tuple(params)
+        )
+
+    # ===== CATEGORIES =====
+
+    @instrumented
+    def get_categories(
+        self,
+        category_type: Optional[str] = None,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get all categories, optionally filtered by type"""
+        try:
+            select = self._select('categories', columns)
+            if category_type:
+                return self._query(
+                    f'SELECT {select} FROM categories WHERE type = ? ORDER BY name',
+                    (category_type,)
+                )
+            return self._query(f'SELECT {select} FROM categories ORDER BY name')
+        except Exception as e:
+            logger.error(f"Error fetching categories: {e}")
+            return []
+
+    @instrumented
+    def add_category(self, category_data: Dict) -> Dict:
+        """Add a new category"""
+        try:
+            with self._lock:
+                created = self._insert_row('categories', category_data)
+            logger.info(f"Category added: {created}")
+            return created or {}
+        except Exception as e:
+            logger.error(f"Error adding category: {e}")
+            raise
+
+    @instrumented
+    def add_categories(
+        self,
+        rows: List[Dict],
+        chunk_size: int = Config.DB_INSERT_CHUNK_SIZE,
+        ignore_duplicates: bool = False
+    ) -> BulkInsertResult:
+        """Add many categories; with ignore_duplicates existing (name, type) pairs are skipped"""
+        return self._insert_chunked('categories', rows, chunk_size, ignore_duplicates=ignore_duplicates)
+
+    @instrumented
+    def get_category_by_name(
+        self,
+        name: str,
+        category_type: str,
+        columns: ColumnSet = Columns.ALL
+    ) -> Optional[Dict]:
+        """Get category by name and type"""
+        try:
+            rows = self._query(
+                f'SELECT {self._select("categories", columns)} FROM categories WHERE name = ? AND type = ?',
+                (name, category_type)
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.error(f"Error fetching category: {e}")
+            return None
+
+    @instrumented
+    def get_category_by_id(self, category_id: str, columns: ColumnSet = Columns.ALL) -> Optional[Dict]:
+        """Get category by ID"""
+        try:
+            rows = self._query(
+                f'SELECT {self._select("categories", columns)} FROM categories WHERE id = ?',
+                (category_id,)
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.error(f"Error fetching category: {e}")
+            return None
+
+    # ===== AI RECOMMENDATIONS =====
+
+    @instrumented
+    def add_recommendation(self, recommendation_data: Dict) -> Dict:
+        """Add an AI recommendation"""
+        try:
+            with self._lock:
+                created = self._insert_row('ai_recommendations', recommendation_data)
+            logger.info("Recommendation added")
+            return created or {}
+        except Exception as e:
+            logger.error(f"Error adding recommendation: {e}")
+            raise
+
+    @instrumented
+    def get_recommendations(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get AI recommendations"""
+        try:
+            where = 'user_telegram_id = ?'
+            if unread_only:
+                where += ' AND is_read = 0'
+            return self._query(
+                f'SELECT {self._select("ai_recommendations", columns)} FROM ai_recommendations '
+                f'WHERE {where} ORDER BY created_at DESC',
+                (user_id,)
+            )
+        except Exception as e:
+            logger.error(f"Error fetching recommendations: {e}")
+            return []
+
+    @instrumented
+    def mark_recommendation_read(self, recommendation_id: str) -> bool:
+        """Mark recommendation as read"""
+        try:
+            with self._lock:
+                self._conn.execute('UPDATE ai_recommendations SET is_read = 1 WHERE id = ?', (recommendation_id,))
+            return True
+        except Exception as e:
+            logger.error(f"Error marking recommendation as read: {e}")
+            return False
+
+    # ===== STORAGE (for receipt images) =====
+
+    @instrumented
+    def upload_receipt_image(self, file_path: str) -> Optional[str]:
+        """Store a compressed receipt and its thumbnail in RECEIPTS_DIR and return its file:// URL"""
+        try:
+            path, thumb_path = receipt_paths(file_digest(file_path))
+            target = os.path.join(self.receipts_dir, path)
+
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                variants = (
+                    (thumb_path, compress_image(file_path, Config.RECEIPT_THUMB_SIDE, Config.RECEIPT_THUMB_QUALITY)),
+                    (path, compress_image(file_path, Config.RECEIPT_MAX_SIDE, Config.RECEIPT_JPEG_QUALITY)),
+                )
+                for object_path, data in variants:
+                    with open(os.path.join(self.receipts_dir, object_path), 'wb') as file:
+                        file.write(data)
+
+            url = f"file://{os.path.abspath(target)}"
+            logger.info(f"Receipt stored: {url}")
+            return url
+        except Exception as e:
+            logger.error(f"Error storing receipt: {e}")
+            return None
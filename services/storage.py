@@ -0,0 +1,649 @@
+from abc import ABC, abstractmethod
+from services.metrics import instrumented
+from services.resilience import DatabaseUnavailableError
+from utils.config import Config
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ColumnSet = Union[str, Iterable[str]]
+
+
+class Columns:
+    """Predefined column projections for Database reads
+
+    Reads default to ALL; hot paths pass one of these so wide columns like
+    voice_transcription and receipt_image_url stay on the server.
+    """
+    ALL = '*'
+    BALANCE = ('amount', 'type', 'currency', 'category', 'description')
+    CATEGORY_STATS = ('amount', 'category')
+    STATS = ('id', 'date', 'amount', 'type', 'currency', 'category', 'description')
+    LISTING = (
+        'id', 'date', 'created_at', 'amount', 'type', 'currency',
+        'category', 'description', 'is_team_finance'
+    )
+    EXPORT = (
+        'id', 'date', 'amount', 'type', 'currency', 'category',
+        'description', 'payment_method', 'project'
+    )
+    ROLLUP = (
+        'id', 'date', 'amount', 'type', 'currency', 'category',
+        'description', 'is_team_finance'
+    )
+
+
+def select_columns(columns: ColumnSet, required: Iterable[str] = ()) -> str:
+    """Render a column set as a PostgREST select string, adding required columns"""
+    if isinstance(columns, str):
+        if columns == '*':
+            return columns
+        columns = [c.strip() for c in columns.split(',') if c.strip()]
+
+    selected = list(dict.fromkeys(columns))
+    selected += [c for c in required if c not in selected]
+    return ','.join(selected)
+
+
+def with_idempotency_key(row: Dict) -> Dict:
+    """The row with a fresh idempotency_key if it has none; the input is not modified
+
+    Callers that can be retried should set the key themselves (see
+    models.transaction.idempotency_key) so the retry reuses it.
+    """
+    if row.get('idempotency_key'):
+        return row
+    return {**row, 'idempotency_key': str(uuid.uuid4())}
+
+
+@dataclass
+class BulkInsertResult:
+    """Outcome of a chunked multi-row insert
+
+    rows holds the created row for every input row, in input order, with None
+    where the row was not inserted; errors holds one entry per failed chunk.
+    """
+    rows: List[Optional[Dict]] = field(default_factory=list)
+    errors: List[Dict] = field(default_factory=list)
+
+    @property
+    def inserted(self) -> int:
+        """Number of rows actually created"""
+        return sum(1 for row in self.rows if row is not None)
+
+
+@dataclass
+class BulkWriteResult:
+    """Outcome of delete_where / update_where
+
+    count is the number of rows the filter matched (dry run) or wrote; on a
+    dry run rows previews the matching rows, newest first, up to
+    preview_limit.
+    """
+    count: int = 0
+    rows: List[Dict] = field(default_factory=list)
+    dry_run: bool = False
+
+
+# Operators accepted in delete_where / update_where filters
+FILTER_OPERATORS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'in', 'is')
+
+Condition = Tuple[str, str, Any]
+
+
+def parse_filters(filters: Dict) -> List[Condition]:
+    """Turn {column: value | (operator, value)} into (column, operator, value)
+
+    A bare value means equality and None means IS NULL; like/ilike patterns
+    use % wildcards. An empty filter is refused so a bulk write can't reach
+    the whole table by accident.
+    """
+    if not filters:
+        raise ValueError("Bulk writes need at least one filter")
+
+    conditions = []
+    for column, condition in filters.items():
+        if isinstance(condition, tuple):
+            operator, value = condition
+        elif condition is None:
+            operator, value = 'is', None
+        else:
+            operator, value = 'eq', condition
+
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {operator}")
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        conditions.append((column, operator, value))
+    return conditions
+
+
+def filtered_user_ids(conditions: List[Condition]) -> Optional[List[int]]:
+    """Users a filter is restricted to, or None when it can match anyone"""
+    for column, operator, value in conditions:
+        if column == 'user_telegram_id' and operator == 'eq':
+            return [value]
+        if column == 'user_telegram_id' and operator == 'in':
+            return list(value)
+    return None
+
+
+def project_row(row: Dict, columns: ColumnSet) -> Dict:
+    """Apply a column projection to a row that is already in memory"""
+    selected = select_columns(columns)
+    if selected == '*':
+        return row
+    return {column: row.get(column) for column in selected.split(',')}
+
+
+def is_internal_transfer(transaction: Dict) -> bool:
+    """Internal transfers (наличные на карту) are not real expenses"""
+    category = transaction.get('category') or ''
+    description = (transaction.get('description') or '').lower()
+
+    return (
+        category == 'Переводы' and
+        ('на карту' in description or ('налич' in description and 'карт' in description))
+    )
+
+
+def aggregate_balance(transactions: Iterable[Dict]) -> Dict:
+    """Sum income, expense and balance per currency, skipping internal transfers
+
+    Mirrors the get_balance Postgres function; used when the RPC is unavailable.
+    """
+    balances = {}
+
+    for t in transactions:
+        currency = t.get('currency') or 'UAH'
+
+        if currency not in balances:
+            balances[currency] = {
+                'income': 0,
+                'expense': 0,
+                'balance': 0
+            }
+
+        amount = t['amount']
+
+        if t['type'] == 'income':
+            balances[currency]['income'] += amount
+        elif not is_internal_transfer(t):  # Only count real expenses
+            balances[currency]['expense'] += amount
+
+        balances[currency]['balance'] = balances[currency]['income'] - balances[currency]['expense']
+
+    return balances
+
+
+def is_stats_excluded_expense(transaction: Dict) -> bool:
+    """Project payouts (Партнерам) and self-transfers (наличные на карту) stay out of stats totals"""
+    description = (transaction.get('description') or '').lower()
+
+    return (
+        transaction.get('category') == 'Партнерам' or
+        ('на карту' in description and 'налич' in description)
+    )
+
+
+def build_period_snapshot(transactions: Iterable[Dict]) -> Dict:
+    """Totals and category breakdowns for a period in one pass
+
+    Mirrors the get_period_snapshot Postgres function: per currency, income,
+    expense and expense_net (expense without is_stats_excluded_expense rows);
+    per type, category totals across currencies, largest first.
+    """
+    count = 0
+    totals = {}
+    categories = {'expense': {}, 'income': {}}
+
+    for t in transactions:
+        count += 1
+        currency = t.get('currency') or 'UAH'
+        amount = t['amount']
+        totals.setdefault(currency, {'income': 0, 'expense': 0, 'expense_net': 0})
+
+        if t['type'] == 'income':
+            totals[currency]['income'] += amount
+        elif t['type'] == 'expense':
+            totals[currency]['expense'] += amount
+            if not is_stats_excluded_expense(t):
+                totals[currency]['expense_net'] += amount
+
+        by_category = categories.setdefault(t['type'], {})
+        category = t.get('category', 'Без категории')
+        by_category[category] = by_category.get(category, 0) + amount
+
+    return _snapshot(count, totals, categories)
+
+
+def month_start(value: datetime) -> datetime:
+    """Midnight of the first day of value's month"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def build_monthly_rollups(transactions: Iterable[Dict]) -> List[Dict]:
+    """Group transactions by month, type, category, currency and is_team_finance
+
+    Mirrors the monthly_rollups table (migrations/006_monthly_rollups.sql);
+    month is the 'YYYY-MM-01' string of the transaction date.
+    """
+    rollups = {}
+
+    for t in transactions:
+        key = (
+            str(t['date'])[:7] + '-01',
+            t['type'],
+            t.get('category') or None,
+            t.get('currency') or 'UAH',
+            bool(t.get('is_team_finance'))
+        )
+        row = rollups.get(key)
+        if row is None:
+            row = rollups[key] = {
+                'month': key[0],
+                'type': key[1],
+                'category': key[2],
+                'currency': key[3],
+                'is_team_finance': key[4],
+                'total': 0,
+                'excluded_total': 0,
+                'transaction_count': 0
+            }
+
+        row['total'] += t['amount']
+        row['transaction_count'] += 1
+        if is_stats_excluded_expense(t):
+            row['excluded_total'] += t['amount']
+
+    return sorted(rollups.values(), key=lambda r: (r['month'], r['type'], r['category'] or '', r['currency']))
+
+
+def snapshot_from_rollups(rollups: Iterable[Dict]) -> Dict:
+    """Build a period snapshot (see build_period_snapshot) from monthly rollup rows"""
+    count = 0
+    totals = {}
+    categories = {'expense': {}, 'income': {}}
+
+    for row in rollups:
+        count += row['transaction_count']
+        currency_totals = totals.setdefault(row['currency'], {'income': 0, 'expense': 0, 'expense_net': 0})
+
+        if row['type'] == 'income':
+            currency_totals['income'] += row['total']
+        elif row['type'] == 'expense':
+            currency_totals['expense'] += row['total']
+            currency_totals['expense_net'] += row['total'] - row['excluded_total']
+
+        by_category = categories.setdefault(row['type'], {})
+        by_category[row['category']] = by_category.get(row['category'], 0) + row['total']
+
+    return _snapshot(count, totals, categories)
+
+
+def merge_snapshots(first: Dict, second: Dict) -> Dict:
+    """Combine two period snapshots over disjoint date ranges"""
+    totals = {}
+    categories = {'expense': {}, 'income': {}}
+
+    for snapshot in (first, second):
+        for currency, values in snapshot['totals'].items():
+            merged = totals.setdefault(currency, {'income': 0, 'expense': 0, 'expense_net': 0})
+            for name, value in values.items():
+                merged[name] = merged.get(name, 0) + value
+
+        for transaction_type, rows in snapshot['categories'].items():
+            by_category = categories.setdefault(transaction_type, {})
+            for row in rows:
+                by_category[row['category']] = by_category.get(row['category'], 0) + row['total']
+
+    return _snapshot(first['transaction_count'] + second['transaction_count'], totals, categories)
+
+
+def _snapshot(count: int, totals: Dict, categories: Dict) -> Dict:
+    return {
+        'transaction_count': count,
+        'totals': totals,
+        'categories': {
+            transaction_type: sorted(
+                ({'category': category, 'total': total} for category, total in by_category.items()),
+                key=lambda x: x['total'],
+                reverse=True
+            )
+            for transaction_type, by_category in categories.items()
+        }
+    }
+
+
+class Storage(ABC):
+    """Storage backend interface used by the bot, services and scripts
+
+    Database (Supabase) and SQLiteDatabase (local file) implement it; the
+    backend in use is chosen by Config.STORAGE_BACKEND in
+    services.database.create_database. iter_transactions and
+    get_category_stats are built on the abstract methods, so backends only
+    provide the primitive reads and writes.
+    """
+
+    # Offline journal for transaction writes, when the backend has one
+    journal = None
+
+    # Feed of writes made by other processes (services.change_feed), when enabled
+    change_feed = None
+
+    # ===== TRANSACTIONS =====
+
+    @abstractmethod
+    def add_transaction(self, transaction_data: Dict) -> Dict:
+        """Add a new transaction; a repeated idempotency_key returns the stored row"""
+
+    @abstractmethod
+    def add_transactions(self, rows: List[Dict], chunk_size: int = Config.DB_INSERT_CHUNK_SIZE) -> BulkInsertResult:
+        """Add many transactions in chunks of chunk_size rows
+
+        Rows whose idempotency_key is already stored are skipped (None in the
+        result), so an import can be re-run safely.
+        """
+
+    @abstractmethod
+    def get_transactions(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 100,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get transactions with optional filters, newest first"""
+
+    @abstractmethod
+    def fetch_transactions_page(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        after: Optional[Dict] = None,
+        page_size: int = Config.DB_PAGE_SIZE,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Fetch one page of transactions ordered by (date, id) descending, starting below `after`"""
+
+    @instrumented
+    def iter_transactions(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        transaction_type: Optional[str] = None,
+        category: Optional[str] = None,
+        page_size: int = Config.DB_PAGE_SIZE,
+        columns: ColumnSet = Columns.ALL
+    ) -> Iterator[Dict]:
+        """Yield every matching transaction, newest first
+
+        Pages with keyset pagination on (date, id), so memory stays bounded by
+        page_size and long histories are never truncated. Errors are raised
+        rather than ending the iteration early.
+        """
+        after = None
+        while True:
+            page = self.fetch_transactions_page(
+                user_id, start_date, end_date, transaction_type, category,
+                after=after, page_size=page_size, columns=columns
+            )
+            yield from page
+
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    @abstractmethod
+    def get_recent_transactions(
+        self,
+        user_id: int,
+        limit: int = 10,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get most recent transactions by created_at"""
+
+    @abstractmethod
+    def get_transaction_by_id(self, transaction_id: str, columns: ColumnSet = Columns.ALL) -> Optional[Dict]:
+        """Get a single transaction by ID"""
+
+    @abstractmethod
+    def update_transaction(self, transaction_id: str, update_data: Dict) -> Dict:
+        """Update a transaction"""
+
+    @abstractmethod
+    def delete_transaction(self, transaction_id: str) -> bool:
+        """Delete a transaction"""
+
+    @abstractmethod
+    def delete_where(
+        self,
+        filters: Dict,
+        dry_run: bool = False,
+        preview_limit: int = 100,
+        columns: ColumnSet = Columns.LISTING
+    ) -> BulkWriteResult:
+        """Delete every transaction matching filters in one statement (see parse_filters)"""
+
+    @abstractmethod
+    def update_where(
+        self,
+        filters: Dict,
+        values: Dict,
+        dry_run: bool = False,
+        preview_limit: int = 100,
+        columns: ColumnSet = Columns.LISTING
+    ) -> BulkWriteResult:
+        """Set values on every transaction matching filters in one statement"""
+
+    @abstractmethod
+    def get_balance(self, user_id: int) -> Dict:
+        """Get income, expense and balance per currency"""
+
+    @abstractmethod
+    def rebuild_balances(self, user_id: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """Recompute stored balances from transactions and return per-currency drift"""
+
+    # ===== CATEGORIES =====
+
+    @abstractmethod
+    def get_categories(
+        self,
+        category_type: Optional[str] = None,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get all categories, optionally filtered by type"""
+
+    @abstractmethod
+    def add_category(self, category_data: Dict) -> Dict:
+        """Add a new category"""
+
+    @abstractmethod
+    def add_categories(
+        self,
+        rows: List[Dict],
+        chunk_size: int = Config.DB_INSERT_CHUNK_SIZE,
+        ignore_duplicates: bool = False
+    ) -> BulkInsertResult:
+        """Add many categories; with ignore_duplicates existing (name, type) pairs are skipped"""
+
+    @abstractmethod
+    def get_category_by_name(
+        self,
+        name: str,
+        category_type: str,
+        columns: ColumnSet = Columns.ALL
+    ) -> Optional[Dict]:
+        """Get category by name and type"""
+
+    @abstractmethod
+    def get_category_by_id(self, category_id: str, columns: ColumnSet = Columns.ALL) -> Optional[Dict]:
+        """Get category by ID"""
+
+    def invalidate_categories(self):
+        """Drop any cached categories; backends without a cache have nothing to do"""
+
+    # ===== CHANGE FEED =====
+
+    def start_change_feed(self):
+        """Start applying the change feed to this backend's caches, if it has one"""
+        if self.change_feed is None:
+            return
+        self.change_feed.subscribe(self.apply_change, self.on_change_feed_status)
+        self.change_feed.start()
+
+    def apply_change(self, event):
+        """Bring caches up to date with a row written elsewhere; no-op without caches"""
+
+    def on_change_feed_status(self, connected: bool):
+        """React to the change feed going up or down; no-op without caches"""
+
+    # ===== STATISTICS =====
+
+    @instrumented
+    def get_category_stats(
+        self,
+        user_id: int,
+        start_date: datetime,
+        end_date: datetime,
+        transaction_type: str
+    ) -> List[Dict]:
+        """Get spending/income by category for a date range"""
+        try:
+            transactions = self.iter_transactions(
+                user_id=user_id,
+                start_date=start_date,
+                end_date=end_date,
+                transaction_type=transaction_type,
+                columns=Columns.CATEGORY_STATS
+            )
+
+            category_totals = {}
+            for t in transactions:
+                category = t.get('category', 'Без категории')
+                category_totals[category] = category_totals.get(category, 0) + t['amount']
+
+            stats = [
+                {'category': cat, 'total': total}
+                for cat, total in category_totals.items()
+            ]
+
+            stats.sort(key=lambda x: x['total'], reverse=True)
+            return stats
+
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error calculating category stats: {e}")
+            return []
+
+    @instrumented
+    def get_period_snapshot(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict:
+        """Per-currency totals and per-type category breakdowns for a period
+
+        See build_period_snapshot for the shape. When the period starts on a
+        month boundary (month, year, all time), the complete months come from
+        monthly rollups and only the current month is read row by row.
+        Errors are raised so an outage isn't shown as an empty period.
+        """
+        tail_start = month_start(end_date or datetime.now())
+
+        if start_date is None or (start_date == month_start(start_date) and start_date < tail_start):
+            rollups = self.get_monthly_rollups(
+                user_id,
+                start_month=start_date.date() if start_date else None,
+                end_month=tail_start.date()
+            )
+            return merge_snapshots(
+                snapshot_from_rollups(rollups),
+                self._scan_period_snapshot(user_id, tail_start, end_date)
+            )
+
+        return self._scan_period_snapshot(user_id, start_date, end_date)
+
+    def _scan_period_snapshot(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict:
+        """Period snapshot aggregated from the period's transactions"""
+        return build_period_snapshot(self.iter_transactions(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            columns=Columns.STATS
+        ))
+
+    @instrumented
+    def get_monthly_rollups(
+        self,
+        user_id: int,
+        start_month: Optional[date] = None,
+        end_month: Optional[date] = None
+    ) -> List[Dict]:
+        """Monthly totals per type, category, currency and is_team_finance
+
+        Covers months from start_month (inclusive) to end_month (exclusive);
+        see build_monthly_rollups for the row shape.
+        """
+        return self._scan_monthly_rollups(user_id, start_month, end_month)
+
+    def _scan_monthly_rollups(
+        self,
+        user_id: int,
+        start_month: Optional[date] = None,
+        end_month: Optional[date] = None
+    ) -> List[Dict]:
+        """Monthly rollups aggregated from the transactions of those months"""
+        return build_monthly_rollups(self.iter_transactions(
+            user_id=user_id,
+            start_date=datetime.combine(start_month, datetime.min.time()) if start_month else None,
+            end_date=datetime.combine(end_month, datetime.min.time()) - timedelta(microseconds=1) if end_month else None,
+            columns=Columns.ROLLUP
+        ))
+
+    def rebuild_monthly_rollups(self, user_id: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """Recompute stored monthly rollups and return drifted rows; nothing is stored by default"""
+        return []
+
+    # ===== AI RECOMMENDATIONS =====
+
+    @abstractmethod
+    def add_recommendation(self, recommendation_data: Dict) -> Dict:
+        """Add an AI recommendation"""
+
+    @abstractmethod
+    def get_recommendations(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        columns: ColumnSet = Columns.ALL
+    ) -> List[Dict]:
+        """Get AI recommendations, newest first"""
+
+    @abstractmethod
+    def mark_recommendation_read(self, recommendation_id: str) -> bool:
+        """Mark recommendation as read"""
+
+    # ===== STORAGE (for receipt images) =====
+
+    @abstractmethod
+    def upload_receipt_image(self, file_path: str) -> Optional[str]:
+        """Store a compressed receipt image and its thumbnail under a content hash and return the image URL"""
@@ -0,0 +1,159 @@
+from supabase import Client, ClientOptions
+from postgrest import SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from postgrest.utils import SyncClient as PostgrestSession
+from storage3 import SyncStorageClient
+from storage3.constants import DEFAULT_TIMEOUT as DEFAULT_STORAGE_CLIENT_TIMEOUT
+from storage3.utils import SyncClient as StorageSession
+from services.metrics import metrics
+from utils.config import Config
+from typing import Dict, Optional, Union
+import httpx
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_transport: Optional[httpx.HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> httpx.HTTPTransport:
+    """Return the process-wide HTTP connection pool, creating it on first use
+
+    PostgREST and storage requests go to the same Supabase host, so one pool
+    of keep-alive (HTTP/2 when enabled) connections serves both, and a burst
+    of queries reuses warm connections instead of paying new TLS handshakes.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = httpx.HTTPTransport(
+                http2=Config.HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=Config.HTTP_POOL_SIZE,
+                    max_keepalive_connections=Config.HTTP_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+            logger.info(
+                f"HTTP pool created: {Config.HTTP_POOL_SIZE} connections, "
+                f"http2={Config.HTTP2_ENABLED}"
+            )
+        return _transport
+
+
+def _record_request(request: httpx.Request):
+    metrics.add_bytes(sent=int(request.headers.get('content-length', 0)))
+
+
+def _record_response(response: httpx.Response):
+    # The client reads the body right after the hook anyway
+    response.read()
+    metrics.add_bytes(received=len(response.content))
+
+
+EVENT_HOOKS = {'request': [_record_request], 'response': [_record_response]}
+
+
+def get_timeout() -> httpx.Timeout:
+    """Connect/read/write/pool timeouts for Supabase requests"""
+    return httpx.Timeout(
+        Config.HTTP_READ_TIMEOUT,
+        connect=Config.HTTP_CONNECT_TIMEOUT,
+        pool=Config.HTTP_CONNECT_TIMEOUT
+    )
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose session uses the shared connection pool"""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> PostgrestSession:
+        return PostgrestSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=get_transport(),
+            follow_redirects=True,
+            event_hooks=EVENT_HOOKS,
+        )
+
+
+class PooledStorageClient(SyncStorageClient):
+    """Storage client whose session uses the shared connection pool"""
+
+    def _create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: int,
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> StorageSession:
+        return StorageSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=get_transport(),
+            follow_redirects=True,
+            event_hooks=EVENT_HOOKS,
+        )
+
+
+class PooledClient(Client):
+    """Supabase client with table, RPC and storage calls on the shared pool
+
+    The PostgREST client is recreated on auth events; it picks up the same
+    pool again, so connections survive token refreshes.
+    """
+
+    @staticmethod
+    def _init_postgrest_client(
+        rest_url: str,
+        headers: Dict[str, str],
+        schema: str,
+        timeout: Union[int, float, httpx.Timeout] = DEFAULT_POSTGREST_CLIENT_TIMEOUT,
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> SyncPostgrestClient:
+        return PooledPostgrestClient(
+            rest_url,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+        )
+
+    @staticmethod
+    def _init_storage_client(
+        storage_url: str,
+        headers: Dict[str, str],
+        storage_client_timeout: int = DEFAULT_STORAGE_CLIENT_TIMEOUT,
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> SyncStorageClient:
+        return PooledStorageClient(
+            storage_url, headers, storage_client_timeout, verify, proxy
+        )
+
+
+def create_supabase_client(url: Optional[str] = None, key: Optional[str] = None) -> Client:
+    """Create a Supabase client on the shared, pooled HTTP transport
+
+    Defaults to the bot's SUPABASE_URL / SUPABASE_KEY; scripts pass their
+    service role key.
+    """
+    timeout = get_timeout()
+    options = ClientOptions(
+        postgrest_client_timeout=timeout,
+        storage_client_timeout=timeout
+    )
+    return PooledClient.create(url or Config.SUPABASE_URL, key or Config.SUPABASE_KEY, options)
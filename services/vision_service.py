@@ -1,4 +1,4 @@
-from openai import OpenAI
+from services.openai_client import get_async_client, get_client
 from utils.config import Config
 import base64
 import json
@@ -6,23 +6,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
-
 
 class VisionService:
     """Service for processing receipt images using GPT-4 Vision"""
 
     @staticmethod
-    def process_receipt(image_path: str, available_categories: list) -> dict:
-        """Extract information from receipt image"""
-        try:
-            # Encode image to base64
-            with open(image_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+    def _receipt_request(image_path: str, available_categories: list) -> dict:
+        # Encode image to base64
+        with open(image_path, "rb") as image_file:
+            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
 
-            categories_str = ", ".join(available_categories)
+        categories_str = ", ".join(available_categories)
 
-            prompt = f"""Проанализируй чек и извлеки следующую информацию:
+        prompt = f"""Проанализируй чек и извлеки следующую информацию:
 
 1. Общая сумма покупки
 2. Дата покупки (если видна)
@@ -41,38 +37,61 @@ class VisionService:
   "category": "<категория из списка>"
 }}"""
 
-            response = client.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
+        return dict(
+            model="gpt-4-vision-preview",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{base64_image}"
                             }
-                        ]
-                    }
-                ],
-                max_tokens=500
+                        }
+                    ]
+                }
+            ],
+            max_tokens=500,
+            timeout=Config.OPENAI_VISION_TIMEOUT
+        )
+
+    @staticmethod
+    def _parse_receipt(content: str) -> dict:
+        # Extract JSON from response
+        json_start = content.find('{')
+        json_end = content.rfind('}') + 1
+        if json_start >= 0 and json_end > json_start:
+            json_str = content[json_start:json_end]
+            result = json.loads(json_str)
+            logger.info(f"Receipt processed: {result}")
+            return result
+        else:
+            logger.error("No JSON found in vision response")
+            return {}
+
+    @staticmethod
+    def process_receipt(image_path: str, available_categories: list) -> dict:
+        """Extract information from receipt image"""
+        try:
+            response = get_client().chat.completions.create(
+                **VisionService._receipt_request(image_path, available_categories)
             )
+            return VisionService._parse_receipt(response.choices[0].message.content)
 
-            content = response.choices[0].message.content
-
-            # Extract JSON from response
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = content[json_start:json_end]
-                result = json.loads(json_str)
-                logger.info(f"Receipt processed: {result}")
-                return result
-            else:
-                logger.error("No JSON found in vision response")
-                return {}
+        except Exception as e:
+            logger.error(f"Error processing receipt: {e}")
+            return {}
+
+    @staticmethod
+    async def process_receipt_async(image_path: str, available_categories: list) -> dict:
+        """process_receipt without blocking the event loop"""
+        try:
+            response = await get_async_client().chat.completions.create(
+                **VisionService._receipt_request(image_path, available_categories)
+            )
+            return VisionService._parse_receipt(response.choices[0].message.content)
 
         except Exception as e:
             logger.error(f"Error processing receipt: {e}")
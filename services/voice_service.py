@@ -1,12 +1,10 @@
-from openai import OpenAI
+from services.openai_client import get_async_client, get_client
 from utils.config import Config
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
-
 
 class VoiceService:
     """Service for processing voice messages using Whisper API"""
@@ -16,10 +14,31 @@ class VoiceService:
         """Transcribe voice message to text using Whisper"""
         try:
             with open(voice_file_path, 'rb') as audio_file:
-                transcript = client.audio.transcriptions.create(
+                transcript = get_client().audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file,
+                    language="ru",  # Russian, but Whisper handles Ukrainian too
+                    timeout=Config.OPENAI_TRANSCRIBE_TIMEOUT
+                )
+
+            text = transcript.text
+            logger.info(f"Voice transcribed: {text[:50]}...")
+            return text
+
+        except Exception as e:
+            logger.error(f"Error transcribing voice: {e}")
+            return ""
+
+    @staticmethod
+    async def transcribe_voice_async(voice_file_path: str) -> str:
+        """transcribe_voice without blocking the event loop"""
+        try:
+            with open(voice_file_path, 'rb') as audio_file:
+                transcript = await get_async_client().audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file,
-                    language="ru"  # Russian, but Whisper handles Ukrainian too
+                    language="ru",
+                    timeout=Config.OPENAI_TRANSCRIBE_TIMEOUT
                 )
 
             text = transcript.text
@@ -4,8 +4,10 @@ This script creates all tables, indexes, and default categories
 """
 
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
+from services.database import Database
+from services.supabase_client import create_supabase_client
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -18,7 +20,8 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
 # Create Supabase client with service role key for admin access
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+supabase: Client = create_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+store = Database(client=supabase)
 
 
 def execute_sql(sql: str, description: str):
@@ -108,17 +111,8 @@ def create_tables():
 
 def create_indexes():
     """Create indexes"""
-    logger.info("Creating indexes...")
-
-    indexes = [
-        "CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_telegram_id);",
-        "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type);",
-        "CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category);",
-        "CREATE INDEX IF NOT EXISTS idx_recommendations_user_id ON ai_recommendations(user_telegram_id);"
-    ]
-
-    logger.info("⚠️  Indexes should be created in Supabase SQL Editor")
+    # Indexes live in database/migrations (008_hot_path_indexes.sql)
+    logger.info("⚠️  Indexes are created by migrate.py (database/migrations)")
 
 
 def insert_default_categories():
@@ -182,17 +176,14 @@ def insert_default_categories():
             logger.info(f"✅ Categories already exist ({len(existing.data)} found)")
             return True
 
-        # Insert categories
-        for cat in all_categories:
-            try:
-                supabase.table('categories').insert(cat).execute()
-            except Exception as e:
-                # Category might already exist due to unique constraint
-                if 'duplicate' not in str(e).lower():
-                    logger.warning(f"Could not insert category {cat['name']}: {e}")
+        # Insert categories in one batch, skipping ones that already exist
+        result = store.add_categories(all_categories, ignore_duplicates=True)
 
-        logger.info(f"✅ Inserted {len(all_categories)} categories")
-        return True
+        for error in result.errors:
+            logger.warning(f"Could not insert categories {error['start']}-{error['end'] - 1}: {error['error']}")
+
+        logger.info(f"✅ Inserted {result.inserted} categories")
+        return not result.errors
 
     except Exception as e:
         logger.error(f"Error inserting categories: {e}")
@@ -263,7 +254,9 @@ def main():
         print("\n📝 Next steps:")
         print("1. Create storage bucket 'receipts' in Supabase Dashboard > Storage")
         print("2. Make the bucket public")
-        print("3. Run the bot: python -m bot.main")
+        print("3. Set DATABASE_URL in .env and run: python migrate.py")
+        print("   (or run database/migrations/*.sql in order in Supabase SQL Editor, then python migrate.py --baseline <last number>)")
+        print("4. Run the bot: python -m bot.main")
         print("\n")
     else:
         print("\n⚠️  Please complete the manual steps above.\n")
@@ -11,12 +11,55 @@ class Config:
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     USER_TELEGRAM_ID = int(os.getenv('USER_TELEGRAM_ID', 0))
 
+    # Storage backend: 'supabase' or 'sqlite' (local file, no remote service)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase').lower()
+
     # Supabase Configuration
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+    DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', 8))
+
+    # Shared HTTP connection pool for Supabase (PostgREST + storage)
+    HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'true').lower() == 'true'
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+    HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv('HTTP_KEEPALIVE_CONNECTIONS', 10))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 60))  # seconds
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))  # seconds
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))  # seconds
+
+    DB_PAGE_SIZE = int(os.getenv('DB_PAGE_SIZE', 1000))  # PostgREST max-rows on Supabase
+    DB_INSERT_CHUNK_SIZE = int(os.getenv('DB_INSERT_CHUNK_SIZE', 500))
+    DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', 3))
+    DB_RETRY_BASE_DELAY = float(os.getenv('DB_RETRY_BASE_DELAY', 0.2))  # seconds
+    DB_RETRY_MAX_DELAY = float(os.getenv('DB_RETRY_MAX_DELAY', 2))  # seconds
+    DB_BREAKER_THRESHOLD = int(os.getenv('DB_BREAKER_THRESHOLD', 5))  # consecutive failures
+    DB_BREAKER_RESET_TIMEOUT = float(os.getenv('DB_BREAKER_RESET_TIMEOUT', 30))  # seconds
+    CATEGORY_CACHE_TTL = int(os.getenv('CATEGORY_CACHE_TTL', 300))  # seconds
+    TRANSACTION_CACHE_SIZE = int(os.getenv('TRANSACTION_CACHE_SIZE', 256))
+    TRANSACTION_CACHE_TTL = int(os.getenv('TRANSACTION_CACHE_TTL', 60))  # seconds
+
+    # Change feed (Supabase Realtime, or change_log polling for SQLite) that
+    # keeps the caches coherent with writes from import scripts
+    CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'true').lower() == 'true'
+    CHANGE_FEED_CACHE_TTL = int(os.getenv('CHANGE_FEED_CACHE_TTL', 3600))  # seconds, while the feed is live
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv('CHANGE_FEED_POLL_INTERVAL', 1))  # seconds, SQLite only
 
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    # Text completions; the parse and batch requests use JSON mode, which plain gpt-4 rejects
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o')
+    OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', 10))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 30))  # seconds, text completions
+    OPENAI_VISION_TIMEOUT = float(os.getenv('OPENAI_VISION_TIMEOUT', 60))  # seconds
+    OPENAI_TRANSCRIBE_TIMEOUT = float(os.getenv('OPENAI_TRANSCRIBE_TIMEOUT', 60))  # seconds
+
+    # Local categorizer learned from transaction history; the LLM is asked only
+    # when it isn't confident
+    LOCAL_CATEGORIZER_ENABLED = os.getenv('LOCAL_CATEGORIZER_ENABLED', 'true').lower() == 'true'
+    LOCAL_CATEGORIZER_MIN_CONFIDENCE = float(os.getenv('LOCAL_CATEGORIZER_MIN_CONFIDENCE', 0.8))
+    LOCAL_CATEGORIZER_MIN_SUPPORT = int(os.getenv('LOCAL_CATEGORIZER_MIN_SUPPORT', 3))  # past transactions
+    LOCAL_CATEGORIZER_MIN_SIMILARITY = float(os.getenv('LOCAL_CATEGORIZER_MIN_SIMILARITY', 0.6))
 
     # Environment
     ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
@@ -27,17 +70,55 @@ class Config:
     TEMP_DIR = os.path.join(BASE_DIR, 'temp')
     VOICE_FILES_DIR = os.path.join(BASE_DIR, 'voice_files')
 
+    # Offline write-ahead journal for transaction inserts
+    JOURNAL_ENABLED = os.getenv('JOURNAL_ENABLED', 'true').lower() == 'true'
+    JOURNAL_PATH = os.getenv('JOURNAL_PATH', os.path.join(DATA_DIR, 'journal.sqlite3'))
+    JOURNAL_BATCH_SIZE = int(os.getenv('JOURNAL_BATCH_SIZE', 100))
+    JOURNAL_FLUSH_INTERVAL = float(os.getenv('JOURNAL_FLUSH_INTERVAL', 5))  # seconds
+    JOURNAL_MAX_FAILURES = int(os.getenv('JOURNAL_MAX_FAILURES', 5))  # permanent rejections before dead letter
+
+    # Batch categorisation (imports, recategorize.py): descriptions per request
+    # are limited by an estimated prompt token budget
+    AI_BATCH_TOKEN_BUDGET = int(os.getenv('AI_BATCH_TOKEN_BUDGET', 3000))
+    AI_BATCH_MAX_ITEMS = int(os.getenv('AI_BATCH_MAX_ITEMS', 100))
+    AI_BATCH_CONCURRENCY = int(os.getenv('AI_BATCH_CONCURRENCY', 4))
+    AI_BATCH_REQUESTS_PER_MINUTE = int(os.getenv('AI_BATCH_REQUESTS_PER_MINUTE', 60))
+
+    # Persistent cache of AI parsing and categorisation answers
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', os.path.join(DATA_DIR, 'ai_cache.sqlite3'))
+    AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 5000))
+    AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 30 * 24 * 3600))  # seconds
+
+    # Direct Postgres connection for migrate.py (Supabase or a local server)
+    DATABASE_URL = os.getenv('DATABASE_URL')
+
+    # Local SQLite storage backend
+    SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(DATA_DIR, 'mywallet.sqlite3'))
+    RECEIPTS_DIR = os.getenv('RECEIPTS_DIR', os.path.join(DATA_DIR, 'receipts'))
+
+    # Receipt images are re-encoded before upload, with a thumbnail alongside
+    RECEIPT_MAX_SIDE = int(os.getenv('RECEIPT_MAX_SIDE', 1600))  # px
+    RECEIPT_JPEG_QUALITY = int(os.getenv('RECEIPT_JPEG_QUALITY', 80))
+    RECEIPT_THUMB_SIDE = int(os.getenv('RECEIPT_THUMB_SIDE', 320))  # px
+    RECEIPT_THUMB_QUALITY = int(os.getenv('RECEIPT_THUMB_QUALITY', 70))
+
+    # Database metrics dump written by /perf json
+    METRICS_DUMP_PATH = os.getenv('METRICS_DUMP_PATH', os.path.join(DATA_DIR, 'metrics.json'))
+
     @classmethod
     def validate(cls):
         """Validate that all required environment variables are set"""
         required_vars = {
             'TELEGRAM_BOT_TOKEN': cls.TELEGRAM_BOT_TOKEN,
-            'SUPABASE_URL': cls.SUPABASE_URL,
-            'SUPABASE_KEY': cls.SUPABASE_KEY,
             'OPENAI_API_KEY': cls.OPENAI_API_KEY,
             'USER_TELEGRAM_ID': cls.USER_TELEGRAM_ID,
         }
 
+        if cls.STORAGE_BACKEND == 'supabase':
+            required_vars['SUPABASE_URL'] = cls.SUPABASE_URL
+            required_vars['SUPABASE_KEY'] = cls.SUPABASE_KEY
+
         missing_vars = [var_name for var_name, var_value in required_vars.items() if not var_value]
 
         if missing_vars:
@@ -51,3 +132,4 @@ class Config:
         """Create necessary directories if they don't exist"""
         os.makedirs(cls.TEMP_DIR, exist_ok=True)
         os.makedirs(cls.VOICE_FILES_DIR, exist_ok=True)
+        os.makedirs(cls.DATA_DIR, exist_ok=True)
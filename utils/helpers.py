@@ -71,11 +71,14 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     return text[:max_length - 3] + '...'
 
 
+# Currencies the ledger keeps balances in
+CURRENCY_SYMBOLS = {
+    'UAH': '₴',
+    'USD': '$',
+    'EUR': '€'
+}
+
+
 def get_currency_symbol(currency: str) -> str:
     """Get currency symbol"""
-    symbols = {
-        'UAH': '₴',
-        'USD': '$',
-        'EUR': '€'
-    }
-    return symbols.get(currency, currency)
+    return CURRENCY_SYMBOLS.get(currency, currency)
@@ -0,0 +1,40 @@
+"""
+Image Helper
+Подготовка фото чеков к загрузке: хеш содержимого, сжатие и миниатюра
+"""
+
+from PIL import Image, ImageOps
+from typing import Tuple
+import hashlib
+import io
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of the file contents, used as the receipt's storage key"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def receipt_paths(digest: str) -> Tuple[str, str]:
+    """Object paths of a receipt and its thumbnail, fanned out by hash prefix"""
+    return f"{digest[:2]}/{digest}.jpg", f"{digest[:2]}/{digest}_thumb.jpg"
+
+
+def compress_image(file_path: str, max_side: int, quality: int) -> bytes:
+    """
+    Re-encode an image as JPEG no larger than max_side on either edge
+
+    EXIF orientation is applied and metadata (GPS included) dropped. The
+    re-encoded image is always returned, even when the original file is
+    smaller, so nothing from the upload is stored as is.
+    """
+    with Image.open(file_path) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue()